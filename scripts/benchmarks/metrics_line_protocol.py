@@ -0,0 +1,53 @@
+"""
+Benchmark line protocol encoding for `Metrics.write_many`.
+
+Compares validating every point through the pydantic `Point` model with
+encoding trusted dictionaries directly.
+
+Usage:
+
+    python scripts/benchmarks/metrics_line_protocol.py [points]
+"""
+
+import sys
+import time
+
+from fullctl.metrics.line_protocol import encode_points
+from fullctl.metrics.schema import Point
+
+
+def make_points(count):
+    now = int(time.time())
+    return [
+        {
+            "measurement": "port_traffic",
+            "tags": {"host": f"router{i % 50}", "port": f"et-0/0/{i % 48}"},
+            "fields": {"bps_in": i * 1000, "bps_out": i * 2000, "util": i / count},
+            "timestamp": now - i,
+        }
+        for i in range(count)
+    ]
+
+
+def bench(name, fn, points):
+    t = time.perf_counter()
+    data = fn(points)
+    elapsed = time.perf_counter() - t
+    print(
+        f"{name}: {len(points) / elapsed:,.0f} points/sec ({len(data):,} bytes in {elapsed:.2f}s)"
+    )
+
+
+def main(count=100000):
+    points = make_points(count)
+
+    bench(
+        "pydantic Point + encode",
+        lambda points: encode_points([Point(**point) for point in points]),
+        points,
+    )
+    bench("dict encode", encode_points, points)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
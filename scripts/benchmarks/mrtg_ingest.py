@@ -0,0 +1,64 @@
+"""
+Benchmark MRTG log ingestion into RRD files.
+
+Generates a multi-year MRTG log and compares the per-line `rrdtool.update`
+path with the batched ingestion in `fullctl.graph.mrtg.rrd`.
+
+Requires the `rrdtool` python bindings.
+
+Usage:
+
+    python scripts/benchmarks/mrtg_ingest.py [years]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from fullctl.graph.mrtg import rrd
+from fullctl.graph.mrtg.mock import mrtg_log
+
+
+def ingest_per_line(rrd_path, log_path):
+    with open(log_path) as log_file:
+        log_lines = log_file.readlines()[1:]
+    log_lines.reverse()
+    rrd.create_rrd_file(rrd_path, int(log_lines[0].split()[0]))
+    for log_line in log_lines:
+        rrd.update_rrd(rrd_path, log_line)
+
+
+def ingest_batched(rrd_path, log_path):
+    rrd.update_rrd_from_log(rrd_path, log_path)
+
+
+def main(years=2):
+    num_points = int(years * 365 * 86400 / 300)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        log_path = os.path.join(tmpdir, "port.log")
+        with open(log_path, "w") as log_file:
+            log_file.write(mrtg_log(num_points))
+
+        print(f"{num_points} log lines ({years} years at 5 minute resolution)")
+
+        t = time.perf_counter()
+        count = sum(
+            1 for _ in rrd.parse_log_lines(rrd.read_log_lines_reverse(log_path))
+        )
+        print(f"parse only: {count} points in {time.perf_counter() - t:.2f}s")
+
+        if rrd.rrdtool is None:
+            print("rrdtool not installed, skipping rrd update benchmarks")
+            return
+
+        for name, fn in (("per-line", ingest_per_line), ("batched", ingest_batched)):
+            rrd_path = os.path.join(tmpdir, f"{name}.rrd")
+            t = time.perf_counter()
+            fn(rrd_path, log_path)
+            print(f"{name}: {time.perf_counter() - t:.2f}s")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 2)
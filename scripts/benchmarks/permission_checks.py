@@ -0,0 +1,110 @@
+"""
+Benchmark rendering a template with many `can_read` / `can_access`
+permission checks using grainy's `Permissions` against fullctl's
+memoizing `Permissions` (see `fullctl.django.auth.PermissionMatcher`).
+
+Uses the test project settings with an in-memory sqlite database.
+
+Usage:
+
+    python scripts/benchmarks/permission_checks.py [rules] [checks]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+import tests.django_tests.project.settings as project_settings  # noqa: E402
+
+settings.configure(
+    **{
+        key: value
+        for key, value in project_settings.__dict__.items()
+        if not key.startswith("_") and key.isupper()
+    }
+)
+django.setup()
+
+import django_grainy.util  # noqa: E402
+from django.contrib.auth.models import AnonymousUser  # noqa: E402
+from django.template import Context, Template  # noqa: E402
+
+from fullctl.django.auth import Permissions  # noqa: E402
+
+
+class Request:
+    def __init__(self, perms):
+        self.perms = perms
+        self.org = 1
+
+
+def make_perms(cls, rules):
+    perms = cls(AnonymousUser())
+    perms.pset.update(rules)
+    return perms
+
+
+def bench(label, fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        t_start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t_start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<24} {best * 1000:8.1f} ms")
+    return result
+
+
+def main():
+    num_rules = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    num_checks = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    rules = {}
+    for org_id in range(num_rules // 4):
+        rules[f"org.{org_id}"] = 1
+        rules[f"org.{org_id}.net"] = 15
+        rules[f"service.fullctl.{org_id}"] = 1
+        rules[f"org.{org_id}.private"] = 0
+
+    # a page checking a handful of namespaces repeatedly, e.g., per
+    # table row or menu entry
+    namespaces = ["org.{org}", "org.{org}.net", "org.{org}.private", "service.x"]
+    template = Template(
+        "{% load fullctl_util %}"
+        + "".join(
+            f'{{% if request|can_read:"{ns}" %}}r{{% endif %}}'
+            f'{{% if request|can_access:"{ns}" %}}a{{% endif %}}'
+            for ns in (namespaces * (num_checks // len(namespaces) + 1))[:num_checks]
+        )
+    )
+
+    print(f"{len(rules)} rules, {num_checks * 2} checks per render")
+
+    def render(perms_cls):
+        # permissions are created per request
+        def fn():
+            request = Request(make_perms(perms_cls, rules))
+            return template.render(Context({"request": request}))
+
+        return fn
+
+    def render_only(perms_cls):
+        request = Request(make_perms(perms_cls, rules))
+        return lambda: template.render(Context({"request": request}))
+
+    grainy = bench("grainy render", render_only(django_grainy.util.Permissions))
+    fast = bench("memoized render", render_only(Permissions))
+    bench("grainy request", render(django_grainy.util.Permissions))
+    bench("memoized request", render(Permissions))
+
+    assert grainy == fast, "output differs"
+    print("output identical")
+
+
+if __name__ == "__main__":
+    main()
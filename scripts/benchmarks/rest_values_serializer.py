@@ -0,0 +1,99 @@
+"""
+Benchmark the compiled `values_list` serializer path used by
+`DataViewSet.fast_list` against DRF `ModelSerializer(many=True)`.
+
+Uses the test project settings with an in-memory sqlite database.
+
+Usage:
+
+    python scripts/benchmarks/rest_values_serializer.py [rows]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+import tests.django_tests.project.settings as project_settings  # noqa: E402
+
+settings.configure(
+    **{
+        key: value
+        for key, value in project_settings.__dict__.items()
+        if not key.startswith("_") and key.isupper()
+    }
+)
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from rest_framework import serializers  # noqa: E402
+
+from fullctl.django.models import Organization, Task  # noqa: E402
+from fullctl.django.rest.renderers import dumps  # noqa: E402
+from fullctl.django.rest.serializers.values import compile_serializer  # noqa: E402
+
+
+class TaskSerializer(serializers.ModelSerializer):
+    org_slug = serializers.SlugRelatedField(
+        source="org", slug_field="slug", read_only=True
+    )
+    org_name = serializers.CharField(source="org.name", read_only=True)
+
+    class Meta:
+        model = Task
+        fields = [
+            "id",
+            "op",
+            "status",
+            "time",
+            "created",
+            "updated",
+            "limit_id",
+            "queue_id",
+            "parent",
+            "org",
+            "org_slug",
+            "org_name",
+        ]
+
+
+def setup(rows):
+    call_command("migrate", verbosity=0)
+    org = Organization.objects.create(name="bench", slug="bench")
+    Task.objects.bulk_create(
+        [Task(op="bench", param_json="{}", org=org) for _ in range(rows)]
+    )
+
+
+def bench(label, fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        t_start = time.perf_counter()
+        data = fn()
+        elapsed = time.perf_counter() - t_start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<24} {best * 1000:8.1f} ms")
+    return data
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    setup(rows)
+
+    qset = Task.objects.select_related("org").order_by("id")
+    compiled = compile_serializer(TaskSerializer())
+
+    print(f"{rows} rows")
+    drf = bench("ModelSerializer", lambda: TaskSerializer(qset.all(), many=True).data)
+    fast = bench("compiled values_list", lambda: compiled.serialize(qset.all()))
+
+    assert dumps(drf) == dumps(fast), "output differs"
+    print("output identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,18 @@
 Auditlogging functionality
 """
 
+import atexit
 import contextvars
+import functools
 import inspect
 import json
+import queue
+import threading
 
+import structlog
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection, transaction
 from django.db.models import ForeignKey, ManyToManyField, OneToOneField
 from django.http import HttpRequest
 from rest_framework.request import Request
@@ -16,6 +23,8 @@ from fullctl.django.models import AuditLog, Organization
 
 User = get_user_model()
 
+logger = structlog.get_logger(__name__)
+
 CTX_VARS = {
     "user": contextvars.ContextVar("auditlog_user"),
     "org": contextvars.ContextVar("auditlog_org"),
@@ -77,18 +86,47 @@ def model_tag(model):
         return model.__name__.lower()
 
 
+def _model_class(model):
+    if isinstance(model, type):
+        return model
+    return type(model)
+
+
+@functools.cache
+def _get_config(model):
+    return getattr(model, "AuditLog", None)
+
+
 def get_config(model):
     """
     Returns the AuditLog meta class for the model if it
     exists.
 
     Will raise AttributeError if it does not exist
+
+    The lookup is cached per model class.
     """
 
-    return model.AuditLog
+    config = _get_config(_model_class(model))
+
+    if config is None:
+        raise AttributeError(f"{model} has no AuditLog config")
+
+    return config
 
 
 def get_fields(model):
+    """
+    Returns the names of the fields included in auditlog snapshots
+    of the model (class or instance)
+
+    The field list is built once per model class.
+    """
+    return list(_get_fields(_model_class(model)))
+
+
+@functools.cache
+def _get_fields(model):
     fields = []
     for field in model._meta.get_fields():
         if field.is_relation:
@@ -101,10 +139,10 @@ def get_fields(model):
     try:
         conf = get_config(model)
     except AttributeError:
-        return fields
+        return tuple(fields)
 
     fields += getattr(conf, "fields", [])
-    return list(set(fields))
+    return tuple(set(fields))
 
 
 def is_enabled(model):
@@ -149,9 +187,13 @@ class Context:
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        if not exc_type:
-            for entry in self.entries:
-                entry.save()
+        if not exc_type and self.entries:
+            if getattr(settings, "AUDITLOG_DEFER", False):
+                # hand the entries to the background writer once the
+                # current transaction is committed
+                transaction.on_commit(functools.partial(get_writer().put, self.entries))
+            else:
+                AuditLog.objects.bulk_create(self.entries)
 
         for name, field in self.fields.items():
             if field["token"]:
@@ -217,6 +259,105 @@ class Context:
         self.entries.append(entry)
 
 
+class Writer:
+    """
+    Persists auditlog entries from a background thread
+
+    Entries queued with `put` are written with `bulk_create`, entries
+    queued while a write is in progress are combined into the next one.
+    """
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        atexit.register(self.close)
+
+    def _start(self):
+        if self._thread is not None:
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="auditlog-writer", daemon=True
+                )
+                self._thread.start()
+
+    def put(self, entries):
+        self.queue.put(list(entries))
+        self._start()
+
+    def flush(self):
+        """
+        Block until all queued entries are written
+        """
+        if self._thread is not None:
+            self.queue.join()
+
+    def _write(self, entries):
+        try:
+            close_old_connections()
+            AuditLog.objects.bulk_create(entries, batch_size=self.batch_size)
+        except Exception as exc:
+            logger.error("auditlog write failed", error=str(exc), entries=len(entries))
+
+    def _run(self):
+        stopped = False
+
+        while not stopped:
+            batches = [self.queue.get()]
+
+            while True:
+                try:
+                    batches.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            entries = []
+            for batch in batches:
+                if batch is None:
+                    stopped = True
+                else:
+                    entries.extend(batch)
+
+            if entries:
+                self._write(entries)
+
+            for _ in batches:
+                self.queue.task_done()
+
+        connection.close()
+
+    def close(self):
+        """
+        Write remaining entries and stop the background thread
+        """
+
+        if self._thread is not None:
+            self.queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """
+    Returns the process wide auditlog `Writer`
+    """
+    global _writer
+
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = Writer()
+    return _writer
+
+
 class auditlog:
     """
     decorator for auditlog context
@@ -7,6 +7,7 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.db import transaction
+from grainy.core import Namespace
 from social_django.models import UserSocialAuth
 
 import fullctl.django.models.concrete.account as account_models
@@ -26,8 +27,111 @@ class RemotePermissionsError(IOError):
         super().__init__(msg)
 
 
-class Permissions(django_grainy.util.Permissions):
-    pass
+class PermissionMatcher:
+    """
+    Memoizing permission matcher for a grainy permission set
+
+    Permission flags are resolved once per namespace and kept for the
+    lifetime of the matcher, checks for any operation on a namespace
+    that was seen before are a dict lookup.
+
+    If no rule in the set uses wildcards, the flags of a namespace are
+    the flags of its longest prefix that has a rule, which is resolved
+    from a dict of the rules instead of walking the grainy index.
+    Otherwise namespaces are resolved by the permission set.
+
+    The matcher is bound to the permission set's index, which grainy
+    rebuilds on every change to the set, see `matches`.
+    """
+
+    def __init__(self, pset):
+        self.pset = pset
+        self.index = pset.index
+
+        # (namespace, explicit) -> flags
+        self.flags = {}
+
+        # (namespace, level, explicit) -> bool, for namespaces with "?" keys
+        self.expanded = {}
+
+        self.rules = None
+        if not any("*" in permission.namespace.keys for permission in pset):
+            self.rules = {
+                tuple(permission.namespace.keys): permission.value
+                for permission in pset
+            }
+
+    def matches(self, pset) -> bool:
+        """
+        Returns whether the matcher is valid for the permission set
+        """
+        return pset is self.pset and pset.index is self.index
+
+    def get_permissions(self, namespace: str, explicit: bool = False) -> int:
+        key = (namespace, explicit)
+
+        try:
+            return self.flags[key]
+        except KeyError:
+            pass
+
+        if self.rules is None:
+            flags = self.pset.get_permissions(namespace, explicit=explicit)
+        else:
+            keys = tuple(Namespace(namespace).keys)
+            if explicit:
+                flags = self.rules.get(keys, 0)
+            else:
+                flags = 0
+                for length in range(len(keys), 0, -1):
+                    value = self.rules.get(keys[:length])
+                    if value is not None:
+                        flags = value
+                        break
+
+        self.flags[key] = flags
+        return flags
+
+    def check(self, namespace: str, level: int, explicit: bool = False) -> bool:
+        if "?" in namespace:
+            key = (namespace, level, explicit)
+            if key not in self.expanded:
+                self.expanded[key] = self.pset.check(
+                    namespace, level, explicit=explicit
+                )
+            return self.expanded[key]
+
+        return (self.get_permissions(namespace, explicit=explicit) & level) != 0
+
+
+class MatcherMixin:
+    """
+    Resolves permission checks through a `PermissionMatcher`
+
+    Permission objects are created per request (see `permissions`), so
+    check results are memoized for the request.
+    """
+
+    @property
+    def matcher(self) -> PermissionMatcher:
+        matcher = getattr(self, "_matcher", None)
+        if matcher is None or not matcher.matches(self.pset):
+            matcher = self._matcher = PermissionMatcher(self.pset)
+        return matcher
+
+    def match(self, target, permissions, explicit=False) -> bool:
+        return self.matcher.check(
+            django_grainy.util.namespace(target),
+            django_grainy.util.int_flags(permissions),
+            explicit=explicit,
+        )
+
+
+class Permissions(MatcherMixin, django_grainy.util.Permissions):
+    def check(self, target, permissions, explicit=False, ignore_grant_all=False):
+        if self.grant_all and not ignore_grant_all:
+            return True
+        return self.match(target, permissions, explicit=explicit)
 
 
 def require_user(aaactl_user_id):
@@ -63,7 +167,7 @@ def require_user(aaactl_user_id):
     return user
 
 
-class RemotePermissions(django_grainy.remote.Permissions):
+class RemotePermissions(MatcherMixin, django_grainy.remote.Permissions):
     """
     Permissions are provided from the oauth instance.
 
@@ -73,6 +177,12 @@ class RemotePermissions(django_grainy.remote.Permissions):
     def __init__(self, obj):
         super().__init__(obj, **settings.GRAINY_REMOTE)
 
+    def check(self, target, permissions, explicit=False, **kwargs):
+        if not self.url_load:
+            return super().check(target, permissions, explicit=explicit, **kwargs)
+        self.load()
+        return self.match(target, permissions, explicit=explicit)
+
     @transaction.atomic
     def handle_impersonation(self, response):
         """
@@ -0,0 +1,253 @@
+"""
+In-memory autocomplete index
+
+Objects are loaded from a fetch function (e.g. a service bridge listing)
+and indexed by their search keys, queries are answered from the index
+without calling the service.
+
+- prefix matches on the full key and each of its words through a sorted
+  token list
+- substring matches through a trigram index for queries of 3 or more
+  characters (can be disabled)
+
+The index is refreshed in a background thread once it is older than its
+`ttl`, the previous index keeps answering queries until the new one is
+built. A cold index returns None from `search` so callers can fall back
+to querying the service.
+
+## Python API usage
+
+from fullctl.django.autocomplete.index import AutocompleteIndex
+
+index = AutocompleteIndex(
+    lambda: pdbctl.Network().objects(),
+    lambda net: [net.name, str(net.asn)],
+)
+results = index.search("cloud", limit=20)
+"""
+
+import bisect
+import re
+import threading
+import time
+
+import structlog
+
+__all__ = ["AutocompleteIndex"]
+
+logger = structlog.get_logger(__name__)
+
+WORD_SPLIT = re.compile(r"[\W_]+")
+
+# seconds to wait before retrying a failed refresh
+RETRY_INTERVAL = 60
+
+# match ranks, lower is better
+RANK_EXACT = 0
+RANK_PREFIX = 1
+RANK_WORD_PREFIX = 2
+RANK_SUBSTRING = 3
+
+
+def normalize(value):
+    return str(value).strip().lower()
+
+
+def trigrams(value):
+    return {value[i : i + 3] for i in range(len(value) - 2)}
+
+
+class _Index:
+    """
+    Immutable index data, swapped as a whole on refresh
+    """
+
+    def __init__(self, objects, keys, substring=True):
+        self.objects = objects
+        self.substring = substring
+        # normalized search keys per object
+        self.keys = []
+        # sorted (token, object index, is full key) tuples
+        tokens = []
+        # trigram -> set of object indexes
+        self.trigrams = {}
+
+        for idx, obj in enumerate(objects):
+            obj_keys = [normalize(key) for key in keys(obj) if key is not None]
+            obj_keys = [key for key in obj_keys if key]
+            self.keys.append(obj_keys)
+
+            for key in obj_keys:
+                tokens.append((key, idx, True))
+                for word in WORD_SPLIT.split(key):
+                    if word and word != key:
+                        tokens.append((word, idx, False))
+                if not substring:
+                    continue
+                for trigram in trigrams(key):
+                    self.trigrams.setdefault(trigram, set()).add(idx)
+
+        tokens.sort()
+        self.tokens = tokens
+        self.token_values = [token[0] for token in tokens]
+
+    def prefix_matches(self, q, max_candidates):
+        """
+        Returns a dict of object index -> rank for keys and words
+        starting with `q`
+        """
+        matches = {}
+        start = bisect.bisect_left(self.token_values, q)
+
+        for token, idx, full in self.tokens[start : start + max_candidates]:
+            if not token.startswith(q):
+                break
+            if full:
+                rank = RANK_EXACT if token == q else RANK_PREFIX
+            else:
+                rank = RANK_WORD_PREFIX
+            if rank < matches.get(idx, RANK_SUBSTRING + 1):
+                matches[idx] = rank
+
+        return matches
+
+    def substring_matches(self, q, max_candidates):
+        """
+        Returns the object indexes with a key containing `q`
+        """
+        candidates = None
+
+        # intersect the smallest sets first
+        for trigram in sorted(trigrams(q), key=lambda t: len(self.trigrams.get(t, ()))):
+            found = self.trigrams.get(trigram)
+            if not found:
+                return set()
+            candidates = set(found) if candidates is None else candidates & found
+            if not candidates:
+                return set()
+
+        matches = set()
+        for idx in candidates:
+            if any(q in key for key in self.keys[idx]):
+                matches.add(idx)
+                if len(matches) >= max_candidates:
+                    break
+        return matches
+
+    def search(self, q, limit, max_candidates):
+        matches = self.prefix_matches(q, max_candidates)
+
+        if self.substring and len(q) >= 3:
+            for idx in self.substring_matches(q, max_candidates):
+                matches.setdefault(idx, RANK_SUBSTRING)
+
+        def sort_key(idx):
+            key = self.keys[idx][0] if self.keys[idx] else ""
+            return (matches[idx], len(key), key)
+
+        return [self.objects[idx] for idx in sorted(matches, key=sort_key)[:limit]]
+
+
+class AutocompleteIndex:
+    """
+    Periodically refreshed in-memory autocomplete index
+    """
+
+    def __init__(self, fetch, keys, ttl=3600, max_candidates=5000, substring=True):
+        """
+        Arguments:
+
+        - fetch: Callable returning an iterable of the objects to index
+        - keys: Callable returning the search keys (strings) of an object,
+          the first key is used to rank matches of equal quality by length
+        - ttl: Seconds after which the index is refreshed
+        - max_candidates: Maximum number of matches considered per query
+        - substring: Also match keys containing the query, if False only
+          keys and words starting with the query match
+        """
+        self.fetch = fetch
+        self.keys = keys
+        self.substring = substring
+        self.ttl = ttl
+        self.max_candidates = max_candidates
+        self._index = None
+        self._built = 0
+        self._failed = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self._index is not None
+
+    @property
+    def stale(self):
+        return time.time() - self._built > self.ttl
+
+    def refresh(self):
+        """
+        Fetch the objects and rebuild the index
+        """
+        t_start = time.time()
+        index = _Index(list(self.fetch()), self.keys, substring=self.substring)
+        self._index = index
+        self._built = time.time()
+        logger.debug(
+            "autocomplete index refreshed",
+            objects=len(index.objects),
+            duration=self._built - t_start,
+        )
+
+    def _refresh_background(self):
+        try:
+            self.refresh()
+        except Exception as exc:
+            self._failed = time.time()
+            logger.error("autocomplete index refresh failed", error=str(exc))
+        finally:
+            self._thread = None
+
+    def refresh_async(self):
+        """
+        Start a background refresh unless one is running or the
+        last one failed recently
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            if time.time() - self._failed < min(self.ttl, RETRY_INTERVAL):
+                return
+            self._thread = threading.Thread(
+                target=self._refresh_background, daemon=True
+            )
+            self._thread.start()
+
+    def wait(self, timeout=None):
+        """
+        Wait for a running background refresh to finish
+        """
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def search(self, q, limit=50):
+        """
+        Returns up to `limit` objects matching `q`, best matches first
+
+        Returns None if the index has not been built yet, a background
+        refresh is started if the index is cold or stale.
+        """
+        if self._index is None or self.stale:
+            self.refresh_async()
+
+        index = self._index
+
+        if index is None:
+            return None
+
+        q = normalize(q)
+
+        if not q:
+            return index.objects[:limit]
+
+        return index.search(q, limit, self.max_candidates)
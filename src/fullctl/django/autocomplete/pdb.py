@@ -1,13 +1,92 @@
 from dal import autocomplete
+from django.conf import settings
 
 import fullctl.service_bridge.pdbctl as pdbctl
+from fullctl.django.autocomplete.index import AutocompleteIndex
+
+# maximum number of results returned for a query
+SEARCH_LIMIT = 50
+
+# page size used when loading the indexes from pdbctl
+INDEX_PAGE_SIZE = 5000
+
+INDEXES = {}
+
+
+def get_index(name, fetch, keys, **kwargs):
+    """
+    Returns the local autocomplete index `name`, creating it if needed,
+    extra keyword arguments are passed to `AutocompleteIndex`
+
+    Returns None if `PDB_AUTOCOMPLETE_INDEX` is disabled.
+    """
+    if not getattr(settings, "PDB_AUTOCOMPLETE_INDEX", False):
+        return None
+
+    if name not in INDEXES:
+        INDEXES[name] = AutocompleteIndex(
+            fetch,
+            keys,
+            ttl=getattr(settings, "PDB_AUTOCOMPLETE_INDEX_TTL", 3600),
+            **kwargs,
+        )
+    return INDEXES[name]
+
+
+def ix_index():
+    return get_index(
+        "ix",
+        lambda: pdbctl.InternetExchange().objects(page_size=INDEX_PAGE_SIZE),
+        lambda ix: [ix.name],
+    )
+
+
+def net_index():
+    return get_index(
+        "net",
+        lambda: pdbctl.Network().objects(page_size=INDEX_PAGE_SIZE),
+        lambda net: [net.name, str(net.asn), f"as{net.asn}"],
+    )
+
+
+def asn_index():
+    """
+    Networks indexed by asn only, prefix matches like the `q_asn`
+    pdbctl lookup used while the index is cold
+    """
+    return get_index(
+        "asn",
+        lambda: pdbctl.Network().objects(page_size=INDEX_PAGE_SIZE),
+        lambda net: [str(net.asn), f"as{net.asn}"],
+        substring=False,
+    )
+
+
+def org_index():
+    return get_index(
+        "org",
+        lambda: pdbctl.Organization().objects(page_size=INDEX_PAGE_SIZE),
+        lambda org: [org.name],
+    )
+
+
+def search(index, q, limit=SEARCH_LIMIT):
+    """
+    Search a local index, returns None if the index is disabled
+    or cold and pdbctl should be queried instead
+    """
+    if index is None:
+        return None
+    return index.search(q, limit=limit)
 
 
 class peeringdb_ix(autocomplete.Select2QuerySetView):
     def get_queryset(self):
         if not self.q:
             return []
-        qs = [o for o in pdbctl.InternetExchange().objects(q=self.q)]
+        qs = search(ix_index(), self.q)
+        if qs is None:
+            qs = [o for o in pdbctl.InternetExchange().objects(q=self.q)]
         return qs
 
     def get_result_label(self, ix):
@@ -16,7 +95,17 @@ class peeringdb_ix(autocomplete.Select2QuerySetView):
 
 class peeringdb_asn(autocomplete.Select2QuerySetView):
     def get_queryset(self):
-        qs = list(pdbctl.Network().objects(q_asn=self.q))
+        if not self.q:
+            # with a blank query we show the first N networks of
+            # the local index, pdbctl is not queried
+            index = asn_index()
+            if index is None:
+                return []
+            qs = index.search("", limit=settings.AUTOCOMPLETE_NUM_BLANK_QUERY_RESULTS)
+            return qs or []
+        qs = search(asn_index(), self.q)
+        if qs is None:
+            qs = list(pdbctl.Network().objects(q_asn=self.q))
         return qs
 
     def get_result_label(self, item):
@@ -28,11 +117,15 @@ class peeringdb_asn(autocomplete.Select2QuerySetView):
 
 class peeringdb_net(peeringdb_asn):
     def get_queryset(self):
-        qs = list(pdbctl.Network().objects(q=self.q, limit=50))
+        qs = search(net_index(), self.q)
+        if qs is None:
+            qs = list(pdbctl.Network().objects(q=self.q, limit=SEARCH_LIMIT))
         return qs
 
 
 class peeringdb_org(autocomplete.Select2QuerySetView):
     def get_queryset(self):
-        qs = pdbctl.Organization().objects(q=self.q)
+        qs = search(org_index(), self.q)
+        if qs is None:
+            qs = pdbctl.Organization().objects(q=self.q)
         return qs
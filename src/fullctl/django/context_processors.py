@@ -1,15 +1,28 @@
 from datetime import datetime
+from functools import cached_property, partial
 
 import structlog
 from django.conf import settings
+from django.core.cache import cache
 from django.http import HttpRequest
+from django.utils.functional import SimpleLazyObject
 
 from fullctl.django.auth import RemotePermissionsError
+from fullctl.django.models import Organization
 from fullctl.django.util import DEFAULT_FULLCTL_BRANDING
-from fullctl.service_bridge.aaactl import OrganizationBranding, ServiceApplication
+from fullctl.service_bridge.aaactl import (
+    OrganizationBranding,
+    ServiceApplication,
+    ServiceApplicationObject,
+)
 
 log = structlog.get_logger("django")
 
+# bumped to invalidate the account service cache for all orgs
+ACCOUNT_SERVICE_CACHE_GENERATION_KEY = "fullctl:account_service:generation"
+
+ACCOUNT_SERVICE_CACHE_MISS = object()
+
 
 def conf(request):
     return {
@@ -60,23 +73,74 @@ def request_can_see_service(request: HttpRequest, service_slug: str) -> bool:
     return perms.check(f"service.{service_slug}.{org.permission_id}", "r")
 
 
-def account_service(request):
-    context = {}
-    org = getattr(request, "org", None)
-    context["org_branding"] = {}
+def _cache_key(kind: str, org_slug: str) -> str:
+    generation = cache.get(ACCOUNT_SERVICE_CACHE_GENERATION_KEY, 0)
+    return (
+        f"fullctl:account_service:{generation}:{settings.SERVICE_TAG}:{kind}:{org_slug}"
+    )
+
+
+def _cached(kind: str, org_slug: str, fetch):
+    """
+    Returns the `fetch()` result for the org from the django cache,
+    fetching and caching it on a miss
+
+    Results need to be picklable, cache errors are logged and the result
+    is returned uncached.
+    """
+
+    timeout = getattr(settings, "ACCOUNT_SERVICE_CACHE_EXPIRY", 0)
+
+    if not timeout:
+        return fetch()
+
+    key = _cache_key(kind, org_slug)
+    value = cache.get(key, ACCOUNT_SERVICE_CACHE_MISS)
+
+    if value is not ACCOUNT_SERVICE_CACHE_MISS:
+        return value
+
+    value = fetch()
+
+    try:
+        cache.set(key, value, timeout)
+    except Exception as exc:
+        log.warning("Could not cache account service context", kind=kind, error=exc)
 
-    if org:
-        org_slug = org.slug
-    else:
-        org_slug = ""
+    return value
+
+
+def invalidate_account_service_cache(org_slug: str | None = None):
+    """
+    Drops the cached branding, service application and trial snapshots
+    of an org, or of all orgs if no org slug is passed
+    """
+
+    if org_slug is None:
+        try:
+            cache.incr(ACCOUNT_SERVICE_CACHE_GENERATION_KEY)
+        except ValueError:
+            cache.set(ACCOUNT_SERVICE_CACHE_GENERATION_KEY, 1, None)
+        return
+
+    cache.delete_many(
+        [
+            _cache_key(kind, org_slug)
+            for kind in ("branding", "service_applications", "trial_available")
+        ]
+    )
+
+
+def branding_snapshot(org_slug: str) -> dict | None:
+    """
+    Returns the org branding context for the org or None if no
+    branding applies to it
+    """
 
     local_auth = getattr(settings, "USE_LOCAL_PERMISSIONS", False)
     branding_override = getattr(settings, "BRANDING_ORG", None)
     branding = None
 
-    # start by setting a default branding
-    context["org_branding"] = DEFAULT_FULLCTL_BRANDING
-
     # if there is a branding_override set in the settings for the instance
     # use that (this is the highest priority branding setting)
     if branding_override:
@@ -114,100 +178,172 @@ def account_service(request):
     # TODO: supprt host for branding
     # http_host = request.get_host()
 
-    # a branding was selected, prepare the context
-    if branding:
-        context["org_branding"] = {
-            "name": branding.org_name,
-            "html_footer": branding.html_footer,
-            "css": branding.css,
-            "dark_logo_url": branding.dark_logo_url,
-            "light_logo_url": branding.light_logo_url,
-            # using getattr for backwards compatibility with
-            # old aaactl versions
-            "favicon_url": getattr(branding, "favicon_url", None),
-            "custom_org": True,
-            "show_logo": branding.show_logo,
-        }
+    if not branding:
+        return None
+
+    return {
+        "name": branding.org_name,
+        "html_footer": branding.html_footer,
+        "css": branding.css,
+        "dark_logo_url": branding.dark_logo_url,
+        "light_logo_url": branding.light_logo_url,
+        # using getattr for backwards compatibility with
+        # old aaactl versions
+        "favicon_url": getattr(branding, "favicon_url", None),
+        "custom_org": True,
+        "show_logo": branding.show_logo,
+    }
 
-    if not context["org_branding"].get("dark_logo_url", None):
-        service_logo_dark = f"{settings.SERVICE_TAG}/logo-darkbg.svg"
-    else:
-        service_logo_dark = context["org_branding"].get("dark_logo_url")
-
-    if not context["org_branding"].get("light_logo_url", None):
-        service_logo_light = f"{settings.SERVICE_TAG}/logo-lightbg.svg"
-    else:
-        service_logo_light = context["org_branding"].get("light_logo_url")
-
-    if not context["org_branding"].get("name", None):
-        logo_alt_text = settings.SERVICE_TAG
-        service_name = settings.SERVICE_TAG.replace("ctl", "")
-    else:
-        logo_alt_text = context["org_branding"].get("name")
-        service_name = context["org_branding"].get("name")
-
-    service_tag = settings.SERVICE_TAG
-
-    # TODO abstract so other auth services can be
-    # defined
-    context.update(
-        account_service={
-            "urls": {
-                "billing_setup": f"{settings.OAUTH_TWENTYC_URL}/billing/setup?org={org_slug}",
-                "manage_account": f"{settings.OAUTH_TWENTYC_URL}/account/",
-                # TODO: flesh out to redirect to org/create
-                "create_org": f"{settings.OAUTH_TWENTYC_URL}/account/",
-                "manage_org": f"{settings.OAUTH_TWENTYC_URL}/account/?org=org_slug",
-            },
-        },
-        oauth_manages_org=not local_auth,
-        service_logo_dark=service_logo_dark,
-        service_logo_light=service_logo_light,
-        service_tag=service_tag,
-        service_name=service_name,
-        logo_alt_text=logo_alt_text,
-    )
 
-    if settings.OAUTH_TWENTYC_URL:
-        context.update(
-            service_applications=[
-                # we call sanitize() to remove the `config` attribute
-                # as that may contain sensitive information
-                # that we don't necessarily want to expose to the template
-                # context
-                service_application.for_org(org).sanitize()
-                for service_application in ServiceApplication().objects(
-                    group="fullctl", org=(org_slug or None)
-                )
-                # only show services that the user has access to
-                if request_can_see_service(request, service_application.slug)
-            ],
+def service_applications_snapshot(org_slug: str) -> list[dict]:
+    """
+    Returns the fullctl service applications for the org as
+    a list of dicts
+
+    The `config` attribute is not included, as it may contain
+    sensitive information and the snapshot is stored in the
+    shared django cache.
+    """
+
+    rows = []
+    for service_application in ServiceApplication().objects(
+        group="fullctl", org=(org_slug or None)
+    ):
+        row = service_application.json_dict
+        row.pop("config", None)
+        rows.append(row)
+    return rows
+
+
+class AccountServiceContext:
+    """
+    Resolves the `account_service` context values of a request
+
+    Branding and service applications are fetched from aaactl once per
+    request, and only when a template uses a value depending on them.
+    The aaactl results are cached per org in the django cache (shared
+    between workers) for ACCOUNT_SERVICE_CACHE_EXPIRY seconds.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.org = getattr(request, "org", None)
+        self.org_slug = self.org.slug if self.org else ""
+        self.local_auth = getattr(settings, "USE_LOCAL_PERMISSIONS", False)
+
+    @cached_property
+    def org_branding(self) -> dict:
+        branding = _cached(
+            "branding", self.org_slug, lambda: branding_snapshot(self.org_slug)
+        )
+
+        # a branding was selected, otherwise use the default branding
+        return branding or DEFAULT_FULLCTL_BRANDING
+
+    @property
+    def service_logo_dark(self) -> str:
+        return self.org_branding.get("dark_logo_url", None) or (
+            f"{settings.SERVICE_TAG}/logo-darkbg.svg"
+        )
+
+    @property
+    def service_logo_light(self) -> str:
+        return self.org_branding.get("light_logo_url", None) or (
+            f"{settings.SERVICE_TAG}/logo-lightbg.svg"
+        )
+
+    @property
+    def logo_alt_text(self) -> str:
+        return self.org_branding.get("name", None) or settings.SERVICE_TAG
+
+    @property
+    def service_name(self) -> str:
+        return self.org_branding.get("name", None) or settings.SERVICE_TAG.replace(
+            "ctl", ""
         )
 
-    # load this applications information from aaactl
-    # into `service_info` variable
-
-    for svc_app in context.get("service_applications", []):
-        if svc_app.slug != settings.SERVICE_TAG:
-            continue
-
-        context.update(service_info=svc_app)
-        break
-
-    if local_auth:
-        context["service_info"] = {
-            "name": (
-                f"{settings.SERVICE_TAG} {context['org_branding']['name']}"
-                if context["org_branding"].get("name", None)
-                else settings.SERVICE_TAG
-            ),
-            "slug": settings.SERVICE_TAG,
-            "description": "Local permissions",
-            "org_has_access": True,
-            "org_namespace": settings.SERVICE_TAG,
+    @cached_property
+    def service_applications(self) -> list:
+        rows = _cached(
+            "service_applications",
+            self.org_slug,
+            lambda: service_applications_snapshot(self.org_slug),
+        )
+
+        return [
+            # we call sanitize() to remove the `config` attribute
+            # as that may contain sensitive information
+            # that we don't necessarily want to expose to the template
+            # context
+            ServiceApplicationObject(**row).for_org(self.org).sanitize()
+            for row in rows
+            # only show services that the user has access to
+            if request_can_see_service(self.request, row["slug"])
+        ]
+
+    @cached_property
+    def service_info(self):
+        if self.local_auth:
+            return {
+                "name": (
+                    f"{settings.SERVICE_TAG} {self.org_branding['name']}"
+                    if self.org_branding.get("name", None)
+                    else settings.SERVICE_TAG
+                ),
+                "slug": settings.SERVICE_TAG,
+                "description": "Local permissions",
+                "org_has_access": True,
+                "org_namespace": settings.SERVICE_TAG,
+            }
+
+        # load this applications information from aaactl
+        for svc_app in self.service_applications:
+            if svc_app.slug == settings.SERVICE_TAG:
+                return svc_app
+
+        return None
+
+    def context(self) -> dict:
+        org_slug = self.org_slug
+
+        # TODO abstract so other auth services can be
+        # defined
+        context = {
+            "account_service": {
+                "urls": {
+                    "billing_setup": f"{settings.OAUTH_TWENTYC_URL}/billing/setup?org={org_slug}",
+                    "manage_account": f"{settings.OAUTH_TWENTYC_URL}/account/",
+                    # TODO: flesh out to redirect to org/create
+                    "create_org": f"{settings.OAUTH_TWENTYC_URL}/account/",
+                    "manage_org": f"{settings.OAUTH_TWENTYC_URL}/account/?org=org_slug",
+                },
+            },
+            "oauth_manages_org": not self.local_auth,
+            "service_tag": settings.SERVICE_TAG,
         }
 
-    return context
+        lazy = [
+            "org_branding",
+            "service_logo_dark",
+            "service_logo_light",
+            "service_name",
+            "logo_alt_text",
+        ]
+
+        if settings.OAUTH_TWENTYC_URL:
+            lazy.append("service_applications")
+
+        if settings.OAUTH_TWENTYC_URL or self.local_auth:
+            lazy.append("service_info")
+
+        for name in lazy:
+            context[name] = SimpleLazyObject(partial(getattr, self, name))
+
+        return context
+
+
+def account_service(request):
+    return AccountServiceContext(request).context()
 
 
 def permissions(request):
@@ -228,7 +364,7 @@ def permissions(request):
     if not hasattr(request, "org"):
         return {"permissions": {}}
 
-    is_accessible = request.org in request.org.accessible(request.user)
+    is_accessible = Organization.is_accessible(request.user, request.org)
 
     for op, name in ops:
         key = f"{name}_instance"
@@ -250,13 +386,15 @@ def trial_available(request):
     available for the requesting organization at the service
     """
 
-    service = ServiceApplication()
+    org_slug = request.org.slug
+
+    def fetch():
+        return ServiceApplication().trial_available(
+            org_slug=org_slug, service_slug=settings.SERVICE_TAG
+        )
 
     return {
-        "trial_available": service.trial_available(
-            {
-                "org_slug": request.org.slug,
-                "service_slug": settings.SERVICE_TAG,
-            }
+        "trial_available": SimpleLazyObject(
+            lambda: _cached("trial_available", org_slug, fetch)
         )
     }
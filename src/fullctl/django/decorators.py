@@ -63,7 +63,7 @@ class load_instance:
 
         def wrapped(request, *args, **kwargs):
             org = request.org
-            if not public and org not in Organization.accessible(request.user):
+            if not public and not Organization.is_accessible(request.user, org):
                 if request.user.is_authenticated and not getattr(
                     request, "impersonating", None
                 ):
@@ -1,9 +1,31 @@
 """
 Defines an extendible healthcheck process for FullCtl services.
+
+Checks are run by `check_all`:
+
+- checks registered with `database=True` (this includes the built-in
+  task and db checks) are not run concurrently, they run one after
+  another in the calling thread so they share its database connection.
+  On postgresql their timeout is applied as a statement timeout, on
+  other databases they run without a timeout
+- other checks run concurrently in a thread pool, a check that does not
+  finish within its timeout is reported as failed
+
+Results are cached in the django cache for `HEALTH_CHECK_CACHE_TTL`
+seconds, so frequent probes from several workers share one run.
 """
 
+import concurrent.futures
+import contextlib
+import contextvars
+import functools
+import hashlib
+import threading
+import time
+
 from django.conf import settings
-from django.db import connection
+from django.core.cache import cache
+from django.db import connection, connections, transaction
 from django.utils import timezone
 
 from fullctl.django.models.concrete.tasks import (
@@ -23,10 +45,19 @@ __all__ = [
 # holds all registered health checks
 HEALTH_CHECKS = {}
 
+# holds the options (timeout, database) of registered health checks
+HEALTH_CHECK_OPTIONS = {}
+
 HEALTH_CHECK_TASK_INTERVAL_SECONDS = getattr(
     settings, "HEALTH_CHECK_TASK_INTERVAL_SECONDS", 20
 )
 
+# results shared by the checks of a single `check_all` run
+_run_cache = contextvars.ContextVar("health_check_run_cache", default=None)
+
+_executor = None
+_executor_lock = threading.Lock()
+
 
 class register:
     """
@@ -35,75 +66,269 @@ class register:
     The function will be called with no arguments.
 
     It should raise an exception if the check fails.
+
+    Arguments:
+
+    - name: Name of the check in the results
+    - timeout: Seconds the check may take, defaults to `HEALTH_CHECK_TIMEOUT`
+    - database: The check queries the database and is run in the calling
+      thread. The timeout of database checks is only enforced on postgresql
+      (as a statement timeout), on other databases they run one after
+      another without a timeout
     """
 
-    def __init__(self, name):
+    def __init__(self, name, timeout=None, database=False):
         self.name = name
+        self.timeout = timeout
+        self.database = database
 
     def __call__(self, func):
         HEALTH_CHECKS[self.name] = func
+        HEALTH_CHECK_OPTIONS[self.name] = {
+            "timeout": self.timeout,
+            "database": self.database,
+        }
         return func
 
 
-def check_all(exclude: list[str] = None) -> dict:
+def run_cached(func):
+    """
+    Decorator that runs `func` once per `check_all` run, checks sharing
+    a query use it to only run the query once
+    """
+
+    @functools.wraps(func)
+    def wrapped():
+        run_cache = _run_cache.get()
+        if run_cache is None:
+            return func()
+        if func not in run_cache:
+            run_cache[func] = func()
+        return run_cache[func]
+
+    return wrapped
+
+
+def get_executor():
+    """
+    Returns the process-wide thread pool health checks are run in
+    """
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=getattr(settings, "HEALTH_CHECK_WORKERS", 4),
+                    thread_name_prefix="health-check",
+                )
+    return _executor
+
+
+@contextlib.contextmanager
+def statement_timeout(seconds):
+    """
+    Applies `seconds` as statement timeout to the queries of the block
+    on postgresql, no-op for other database backends
+
+    The previous timeout is restored when leaving the block. If the caller
+    is in a transaction the atomic block is only a savepoint, releasing it
+    does not undo the transaction-local setting (rolling it back on
+    error does).
+    """
+    if connection.vendor != "postgresql" or not seconds:
+        yield
+        return
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT current_setting('statement_timeout')")
+            previous = cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT set_config('statement_timeout', %s, true)",
+                [str(int(seconds * 1000))],
+            )
+        yield
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('statement_timeout', %s, true)", [previous]
+            )
+
+
+def _result(func, timeout=None):
+    try:
+        with statement_timeout(timeout):
+            func()
+        return {"ok": True}
+    except Exception as exc:
+        return {"ok": False, "error": str(exc)}
+
+
+def _run_threaded(func):
+    try:
+        return _result(func)
+    finally:
+        # close the database connections the check may have opened
+        # in the pool thread
+        connections.close_all()
+
+
+def _cache_key(exclude):
+    digest = hashlib.sha1(",".join(sorted(exclude)).encode()).hexdigest()
+    return f"fullctl:health_check:{digest}"
+
+
+def check_all(exclude: list[str] = None, use_cache: bool = True) -> dict:
     """
     Run all registered health checks.
+
+    Results are cached for `HEALTH_CHECK_CACHE_TTL` seconds unless
+    `use_cache` is False.
     """
+    exclude = exclude or []
+    cache_ttl = getattr(settings, "HEALTH_CHECK_CACHE_TTL", 0)
+
+    if use_cache and cache_ttl:
+        cache_key = _cache_key(exclude)
+        results = cache.get(cache_key)
+        if results is not None:
+            return results
+
+    default_timeout = getattr(settings, "HEALTH_CHECK_TIMEOUT", 5)
+    context = contextvars.copy_context()
+    context.run(_run_cache.set, {})
+
     results = {}
+    futures = {}
+
     for name, func in HEALTH_CHECKS.items():
-        if exclude and name in exclude:
+        if name in exclude:
             results[name] = {"excluded": True, "ok": True}
             continue
+
+        options = HEALTH_CHECK_OPTIONS.get(name, {})
+        if options.get("database"):
+            results[name] = None
+        else:
+            futures[name] = get_executor().submit(
+                context.copy().run, _run_threaded, func
+            )
+
+    # database checks run while the threaded checks are in flight
+    for name, func in HEALTH_CHECKS.items():
+        if name not in futures and results[name] is None:
+            timeout = HEALTH_CHECK_OPTIONS[name]["timeout"] or default_timeout
+            results[name] = context.run(_result, func, timeout)
+
+    t_start = time.monotonic()
+
+    for name, future in futures.items():
+        timeout = HEALTH_CHECK_OPTIONS[name]["timeout"] or default_timeout
         try:
-            func()
-            results[name] = {"ok": True}
-        except Exception as exc:
-            results[name] = {"ok": False, "error": str(exc)}
+            results[name] = future.result(
+                timeout=max(timeout - (time.monotonic() - t_start), 0)
+            )
+        except concurrent.futures.TimeoutError:
+            results[name] = {"ok": False, "error": f"timed out after {timeout}s"}
+
+    # keep the order of registration
+    results = {name: results[name] for name in HEALTH_CHECKS}
+
+    if use_cache and cache_ttl:
+        cache.set(cache_key, results, cache_ttl)
 
     return results
 
 
-@register("task_stack_queue")
-def health_check_task_stack_queue():
+@run_cached
+def task_stats() -> dict:
     """
-    Tests the task stack queue
+    Returns the task queue state used by the task health checks in a
+    single query
+
+    - pending: number of pending tasks, counted up to `MAX_PENDING_TASKS` + 1
+    - stale_pending: a pending task is older than `TASK_MAX_AGE_THRESHOLD` hours
+    - stale_heartbeat: a pending or running task has a heartbeat older than
+      `HEALTH_CHECK_TASK_INTERVAL_SECONDS`
+
+    Every part of the query is bounded, so its cost does not grow with
+    the size of the queue.
     """
+    now = timezone.now()
+
     pending_tasks = Task.objects.filter(status="pending", queue_id__isnull=True)
 
-    if pending_tasks.exists():
-        # check if the number of pending tasks exceeds the max limit
-        if pending_tasks.count() > settings.MAX_PENDING_TASKS:
-            raise TaskLimitError()
+    pending = pending_tasks.values("pk")[: settings.MAX_PENDING_TASKS + 1]
+    stale_pending = pending_tasks.filter(
+        created__lt=now - timezone.timedelta(hours=settings.TASK_MAX_AGE_THRESHOLD)
+    ).values("pk")[:1]
+    stale_heartbeat = stale_heartbeats(now).values("pk")[:1]
 
-        # check if the age of the oldest pending task exceeds the limit
-        threshold_hours = settings.TASK_MAX_AGE_THRESHOLD
-        threshold_datetime = timezone.now() - timezone.timedelta(hours=threshold_hours)
+    parts = []
+    params = []
 
-        old_pending_tasks = pending_tasks.filter(
-            created__lt=threshold_datetime
-        ).exists()
-        if old_pending_tasks:
-            raise TaskMaxAgeError()
+    for template, qset in [
+        ("(SELECT COUNT(*) FROM ({}) pending)", pending),
+        ("EXISTS({})", stale_pending),
+        ("EXISTS({})", stale_heartbeat),
+    ]:
+        sql, qset_params = qset.query.sql_with_params()
+        parts.append(template.format(sql))
+        params.extend(qset_params)
 
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {', '.join(parts)}", params)
+        row = cursor.fetchone()
 
-@register("task_heartbeat")
-def health_check_task_heartbeat():
+    return {
+        "pending": row[0],
+        "stale_pending": bool(row[1]),
+        "stale_heartbeat": bool(row[2]),
+    }
+
+
+def stale_heartbeats(now=None):
     """
-    Tests the task heartbeat
+    Returns the heartbeats of pending and running tasks that have not
+    been updated within `HEALTH_CHECK_TASK_INTERVAL_SECONDS`
     """
-    running_tasks = Task.objects.filter(status__in=["pending", "running"])
-    long_running_task_heartbeats = TaskHeartbeat.objects.filter(
-        timestamp__lte=timezone.now()
+    now = now or timezone.now()
+    return TaskHeartbeat.objects.filter(
+        timestamp__lte=now
         - timezone.timedelta(seconds=HEALTH_CHECK_TASK_INTERVAL_SECONDS),
-        task__in=running_tasks,
+        task__status__in=["pending", "running"],
     )
-    if long_running_task_heartbeats.exists():
+
+
+@register("task_stack_queue", database=True)
+def health_check_task_stack_queue():
+    """
+    Tests the task stack queue
+    """
+    stats = task_stats()
+
+    # check if the number of pending tasks exceeds the max limit
+    if stats["pending"] > settings.MAX_PENDING_TASKS:
+        raise TaskLimitError()
+
+    # check if the age of the oldest pending task exceeds the limit
+    if stats["stale_pending"]:
+        raise TaskMaxAgeError()
+
+
+@register("task_heartbeat", database=True)
+def health_check_task_heartbeat():
+    """
+    Tests the task heartbeat
+    """
+    if task_stats()["stale_heartbeat"]:
+        long_running_task_heartbeats = stale_heartbeats().select_related("task")[:10]
         raise TaskHeartbeatError(
             f"Long running tasks: {[str(task) for task in long_running_task_heartbeats]}"
         )
 
 
-@register("db")
+@register("db", database=True)
 def health_check_db():
     """
     Performs a simple database version query
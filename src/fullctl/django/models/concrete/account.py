@@ -1,8 +1,11 @@
+import hashlib
 from secrets import token_urlsafe
 
 import reversion
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django_grainy.decorators import grainy_model
 
@@ -18,10 +21,28 @@ __all__ = [
 ]
 
 
+# bumped whenever organizations or memberships change, invalidates
+# the cached accessible organization indexes
+ACCESSIBLE_ORGS_GENERATION_KEY = "fullctl:accessible_orgs:generation"
+
+# seconds accessible organization indexes are cached for
+ACCESSIBLE_ORGS_CACHE_EXPIRY = 3600
+
+
 def generate_secret():
     return token_urlsafe()
 
 
+def invalidate_accessible_orgs():
+    """
+    Invalidates the cached accessible organization indexes of all users
+    """
+    try:
+        cache.incr(ACCESSIBLE_ORGS_GENERATION_KEY)
+    except ValueError:
+        cache.set(ACCESSIBLE_ORGS_GENERATION_KEY, 1, None)
+
+
 COLOR_SCHEMES = (
     ("dark", _("Dark")),
     ("light", _("Light")),
@@ -123,21 +144,88 @@ class Organization(HandleRefModel):
         - `list`
         """
 
+        return list(cls.objects.filter(id__in=cls.accessible_ids(user)))
+
+    @classmethod
+    def is_accessible(cls, user, org):
+        """
+        Returns whether the organization is accessible by the user, see
+        `accessible`
+
+        **Arguments**
+
+        - user (`User`)
+        - org (`Organization`)
+
+        **Returns**
+
+        - `bool`
+        """
+
+        return org is not None and org.id in cls.accessible_ids(user)
+
+    @classmethod
+    def accessible_ids(cls, user):
+        """
+        Returns the ids of the organizations that are accessible by the
+        user as a frozenset, see `accessible`
+
+        The index is computed once per permission set of the user and kept
+        on the user's permissions object and in the django cache. Changes
+        to organizations or memberships invalidate cached indexes.
+
+        **Arguments**
+
+        - user (`User`)
+
+        **Returns**
+
+        - `frozenset`
+        """
+
         perms = auth.permissions(user)
 
+        org_ids = getattr(perms, "_fullctl_accessible_org_ids", None)
+        if org_ids is not None:
+            return org_ids
+
+        perms.load()
+
+        if user.pk:
+            digest = hashlib.sha1(
+                repr(
+                    sorted(
+                        (namespace, permission.value)
+                        for namespace, permission in perms.pset.permissions.items()
+                    )
+                ).encode("utf-8")
+            ).hexdigest()
+            generation = cache.get(ACCESSIBLE_ORGS_GENERATION_KEY, 0)
+            cache_key = f"fullctl:accessible_orgs:{generation}:{user.pk}:{digest}"
+            org_ids = cache.get(cache_key)
+        else:
+            cache_key = None
+
+        if org_ids is None:
+            org_ids = cls._accessible_ids(user, perms)
+            if cache_key:
+                cache.set(cache_key, org_ids, ACCESSIBLE_ORGS_CACHE_EXPIRY)
+
+        perms._fullctl_accessible_org_ids = org_ids
+        return org_ids
+
+    @classmethod
+    def _accessible_ids(cls, user, perms):
         # user is a member of these orgs
         if hasattr(user, "org_set"):
-            related_orgs = [o.org for o in user.org_set.all()]
+            org_ids = set(user.org_set.values_list("org_id", flat=True))
         else:
-            related_orgs = []
+            org_ids = set()
 
         # user has permissions to these orgs (customer of)
-        permissioned_orgs = []
-
-        perms.load()
         org_namespaces = perms.pset.expand("?.?", exact=True)
 
-        org_ids = set()
+        remote_ids = set()
 
         for ns in org_namespaces:
             try:
@@ -145,30 +233,108 @@ class Organization(HandleRefModel):
             except (ValueError, IndexError):
                 continue
 
-            org_ids.add(ns[1])
+            remote_ids.add(ns[1])
 
-        orgs_by_id = {
-            org.remote_id: org for org in cls.objects.filter(remote_id__in=org_ids)
-        }
+        org_ids.update(
+            cls.objects.filter(remote_id__in=remote_ids).values_list("id", flat=True)
+        )
 
-        for org in orgs_by_id.values():
-            if org not in related_orgs:
-                permissioned_orgs.append(org)
-
-        return list(set(related_orgs + permissioned_orgs))
+        return frozenset(org_ids)
 
     @classmethod
     def sync(cls, orgs, user, backend):
-        synced = []
+        """
+        Syncs the organizations and memberships of a user from the
+        organization list provided by the authentication service
+
+        Existing organizations and memberships are fetched in one query
+        each and changes are written in bulk, all in a single revision.
+        Memberships to organizations not in the list are removed.
+
+        **Arguments**
+
+        - orgs (`list<dict>`): organization data (`id`, `name`, `slug`,
+          `personal`, `is_default`)
+        - user (`User`)
+        - backend (`str`): authentication backend name
+
+        **Returns**
+
+        - `list<Organization>` in the order of `orgs`
+        """
+
+        fields = ("slug", "name", "personal")
+        orgs_data = {data["id"]: data for data in orgs}
+
         with reversion.create_revision():
             reversion.set_user(user)
-            for org_data in orgs:
-                org = cls.sync_single(org_data, user, backend)
-                synced.append(org)
 
-            for org in user.org_set.exclude(org__remote_id__in=[o["id"] for o in orgs]):
-                org.delete()
-        return synced
+            existing = {
+                org.remote_id: org
+                for org in cls.objects.filter(
+                    remote_id__in=orgs_data.keys(), backend=backend
+                )
+            }
+
+            created = []
+            changed = []
+            now = timezone.now()
+
+            for remote_id, data in orgs_data.items():
+                org = existing.get(remote_id)
+
+                if org is None:
+                    created.append(
+                        cls(
+                            remote_id=remote_id,
+                            backend=backend,
+                            **{field: data[field] for field in fields},
+                        )
+                    )
+                    continue
+
+                if any(getattr(org, field) != data[field] for field in fields):
+                    for field in fields:
+                        setattr(org, field, data[field])
+                    org.updated = now
+                    changed.append(org)
+
+            if created:
+                cls.objects.bulk_create(created)
+                if any(org.pk is None for org in created):
+                    # backend does not return primary keys from bulk inserts
+                    created = list(
+                        cls.objects.filter(
+                            remote_id__in=[org.remote_id for org in created],
+                            backend=backend,
+                        )
+                    )
+
+            if changed:
+                cls.objects.bulk_update(changed, fields + ("updated",))
+
+            for org in created:
+                existing[org.remote_id] = org
+
+            memberships = OrganizationUser.sync_memberships(
+                user,
+                [(existing[remote_id], data) for remote_id, data in orgs_data.items()],
+            )
+
+            for obj in created + changed + memberships:
+                reversion.add_to_revision(obj)
+
+            # memberships the user no longer has are hard deleted, same as
+            # `OrganizationUser.delete()` (fullctl HandleRefModel does
+            # not soft delete), the queryset delete still sends the
+            # delete signals for every row
+            user.org_set.exclude(org__remote_id__in=orgs_data.keys()).delete()
+
+        # memberships were written in bulk, which does not send the signals
+        # that invalidate the accessible organization indexes
+        invalidate_accessible_orgs()
+
+        return [existing[data["id"]] for data in orgs]
 
     @classmethod
     def sync_single(cls, data, user, backend):
@@ -283,6 +449,59 @@ class OrganizationUser(HandleRefModel):
     class HandleRef:
         tag = "org_user"
 
+    @classmethod
+    def sync_memberships(cls, user, orgs):
+        """
+        Creates or updates the user's memberships to the organizations
+
+        **Arguments**
+
+        - user (`User`)
+        - orgs (`list<tuple<Organization, dict>>`): organizations and their
+          data, `is_default` in the data sets the membership's default flag
+
+        **Returns**
+
+        - `list<OrganizationUser>` created or changed memberships
+        """
+
+        memberships = {
+            membership.org_id: membership
+            for membership in user.org_set.filter(org__in=[org for org, _ in orgs])
+        }
+
+        created = []
+        changed = []
+        now = timezone.now()
+
+        for org, data in orgs:
+            is_default = data.get("is_default", False)
+            membership = memberships.get(org.id)
+
+            if membership is None:
+                membership = cls(org=org, user=user, is_default=is_default)
+                memberships[org.id] = membership
+                created.append(membership)
+            elif membership.is_default != is_default:
+                membership.is_default = is_default
+                membership.updated = now
+                changed.append(membership)
+
+        if created:
+            cls.objects.bulk_create(created)
+            if any(membership.pk is None for membership in created):
+                # backend does not return primary keys from bulk inserts
+                created = list(
+                    user.org_set.filter(
+                        org__in=[membership.org for membership in created]
+                    )
+                )
+
+        if changed:
+            cls.objects.bulk_update(changed, ["is_default", "updated"])
+
+        return created + changed
+
     class Meta:
         db_table = "fullctl_org_user"
         verbose_name = _("Organization User")
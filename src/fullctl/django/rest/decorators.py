@@ -11,6 +11,7 @@ from fullctl.django.auth import Permissions, RemotePermissions
 from fullctl.django.models import Instance, Organization
 from fullctl.django.rest.authentication import APIKey
 from fullctl.django.rest.core import HANDLEREF_FIELDS
+from fullctl.django.rest.renderers import StreamingJSONResponse
 from fullctl.service_bridge.client import AaaCtl
 from fullctl.service_bridge.context import ServiceBridgeContext
 
@@ -83,9 +84,17 @@ class grainy_endpoint_response(grainy_rest_viewset_response):
         self.enable_apply_perms = kwargs.pop("enable_apply_perms", True)
 
     def apply_perms(self, request, response, view_function, view):
-        if self.enable_apply_perms:
-            return super().apply_perms(request, response, view_function, view)
-        return response
+        if not self.enable_apply_perms or response.status_code == 304:
+            return response
+
+        if isinstance(response, StreamingJSONResponse):
+            # streamed lists get permissions applied one chunk at a time
+            response.map_chunks(
+                lambda chunk: self._apply_perms(request, chunk, view_function, view)
+            )
+            return response
+
+        return super().apply_perms(request, response, view_function, view)
 
 
 class grainy_endpoint(base):
@@ -216,12 +225,12 @@ class grainy_file_endpoint_response(grainy_endpoint_response):
 class grainy_file_response(grainy_endpoint):
     """
     A decorator for endpoints that return file responses
-    
+
     This is similar to grainy_endpoint but designed to work with
     file responses (FileResponse, StreamingHttpResponse, etc.)
     instead of JSON responses.
     """
-    
+
     def __call__(self, fn):
         decorator = self
 
@@ -100,6 +100,10 @@ class AuditCtlActionLogMixin:
     If the viewset has an auditctl_log_append_path method, it will be
     called to determine additional path components to append to the
     object_id. (auditctl event path)
+
+    If the AUDITCTL_SPOOL setting is enabled and AUDITCTL_SPOOL_PATH is
+    set, events are shipped to auditctl in the background (see
+    `auditctl.EventSpool`) instead of during the request.
     """
 
     def is_action_enabled_for_logging(self, request, ref_tag: str, action: str) -> bool:
@@ -171,6 +175,7 @@ class AuditCtlActionLogMixin:
                 append_path=append_path,
                 username=request.user.username if request.user else None,
                 api_key=api_key[:4] + "..." + api_key[-4:] if api_key else None,
+                spool=auditctl.spool_enabled(),
             )
 
         except Exception as e:
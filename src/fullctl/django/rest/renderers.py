@@ -2,11 +2,21 @@ import datetime
 import json
 
 import django_countries.fields
+from django.conf import settings
 from django.db import connection
+from django.http import StreamingHttpResponse
 from django.utils.encoding import smart_str
 from rest_framework import renderers
 from rest_framework.utils import encoders
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# number of items encoded at once when streaming a list response
+STREAM_CHUNK_SIZE = 500
+
 
 class JSONEncoder(encoders.JSONEncoder):
     """
@@ -26,12 +36,136 @@ class JSONEncoder(encoders.JSONEncoder):
         return encoders.JSONEncoder.default(self, obj)
 
 
+_encoder = JSONEncoder()
+
+
+def dumps(data, indent=None):
+    """
+    Encode data to json bytes
+
+    Uses orjson if it is installed, types orjson does not know about
+    are handled by `JSONEncoder`
+    """
+
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_encoder.default, option=option)
+
+    return json.dumps(data, cls=JSONEncoder, indent=indent).encode("utf-8")
+
+
+def profiling_info():
+    """
+    Returns profiling info for the response container if
+    `REST_PROFILING` is enabled
+    """
+
+    if not getattr(settings, "REST_PROFILING", False):
+        return None
+
+    return {"queries": len(connection.queries)}
+
+
+def chunked(items, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yields lists of up to `chunk_size` items from an iterable
+    """
+
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_json_list(chunks, container=None):
+    """
+    Yields the json for the data container with the items of
+    `chunks` (an iterable of lists) as `data`, one chunk at a time
+
+    `container` holds extra keys for the container (e.g. `next`)
+    """
+
+    yield b'{"data":['
+
+    separator = b""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        # strip the list brackets, the items go into the open data list
+        yield separator + dumps(chunk)[1:-1]
+        separator = b","
+
+    tail = b'],"errors":{}'
+
+    for key, value in (container or {}).items():
+        tail += b"," + dumps(key) + b":" + dumps(value)
+
+    profiling = profiling_info()
+    if profiling is not None:
+        tail += b',"profiling":' + dumps(profiling)
+
+    yield tail + b"}"
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """
+    Streams a list response in the `JSONRenderer` container format
+    without materializing the serialized list or the json document
+
+    Items are pulled from `items` in chunks of `chunk_size`, chunk
+    processors added through `map_chunks` (e.g. permission application)
+    are run on each chunk before it is encoded.
+
+    `container` holds extra keys for the response container.
+    """
+
+    def __init__(
+        self,
+        items,
+        chunk_size=STREAM_CHUNK_SIZE,
+        status=200,
+        container=None,
+        **kwargs,
+    ):
+        kwargs.setdefault("content_type", "application/json")
+        self.items = items
+        self.chunk_size = chunk_size
+        self.container = container
+        self.chunk_processors = []
+        super().__init__(self._stream(), status=status, **kwargs)
+
+    def map_chunks(self, fn):
+        """
+        Add a function that receives a list of items and returns the
+        list of items to encode
+        """
+        self.chunk_processors.append(fn)
+
+    def _processed(self):
+        for chunk in chunked(self.items, self.chunk_size):
+            for fn in self.chunk_processors:
+                chunk = fn(chunk)
+            yield chunk
+
+    def _stream(self):
+        yield from iter_json_list(self._processed(), container=self.container)
+
+
 class JSONRenderer(renderers.JSONRenderer):
     """
     Extended JSON Renderer that
 
     - wraps data in a container
     - makes sure data is always returned as a list
+    - adds profiling info if `REST_PROFILING` is enabled
+    - adds the keys of the response's `container` attribute (e.g. the
+      `next` cursor of paginated responses)
     """
 
     charset = "utf-8"
@@ -41,9 +175,9 @@ class JSONRenderer(renderers.JSONRenderer):
 
         container = {"data": [], "errors": {}}
 
-        # FIXME: should be a config value to disable/enable profile
-        # info in the response data
-        container["profiling"] = {"queries": len(connection.queries)}
+        profiling = profiling_info()
+        if profiling is not None:
+            container["profiling"] = profiling
 
         if status >= 400:
             container["errors"] = data
@@ -51,20 +185,24 @@ class JSONRenderer(renderers.JSONRenderer):
             if isinstance(data, dict):
                 container["data"].append(data)
             elif isinstance(data, list):
-                container["data"].extend(data)
+                container["data"] = data
             else:
                 raise TypeError(
                     "REST Renderer does not know what to do with data type `{}` at root".format(
                         type(data)
                     )
                 )
+        container.update(
+            getattr(renderer_context.get("response"), "container", None) or {}
+        )
+
         data = container
         indent = None
         request = renderer_context.get("request")
         if request:
             if "pretty" in request.GET:
                 indent = 2
-        return json.dumps(data, cls=JSONEncoder, indent=indent)
+        return dumps(data, indent=indent)
 
 
 class PlainTextRenderer(renderers.BaseRenderer):
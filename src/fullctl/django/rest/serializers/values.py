@@ -0,0 +1,271 @@
+"""
+Read-only serializer compilation for large listings
+
+A serializer's readable fields are compiled into a `values_list`
+projection and a row function that builds the same output as the
+serializer's `to_representation`, without loading model instances or
+resolving each field through its source attributes per row.
+
+Supported fields:
+
+- fields backed by a concrete model field, including dotted sources
+  across forward foreign keys (e.g. `source="org.name"`)
+- `PrimaryKeyRelatedField` and `SlugRelatedField` for forward foreign keys
+- nested serializers for forward foreign keys, compiled recursively
+
+Serializers with other fields (e.g. `SerializerMethodField`) or with a
+custom `to_representation` are not compiled, `compile_serializer` returns
+None for them and the regular serializer should be used.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import fields as drf_fields
+from rest_framework import relations, serializers
+from rest_framework.fields import empty
+
+__all__ = ["CompiledSerializer", "compile_serializer"]
+
+
+class NotCompilable(Exception):
+    pass
+
+
+# how a field is handled when an object along its dotted source is None,
+# mirrors `Field.get_attribute`
+NULL_DEFAULT = "default"
+NULL_NONE = "none"
+NULL_SKIP = "skip"
+NULL_ERROR = "error"
+
+
+def _null_rule(field):
+    if field.default is not empty:
+        return NULL_DEFAULT
+    if field.allow_null:
+        return NULL_NONE
+    if not field.required:
+        return NULL_SKIP
+    return NULL_ERROR
+
+
+def _is_forward_relation(model_field):
+    return (
+        model_field.is_relation
+        and model_field.concrete
+        and (model_field.many_to_one or model_field.one_to_one)
+    )
+
+
+def _get_model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        raise NotCompilable(f"{model.__name__}.{name} is not a model field")
+
+
+def _resolve_relations(model, attrs):
+    """
+    Follow forward relations for `attrs`, returns the model at the end
+    """
+    for attr in attrs:
+        model_field = _get_model_field(model, attr)
+        if not _is_forward_relation(model_field):
+            raise NotCompilable(f"{model.__name__}.{attr} is not a forward relation")
+        model = model_field.related_model
+    return model
+
+
+class _Columns:
+    """
+    Collects the columns of the `values_list` projection
+    """
+
+    def __init__(self):
+        self.columns = []
+        self.index = {}
+
+    def add(self, column):
+        if column not in self.index:
+            self.index[column] = len(self.columns)
+            self.columns.append(column)
+        return self.index[column]
+
+
+class CompiledSerializer:
+    """
+    Compiled read-only serializer
+
+    Use `compile_serializer` to create one.
+    """
+
+    def __init__(self, columns, fields):
+        self.columns = columns
+        # (field name, field, column index, null check column index or None,
+        #  null rule, representation function or nested CompiledSerializer)
+        self.fields = fields
+
+    def to_representation(self, row):
+        """
+        Build the serializer output for a `values_list` row
+        """
+        ret = {}
+
+        for name, field, index, check, rule, represent in self.fields:
+            if check is not None and row[check] is None:
+                # an object along the dotted source is None
+                if rule is NULL_NONE:
+                    ret[name] = None
+                elif rule is NULL_DEFAULT:
+                    ret[name] = field.get_default()
+                elif rule is NULL_ERROR:
+                    raise AttributeError(
+                        f"Got None when attempting to get a value for field `{name}`"
+                    )
+                continue
+
+            value = row[index]
+
+            if value is None:
+                ret[name] = None
+            elif represent.__class__ is CompiledSerializer:
+                ret[name] = represent.to_representation(row)
+            else:
+                ret[name] = represent(value)
+
+        return ret
+
+    def values(self, qset):
+        """
+        Returns the `values_list` queryset for `qset`
+        """
+        return qset.values_list(*self.columns)
+
+    def serialize(self, qset) -> list:
+        """
+        Returns the serialized rows of `qset` as a list
+        """
+        to_representation = self.to_representation
+        return [to_representation(row) for row in self.values(qset)]
+
+    def iter_serialize(self, qset, chunk_size=2000):
+        """
+        Yields the serialized rows of `qset`, rows are fetched from the
+        database in chunks
+        """
+        to_representation = self.to_representation
+        for row in self.values(qset).iterator(chunk_size=chunk_size):
+            yield to_representation(row)
+
+
+def _identity(value):
+    return value
+
+
+def _pk_representation(field):
+    if field.pk_field is None:
+        return _identity
+    return field.pk_field.to_representation
+
+
+def _compile(serializer, model, prefix, columns):
+    if (
+        type(serializer).to_representation
+        is not serializers.Serializer.to_representation
+    ):
+        raise NotCompilable(f"{serializer} overrides to_representation")
+
+    compiled_fields = []
+
+    for field in serializer._readable_fields:
+        name = field.field_name
+        attrs = list(field.source_attrs)
+
+        if not attrs or isinstance(
+            field,
+            (
+                drf_fields.SerializerMethodField,
+                drf_fields.ModelField,
+                drf_fields.HiddenField,
+                relations.ManyRelatedField,
+                relations.HyperlinkedRelatedField,
+                serializers.ListSerializer,
+            ),
+        ):
+            raise NotCompilable(f"field {name} cannot be compiled")
+
+        if isinstance(field, serializers.BaseSerializer):
+            if len(attrs) != 1:
+                raise NotCompilable(f"nested serializer {name} has a dotted source")
+            related_model = _resolve_relations(model, attrs)
+            path = prefix + attrs[0]
+            # the nested object is None if its pk is
+            index = columns.add(f"{path}__{related_model._meta.pk.name}")
+            nested = _compile(field, related_model, f"{path}__", columns)
+            compiled_fields.append((name, field, index, None, None, nested))
+            continue
+
+        if type(field).get_attribute not in (
+            drf_fields.Field.get_attribute,
+            relations.RelatedField.get_attribute,
+        ):
+            raise NotCompilable(f"field {name} overrides get_attribute")
+
+        parent = _resolve_relations(model, attrs[:-1])
+
+        check = None
+        if len(attrs) > 1:
+            check = columns.add(
+                prefix + "__".join(attrs[:-1]) + f"__{parent._meta.pk.name}"
+            )
+
+        model_field = _get_model_field(parent, attrs[-1])
+        path = prefix + "__".join(attrs)
+
+        if isinstance(field, relations.PrimaryKeyRelatedField):
+            if not _is_forward_relation(model_field):
+                raise NotCompilable(f"field {name} is not a forward relation")
+            represent = _pk_representation(field)
+        elif isinstance(field, relations.SlugRelatedField):
+            if not _is_forward_relation(model_field) or "__" in field.slug_field:
+                raise NotCompilable(f"field {name} cannot be compiled")
+            _get_model_field(model_field.related_model, field.slug_field)
+            path = f"{path}__{field.slug_field}"
+            represent = _identity
+        elif isinstance(field, relations.RelatedField) or model_field.is_relation:
+            raise NotCompilable(f"field {name} cannot be compiled")
+        else:
+            if isinstance(field, drf_fields.DateTimeField) and not hasattr(
+                field, "timezone"
+            ):
+                # resolve the current timezone once instead of per row,
+                # compiled serializers are built per request
+                field.timezone = field.default_timezone()
+            represent = field.to_representation
+
+        compiled_fields.append(
+            (name, field, columns.add(path), check, _null_rule(field), represent)
+        )
+
+    return CompiledSerializer(columns.columns, compiled_fields)
+
+
+def compile_serializer(serializer) -> CompiledSerializer | None:
+    """
+    Compile a model serializer instance (not `many=True`)
+
+    Returns None if any of the serializer's readable fields cannot be
+    compiled.
+
+    The serializer should be instantiated with the request context and
+    compiled per request, like a regular serializer.
+    """
+
+    model = getattr(getattr(serializer, "Meta", None), "model", None)
+
+    if model is None or isinstance(serializer, serializers.ListSerializer):
+        return None
+
+    try:
+        return _compile(serializer, model, "", _Columns())
+    except NotCompilable:
+        return None
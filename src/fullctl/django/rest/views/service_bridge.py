@@ -1,5 +1,22 @@
+import base64
+import concurrent.futures
+import hashlib
+import json
+import math
+import threading
 import time
+from collections import deque
+from functools import reduce
+from operator import or_
+
 import structlog
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Count, Max, Q
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.utils.translation import gettext_lazy as _
 from rest_framework import viewsets
 from rest_framework.response import Response
@@ -7,12 +24,20 @@ from rest_framework.response import Response
 from fullctl.django.models import Instance, Organization
 from fullctl.django.rest.core import BadRequest
 from fullctl.django.rest.decorators import grainy_endpoint
+from fullctl.django.rest.renderers import (
+    STREAM_CHUNK_SIZE,
+    StreamingJSONResponse,
+    dumps,
+)
 from fullctl.django.rest.serializers.service_bridge import (
     HeartbeatSerializer,
     StatusSerializer,
 )
+from fullctl.django.rest.serializers.values import compile_serializer
 
 log = structlog.get_logger(__name__)
+
+
 class MethodFilter:
     def __init__(self, name):
         self.name = name
@@ -23,6 +48,51 @@ class Exclude:
         self.filters = filters
 
 
+def encode_cursor(values):
+    """
+    Encode the ordering values of the last row of a page to a cursor
+    """
+    return base64.urlsafe_b64encode(dumps(list(values))).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor to the list of ordering values it was created from
+
+    Raises ValueError if the cursor is invalid
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (TypeError, UnicodeError, base64.binascii.Error) as exc:
+        raise ValueError(f"Invalid cursor: {exc}")
+
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+
+    return values
+
+
+def keyset_filter(ordering, values):
+    """
+    Returns a Q object selecting the rows that come after `values`
+    for the ordering fields `ordering` (`-` prefix for descending)
+    """
+
+    clauses = []
+
+    for index, field in enumerate(ordering):
+        name = field.lstrip("-")
+        op = "lt" if field.startswith("-") else "gt"
+
+        clause = Q(**{f"{name}__{op}": values[index]})
+        for previous, value in zip(ordering[:index], values[:index]):
+            clause &= Q(**{previous.lstrip("-"): value})
+
+        clauses.append(clause)
+
+    return reduce(or_, clauses)
+
+
 class SystemViewSet(viewsets.GenericViewSet):
     path_prefix = "/system"
     allowed_http_methods = ["GET"]
@@ -41,57 +111,173 @@ class HeartbeatViewSet(SystemViewSet):
         return Response({"status": "ok"})
 
 
+class LatencyWindow:
+    """
+    Rolling window of the latest `size` latency samples per check
+    """
+
+    def __init__(self, size=100):
+        self.size = size
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, value):
+        with self._lock:
+            if name not in self.samples:
+                self.samples[name] = deque(maxlen=self.size)
+            self.samples[name].append(value)
+
+    def percentiles(self, name, percentiles=(50, 90, 99)):
+        """
+        Returns the nearest-rank percentiles of the samples of `name`
+        as a dict (`p50`, `p90`, ...) along with the number of samples
+        """
+        with self._lock:
+            samples = sorted(self.samples.get(name, ()))
+
+        result = {"samples": len(samples)}
+        for percentile in percentiles:
+            if samples:
+                rank = max(math.ceil(percentile / 100 * len(samples)), 1)
+                result[f"p{percentile}"] = samples[rank - 1]
+            else:
+                result[f"p{percentile}"] = None
+        return result
+
+
+# latency samples of the service bridge status checks of this process
+STATUS_LATENCY = LatencyWindow()
+
+_status_executor = None
+_status_executor_lock = threading.Lock()
+
+
+def get_status_executor():
+    """
+    Returns the process-wide thread pool service bridge status checks
+    are run in
+    """
+    global _status_executor
+
+    if _status_executor is None:
+        with _status_executor_lock:
+            if _status_executor is None:
+                _status_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=getattr(settings, "SERVICE_BRIDGE_STATUS_WORKERS", 8),
+                    thread_name_prefix="service-bridge-status",
+                )
+    return _status_executor
+
+
 class StatusViewSet(SystemViewSet):
     ref_tag = "status"
     serializer_class = StatusSerializer
     checks = []
 
+    @property
+    def check_timeout(self):
+        """
+        Seconds a check may take before it is reported as failed
+        """
+        return getattr(settings, "SERVICE_BRIDGE_STATUS_TIMEOUT", 5)
+
     @grainy_endpoint("service_bridge.system")
     def list(self, request):
         """
         Returns service bridge status for all the service bridges
         in use
         """
+        return Response(self.status(request))
+
+    def status(self, request):
+        """
+        Runs the checks concurrently and returns their results
+
+        Results are cached for `SERVICE_BRIDGE_STATUS_CACHE_TTL` seconds
+        and include latency percentiles over the latest checks
+        of this process.
+        """
+        cache_ttl = getattr(settings, "SERVICE_BRIDGE_STATUS_CACHE_TTL", 0)
+        cache_key = (
+            f"fullctl:service_bridge_status:{type(self).__module__}."
+            f"{type(self).__qualname__}"
+        )
+
+        if cache_ttl:
+            results = cache.get(cache_key)
+            if results is not None:
+                return results
+
+        timeout = self.check_timeout
+        futures = {
+            check: get_status_executor().submit(self.run_check, check, request)
+            for check in self.checks
+        }
+
+        t_start = time.time()
         results = {}
 
-        for check in self.checks:
-            fn = getattr(self, f"check_{check}")
-            t_start = time.time()
+        for check, future in futures.items():
             try:
-                results[check] = {"status": fn(request), "time": time.time() - t_start}
-            except Exception as e:
+                results[check] = future.result(
+                    timeout=max(timeout - (time.time() - t_start), 0)
+                )
+            except concurrent.futures.TimeoutError:
+                STATUS_LATENCY.add(check, timeout)
                 results[check] = {
                     "status": "failure",
-                    "details": str(e),
-                    "time": time.time() - t_start,
+                    "details": f"timed out after {timeout}s",
+                    "time": timeout,
                 }
+            results[check]["latency"] = STATUS_LATENCY.percentiles(check)
+
+        if cache_ttl:
+            cache.set(cache_key, results, cache_ttl)
 
-        return Response(results)
+        return results
+
+    def run_check(self, check, request):
+        fn = getattr(self, f"check_{check}")
+        t_start = time.time()
+        try:
+            result = {"status": fn(request)}
+        except Exception as e:
+            result = {"status": "failure", "details": str(e)}
+        finally:
+            # close the database connections the check may have opened
+            # in the pool thread
+            connections.close_all()
+
+        result["time"] = time.time() - t_start
+        STATUS_LATENCY.add(check, result["time"])
+        return result
 
     def check_bridge_peerctl(self, request):
         import fullctl.service_bridge.peerctl as peerctl
 
-        return peerctl.Peerctl(cache_duration=1).heartbeat()
+        return peerctl.Peerctl(cache_duration=1).heartbeat(timeout=self.check_timeout)
 
     def check_bridge_aaactl(self, request):
         import fullctl.service_bridge.aaactl as aaactl
 
-        return aaactl.Aaactl(cache_duration=1).heartbeat()
+        return aaactl.Aaactl(cache_duration=1).heartbeat(timeout=self.check_timeout)
 
     def check_bridge_pdbctl(self, request):
         import fullctl.service_bridge.pdbctl as pdbctl
 
-        return pdbctl.Pdbctl(cache_duration=1).heartbeat()
+        return pdbctl.Pdbctl(cache_duration=1).heartbeat(timeout=self.check_timeout)
 
     def check_bridge_ixctl(self, request):
         import fullctl.service_bridge.ixctl as ixctl
 
-        return ixctl.Ixctl(cache_duration=1).heartbeat()
+        return ixctl.Ixctl(cache_duration=1).heartbeat(timeout=self.check_timeout)
 
     def check_bridge_devicectl(self, request):
         import fullctl.service_bridge.devicectl as devicectl
 
-        return devicectl.Ixctl(cache_duration=1).heartbeat()
+        return devicectl.Devicectl(cache_duration=1).heartbeat(
+            timeout=self.check_timeout
+        )
 
 
 class DataViewSet(viewsets.ModelViewSet):
@@ -102,6 +288,33 @@ class DataViewSet(viewsets.ModelViewSet):
     allowed_http_methods = ["GET"]
     path_prefix = "/data"
 
+    # stream list responses, rows are serialized and encoded in chunks
+    # while the response is sent. Serialization then happens after the
+    # view returned, outside of the reversion and service bridge context
+    stream_list = False
+    stream_chunk_size = STREAM_CHUNK_SIZE
+
+    # serialize list responses from a `values_list` projection compiled
+    # from the serializer, falls back to the serializer if it cannot be
+    # compiled (see fullctl.django.rest.serializers.values)
+    fast_list = False
+
+    # keyset pagination, enabled for a request through the `page_size`
+    # GET param. Ordering fields need to be non-nullable concrete fields,
+    # the primary key is appended if it is not part of the ordering
+    cursor_ordering = ("id",)
+    max_page_size = 5000
+
+    # send ETag and Last-Modified headers for list responses and answer
+    # conditional requests with 304, requires an `updated` field and costs
+    # an extra aggregate query per list request.
+    #
+    # The ETag only tracks the listed model's own rows (latest `updated`
+    # and row count), changes to joined or related objects and updates
+    # that do not touch `updated` (e.g. `queryset.update()`) do not change
+    # it. Only enable for listings that serialize the model's own fields.
+    conditional = False
+
     @property
     def filtered(self):
         return getattr(self, "_filtered", False)
@@ -139,17 +352,150 @@ class DataViewSet(viewsets.ModelViewSet):
 
         qset, joins = self.join_relations(qset, request)
 
-        # set to a positive number to limit the number of results returned from
-        # list, helps with dealing with timeouts
-        limit = request.GET.get("limit", "")
-        limit = int(limit) if limit.isdigit() else 0
-        if limit > 0:
-            qset = qset[:limit]
+        page_size = request.GET.get("page_size", "")
+        page_size = int(page_size) if page_size.isdigit() else 0
+        next_cursor = None
+
+        if page_size > 0:
+            try:
+                qset, next_cursor = self.paginate(
+                    qset, min(page_size, self.max_page_size), request.GET.get("cursor")
+                )
+            except ValueError:
+                return BadRequest(_("Invalid cursor"))
+        else:
+            # set to a positive number to limit the number of results returned from
+            # list, helps with dealing with timeouts
+            limit = request.GET.get("limit", "")
+            limit = int(limit) if limit.isdigit() else 0
+            if limit > 0:
+                qset = qset[:limit]
+
+        validators = self.validators(qset, request)
+        if validators:
+            not_modified = get_conditional_response(request, **validators)
+            if not_modified is not None:
+                return not_modified
 
         context = self.serializer_context(request, {"joins": joins})
 
-        serializer = self.serializer_class(qset, many=True, context=context)
-        return Response(serializer.data)
+        compiled = None
+        if self.fast_list:
+            compiled = compile_serializer(self.serializer_class(context=context))
+
+        # paginated responses carry the cursor of the next page in the
+        # response container
+        container = {"next": next_cursor} if page_size > 0 else None
+
+        if self.stream_list:
+            response = self.stream(qset, context, compiled, container=container)
+        elif compiled is not None:
+            response = Response(compiled.serialize(qset))
+        else:
+            serializer = self.serializer_class(qset, many=True, context=context)
+            response = Response(serializer.data)
+
+        response.container = container
+
+        if validators:
+            response["ETag"] = validators["etag"]
+            response["Last-Modified"] = http_date(validators["last_modified"])
+
+        return response
+
+    def validators(self, qset, request):
+        """
+        Returns the etag and last_modified validators for a list response
+        or None if conditional requests are not supported for it
+
+        The etag changes with the most recent `updated` timestamp and the
+        number of rows of the listing, the request path and the requesting
+        user or api key.
+        """
+
+        if not self.conditional:
+            return None
+
+        try:
+            qset.model._meta.get_field("updated")
+        except FieldDoesNotExist:
+            return None
+
+        stats = qset.aggregate(updated=Max("updated"), count=Count("pk"))
+
+        if stats["updated"] is None:
+            return None
+
+        holder = getattr(request, "api_key", None) or getattr(
+            getattr(request, "user", None), "pk", ""
+        )
+
+        key = "|".join(
+            [
+                stats["updated"].isoformat(),
+                str(stats["count"]),
+                request.get_full_path(),
+                str(holder),
+            ]
+        )
+
+        return {
+            "etag": f'W/"{hashlib.sha1(key.encode("utf-8")).hexdigest()}"',
+            "last_modified": int(stats["updated"].timestamp()),
+        }
+
+    def paginate(self, qset, page_size, cursor=None):
+        """
+        Keyset pagination
+
+        Returns the queryset for the page after `cursor` and the cursor
+        of the next page (None if this is the last page)
+
+        Raises ValueError if the cursor is invalid
+        """
+
+        ordering = list(self.cursor_ordering)
+        pk_name = qset.model._meta.pk.name
+        if not {pk_name, "pk"} & {field.lstrip("-") for field in ordering}:
+            ordering.append("pk")
+
+        qset = qset.order_by(*ordering)
+
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != len(ordering):
+                raise ValueError("Invalid cursor")
+            try:
+                qset = qset.filter(keyset_filter(ordering, values))
+            except ValidationError as exc:
+                raise ValueError(f"Invalid cursor: {exc}")
+
+        # ordering values of the last row of this page and the first row
+        # of the next page, if any
+        names = [field.lstrip("-") for field in ordering]
+        boundary = list(qset.values_list(*names)[page_size - 1 : page_size + 1])
+
+        next_cursor = encode_cursor(boundary[0]) if len(boundary) > 1 else None
+
+        return qset[:page_size], next_cursor
+
+    def stream(self, qset, context, compiled=None, container=None):
+        """
+        Returns a streaming response for the queryset
+        """
+
+        if compiled is not None:
+            rows = compiled.iter_serialize(qset, chunk_size=self.stream_chunk_size)
+        else:
+            serializer = self.serializer_class(context=context)
+            rows = (
+                serializer.to_representation(row)
+                for row in qset.iterator(chunk_size=self.stream_chunk_size)
+            )
+
+        return StreamingJSONResponse(
+            rows, chunk_size=self.stream_chunk_size, container=container
+        )
 
     def filter(self, qset, request):
         filters = {}
@@ -218,6 +218,15 @@ class SettingsManager(confu.util.SettingsManager):
         # should be greater than TASK_TRACK_INTERVAL_SECONDS
         self.set_option("HEALTH_CHECK_TASK_INTERVAL_SECONDS", 20)
 
+        # HEALTH_CHECK_TIMEOUT is the default time in seconds a health check may take before it is reported as failed
+        self.set_option("HEALTH_CHECK_TIMEOUT", 5)
+
+        # HEALTH_CHECK_CACHE_TTL is the time in seconds health check results are cached and shared between workers (0 to disable)
+        self.set_option("HEALTH_CHECK_CACHE_TTL", 5)
+
+        # HEALTH_CHECK_WORKERS is the number of threads health checks that do not use the database are run in
+        self.set_option("HEALTH_CHECK_WORKERS", 4)
+
         # TASK_MAX_AGE_THRESHOLD is the maximum hours a task can be pending before it is considered stale
         self.set_option("TASK_MAX_AGE_THRESHOLD", 24)
 
@@ -245,6 +254,10 @@ class SettingsManager(confu.util.SettingsManager):
         # SERVER_ERROR_CACHE_EXPIRY (Request server error cache expiry - 1 minute for 5xx errors)
         self.set_option("SERVER_ERROR_CACHE_EXPIRY", 60)
 
+        # ACCOUNT_SERVICE_CACHE_EXPIRY (seconds) aaactl branding, service application and
+        # trial information used for page rendering is cached per org - 0 disables the cache
+        self.set_option("ACCOUNT_SERVICE_CACHE_EXPIRY", 300)
+
 
         # The maximum number of parameters that may be received via GET or POST before a
         # SuspiciousOperation (TooManyFields) is raised.
@@ -265,9 +278,35 @@ class SettingsManager(confu.util.SettingsManager):
         # export AUDITCTL_LOG_API_ACTIONS="member:create,member:update"
         self.set_option("AUDITCTL_LOG_API_ACTIONS", [])
 
+        # ship logged api actions to auditctl from a background thread
+        # in batches instead of during the request, requires
+        # AUDITCTL_SPOOL_PATH so events survive worker restarts
+        self.set_bool("AUDITCTL_SPOOL", False)
+
+        # append-only file events are spooled to when the in-process queue
+        # is full or auditctl cannot be reached, replayed by the sender.
+        # AUDITCTL_SPOOL has no effect unless this is set
+        self.set_option("AUDITCTL_SPOOL_PATH", "")
+        self.set_option("AUDITCTL_SPOOL_BATCH_SIZE", 100)
+
+        # send spooled events to auditctl as a list in a single request,
+        # requires an auditctl version that accepts event lists
+        self.set_bool("AUDITCTL_SPOOL_BATCH", False)
+        self.set_option("AUDITCTL_SPOOL_MAX_QUEUE_SIZE", 10000)
+
         # Size of chunks for objects when making bridge requests
         self.set_option("BRIDGE_OBJECTS_CHUNK_SIZE", 50)
 
+        # seconds a service bridge status check (system/status) may take
+        # before it is reported as failed
+        self.set_option("SERVICE_BRIDGE_STATUS_TIMEOUT", 5)
+
+        # seconds service bridge status results are cached
+        self.set_option("SERVICE_BRIDGE_STATUS_CACHE_TTL", 2)
+
+        # number of threads service bridge status checks are run in
+        self.set_option("SERVICE_BRIDGE_STATUS_WORKERS", 8)
+
         # FEATURE_REQUEST_FORM_CLICKUP_LINK is the link to the feature request form in clickup
         self.set_option(
             "FEATURE_REQUEST_FORM_CLICKUP_LINK",
@@ -277,12 +316,30 @@ class SettingsManager(confu.util.SettingsManager):
         # Number of results to return for blank query in autocomplete requests
         self.set_option("AUTOCOMPLETE_NUM_BLANK_QUERY_RESULTS", 10)
 
+        # Answer PeeringDB autocomplete requests from a local in-memory index
+        # loaded from pdbctl, pdbctl is queried while the index is cold (opt-in)
+        self.set_bool("PDB_AUTOCOMPLETE_INDEX", False)
+
+        # Seconds after which the PeeringDB autocomplete index is refreshed
+        self.set_option("PDB_AUTOCOMPLETE_INDEX_TTL", 3600)
+
         # eval from default.py file
         filename = os.path.join(os.path.dirname(__file__), "default.py")
         self.try_include(filename)
 
         self.set_option("BRANDING_ORG", None, envvar_type=str)
 
+        # include profiling info (query count) in rest api responses
+        self.set_bool("REST_PROFILING", False)
+
+        # use cached `themed_path` and `include_css` resolutions without
+        # checking for template and css file changes
+        self.set_bool("FREEZE_TEMPLATE_RESOLUTION", not self.scope.get("DEBUG", True))
+
+        # write auditlog entries from a background thread after the
+        # request's transaction is committed
+        self.set_bool("AUDITLOG_DEFER", False)
+
     def set_default_append(self):
         DEBUG = self.get("DEBUG")
         self.set_option("DEBUG_EMAIL", DEBUG)
@@ -1,11 +1,16 @@
 # from django.contrib.auth.signals import user_logged_in
 
 import reversion
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from reversion.signals import post_revision_commit
 
 import fullctl.django.auditlog as auditlog
+from fullctl.django.models.concrete.account import (
+    Organization,
+    OrganizationUser,
+    invalidate_accessible_orgs,
+)
 
 
 def auditlog_on_save(**kwargs):
@@ -52,3 +57,16 @@ def auditlog_on_delete(sender, **kwargs):
 
     with auditlog.Context() as ctx:
         ctx.log(action, log_object=instance)
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+@receiver(post_save, sender=OrganizationUser)
+@receiver(post_delete, sender=OrganizationUser)
+def accessible_orgs_on_change(sender, **kwargs):
+    """
+    invalidate cached accessible organization indexes when
+    organizations or memberships change
+    """
+
+    invalidate_accessible_orgs()
@@ -1,3 +1,6 @@
+import os
+import time
+
 from django import template
 from django.conf import settings
 from django.contrib.staticfiles import finders
@@ -7,6 +10,61 @@ from fullctl.django.context import current_request
 
 register = template.Library()
 
+# (theme, path) -> (resolved path, time of resolution)
+THEMED_PATH_CACHE = {}
+
+# seconds a `themed_path` resolution is re-used for before it is checked
+# again, unless FREEZE_TEMPLATE_RESOLUTION is set
+THEMED_PATH_CACHE_TTL = 5
+
+# static path -> (file path, mtime, style tag)
+INCLUDE_CSS_CACHE = {}
+
+
+def resolution_frozen():
+    """
+    Whether cached template and css resolutions are used without
+    re-validating them (FREEZE_TEMPLATE_RESOLUTION setting)
+    """
+    return getattr(settings, "FREEZE_TEMPLATE_RESOLUTION", False)
+
+
+def resolve_themed_path(theme, path):
+    """
+    Returns the path of the theme's variant of a template or the
+    original path if the theme does not have one
+
+    Resolutions are cached per process by (theme, path)
+    """
+
+    key = (theme, path)
+    now = time.monotonic()
+    cached = THEMED_PATH_CACHE.get(key)
+
+    if cached and (resolution_frozen() or now - cached[1] < THEMED_PATH_CACHE_TTL):
+        return cached[0]
+
+    # prepend theme name to path
+
+    parts = path.split("/")
+    if len(parts) == 1:
+        parts.insert(0, theme)
+    else:
+        parts.insert(1, theme)
+
+    themed = "/".join(parts)
+
+    # check if the theme exists, if it does not
+    # fall back to the original path
+
+    try:
+        template.loader.get_template(themed)
+    except template.loader.TemplateDoesNotExist:
+        themed = path
+
+    THEMED_PATH_CACHE[key] = (themed, now)
+    return themed
+
 
 @register.filter
 def can_read(request, namespace):
@@ -79,28 +137,7 @@ def themed_path(path):
 
         if theme:
             # theme override was found
-
-            # keep reference to original path
-
-            orig_path = path
-
-            # prepend theme name to path
-
-            parts = path.split("/")
-            if len(parts) == 1:
-                parts.prepend(theme)
-            else:
-                parts.insert(1, theme)
-
-            path = "/".join(parts)
-
-            # finally check if the theme exists, if it does not
-            # fall back to the original path
-
-            try:
-                template.loader.get_template(path)
-            except template.loader.TemplateDoesNotExist:
-                return orig_path
+            return resolve_themed_path(theme, path)
 
         return path
 
@@ -110,23 +147,40 @@ def include_css(path):
     """
     This will take a path to a css file and include it
     in the template.
+
+    File contents are cached per process and re-read when the
+    file's mtime changes, unless FREEZE_TEMPLATE_RESOLUTION is set.
     """
 
+    cached = INCLUDE_CSS_CACHE.get(path)
+
+    if cached:
+        if resolution_frozen():
+            return cached[2]
+        try:
+            if os.stat(cached[0]).st_mtime == cached[1]:
+                return cached[2]
+        except OSError:
+            pass
+
     # user django finders module to find location of file
     # in staticfiles dirs
 
-    path = finders.find(path)
+    file_path = finders.find(path)
 
-    if isinstance(path, list):
-        path = path[0]
+    if isinstance(file_path, list):
+        file_path = file_path[0]
 
-    if not path:
+    if not file_path:
         raise OSError(f"File not found: {path}")
 
     # read file contents
 
-    with open(path) as f:
+    with open(file_path) as f:
+        mtime = os.fstat(f.fileno()).st_mtime
         content = f.read()
 
     # return content wrapped in style tag
-    return mark_safe(f"<style>{content}</style>")
+    tag = mark_safe(f"<style>{content}</style>")
+    INCLUDE_CSS_CACHE[path] = (file_path, mtime, tag)
+    return tag
@@ -0,0 +1,179 @@
+"""
+Downsampling of traffic series for graph rendering and traffic data
+responses.
+
+- `lttb`: largest-triangle-three-buckets, keeps the visual shape of a series
+- `minmax`: keeps the minimum and maximum point of each bucket
+
+Both methods only ever select existing data points, the first and last
+point of a series are always kept.
+"""
+
+import numpy as np
+
+__all__ = [
+    "lttb_indices",
+    "minmax_indices",
+    "downsample_indices",
+    "downsample_rows",
+]
+
+METHODS = ("lttb", "minmax")
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Select `threshold` indices of the series using the
+    largest-triangle-three-buckets algorithm.
+
+    :param x: The x values (e.g. timestamps), numpy array.
+    :param y: The y values, numpy array, NaN values are treated as 0.
+    :param threshold: The number of points to select.
+    :return: A sorted numpy array of indices.
+    """
+    length = len(y)
+
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+
+    # bucket boundaries for all points except the first and last
+    edges = np.linspace(1, length - 1, threshold - 1).astype(int)
+
+    indices = np.empty(threshold, dtype=int)
+    indices[0] = 0
+    indices[-1] = length - 1
+
+    selected = 0
+
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+
+        # average point of the next bucket
+        next_start = end
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else length
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+
+        # pick the point that forms the largest triangle with the
+        # previously selected point and the next bucket's average
+        areas = np.abs(
+            (x[selected] - next_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (next_y - y[selected])
+        )
+
+        selected = start + int(areas.argmax())
+        indices[bucket + 1] = selected
+
+    return indices
+
+
+def minmax_indices(y, threshold):
+    """
+    Select the indices of the minimum and maximum of each bucket, using
+    `threshold // 2` buckets.
+
+    :param y: The y values, numpy array, NaN values are ignored.
+    :param threshold: The number of points to select.
+    :return: A sorted numpy array of indices.
+    """
+    length = len(y)
+    buckets = threshold // 2
+
+    if threshold >= length or buckets < 1:
+        return np.arange(length)
+
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(0, length, buckets + 1).astype(int)
+
+    indices = [0, length - 1]
+
+    for start, end in zip(edges[:-1], edges[1:]):
+        bucket = y[start:end]
+        if np.isnan(bucket).all():
+            continue
+        indices.append(start + int(np.nanargmin(bucket)))
+        indices.append(start + int(np.nanargmax(bucket)))
+
+    return np.unique(indices)
+
+
+def downsample_indices(x, columns, max_points, method="lttb", preserve=()):
+    """
+    Select the indices to keep when downsampling multiple series that share
+    the same x values.
+
+    :param x: The x values (e.g. timestamps).
+    :param columns: A list of y value series to downsample, `max_points` is
+        split evenly between them.
+    :param max_points: The approximate number of points to keep.
+    :param method: `lttb` or `minmax`.
+    :param preserve: A list of series whose maximum point is always kept
+        (e.g. the peak series), so peaks computed from the result stay exact.
+    :return: A sorted numpy array of unique indices.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+
+    threshold = max(max_points // max(len(columns), 1), 3)
+
+    indices = []
+
+    for y in columns:
+        if method == "lttb":
+            indices.append(lttb_indices(x, y, threshold))
+        else:
+            indices.append(minmax_indices(y, threshold))
+
+    for y in preserve:
+        y = np.asarray(y, dtype=float)
+        if len(y) and not np.isnan(y).all():
+            indices.append([int(np.nanargmax(y))])
+
+    if not indices:
+        return np.arange(len(x))
+
+    return np.unique(np.concatenate(indices))
+
+
+def downsample_rows(
+    rows,
+    max_points,
+    method="lttb",
+    fields=("bps_in", "bps_out"),
+    peak_fields=("bps_in_max", "bps_out_max"),
+):
+    """
+    Downsample traffic data rows (list of dictionaries as returned by
+    `load_rrd_file` or the traffic service bridge endpoints).
+
+    Rows are selected based on the `fields` series, the rows holding the
+    maximum of each of the `peak_fields` are always kept.
+
+    :param rows: A list of dictionaries, ordered by timestamp.
+    :param max_points: The approximate number of rows to keep.
+    :param method: `lttb` or `minmax`.
+    :return: A list of dictionaries.
+    """
+    if not rows or len(rows) <= max_points:
+        return rows
+
+    if "timestamp" in rows[0]:
+        x = np.array([row["timestamp"] for row in rows], dtype=float)
+    else:
+        x = np.arange(len(rows), dtype=float)
+
+    def column(field):
+        return np.array([row.get(field) for row in rows], dtype=float)
+
+    indices = downsample_indices(
+        x,
+        [column(field) for field in fields],
+        max_points,
+        method=method,
+        preserve=[column(field) for field in peak_fields if field in rows[0]],
+    )
+
+    return [rows[index] for index in indices.tolist()]
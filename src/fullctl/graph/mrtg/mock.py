@@ -1,7 +1,7 @@
 import random
 import time
 
-__all__ = ["port_traffic"]
+__all__ = ["port_traffic", "mrtg_log"]
 
 
 def generate_natural_traffic(min_value, max_value, num_points, peak_indices):
@@ -47,3 +47,26 @@ def port_traffic(num_points, step=3600):
         current_time -= step
 
     return result
+
+
+def mrtg_log(num_points, step=300):
+    """
+    Generate natural looking MRTG log content (bytes per second),
+    most recent data point first, preceded by the MRTG header line.
+    """
+    current_time = int(time.time())
+    current_time -= current_time % step
+    peak_indices = random.sample(range(num_points), 2)
+
+    bytes_in_data = generate_natural_traffic(10**5, 10**10, num_points, peak_indices)
+    bytes_out_data = generate_natural_traffic(10**5, 10**10, num_points, peak_indices)
+
+    lines = [f"{current_time} {sum(bytes_in_data)} {sum(bytes_out_data)}"]
+
+    for i in range(num_points):
+        lines.append(
+            f"{current_time} {bytes_in_data[i]} {bytes_out_data[i]} {bytes_in_data[i]} {bytes_out_data[i]}"
+        )
+        current_time -= step
+
+    return "\n".join(lines) + "\n"
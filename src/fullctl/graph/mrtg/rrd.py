@@ -3,19 +3,152 @@ try:
 except ImportError:
     rrdtool = None
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import itertools
 import json
 import os
 import time
+from concurrent.futures import ProcessPoolExecutor
+
+# number of `timestamp:values` tuples passed to a single `rrdtool.update` call
+UPDATE_BATCH_SIZE = 500
 
+# number of bytes read per chunk when reading log files in reverse
+READ_CHUNK_SIZE = 65536
 
-def load_rrd_file(file_path, start_time=None, duration=86400, resolution=300):
+# (duration, offset) windows fetched when aggregating RRD files, finest
+# resolution first. Each window covers `now - offset - duration` to
+# `now - offset`
+AGGREGATE_WINDOWS = [
+    (86400, 0),
+    (86400 * 6, 86400),
+    (86400 * 30, 86400 * 6),
+    (86400 * 335, 86400 * 30),
+    (86400 * 365 * 19, 86400 * 335),
+]
+
+
+class RRDData:
+    """
+    Columnar RRD data, as returned by `load_rrd_file(..., columnar=True)`.
+
+    Holds the timestamps and the bps_in, bps_out, bps_in_max and bps_out_max
+    series as NumPy arrays, unknown values are NaN.
+
+    Iterating yields the legacy row dictionaries, which are only built
+    when requested.
+    """
+
+    fields = ("bps_in", "bps_out", "bps_in_max", "bps_out_max")
+
+    def __init__(self, timestamps, values):
+        self.timestamps = timestamps
+        self.values = values
+
+    @property
+    def bps_in(self):
+        return self.values[:, 0]
+
+    @property
+    def bps_out(self):
+        return self.values[:, 1]
+
+    @property
+    def bps_in_max(self):
+        return self.values[:, 2]
+
+    @property
+    def bps_out_max(self):
+        return self.values[:, 3]
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __iter__(self):
+        timestamps = self.timestamps.tolist()
+        columns = [self._column_list(index) for index in range(len(self.fields))]
+
+        for timestamp, row in zip(timestamps, zip(*columns)):
+            yield {"timestamp": timestamp, **dict(zip(self.fields, row))}
+
+    def __getitem__(self, index):
+        return {
+            "timestamp": int(self.timestamps[index]),
+            **{
+                field: self._to_python(self.values[index, column])
+                for column, field in enumerate(self.fields)
+            },
+        }
+
+    @staticmethod
+    def _to_python(value):
+        return None if np.isnan(value) else float(value)
+
+    def _column_list(self, index):
+        column = self.values[:, index]
+        return np.where(np.isnan(column), None, column).tolist()
+
+    def rows(self):
+        """
+        Return the data as a list of dictionaries (legacy `load_rrd_file` format).
+        """
+        return list(self)
+
+    def columns(self):
+        """
+        Return the data as a dictionary of NumPy arrays keyed by field name,
+        suitable for passing to `pandas.DataFrame`.
+        """
+        columns = {"timestamp": self.timestamps}
+        for index, field in enumerate(self.fields):
+            columns[field] = self.values[:, index]
+        return columns
+
+    def to_dict(self):
+        """
+        Return the data as a dictionary of parallel lists keyed by
+        field name, unknown values are None.
+        """
+        data = {"timestamp": self.timestamps.tolist()}
+        for index, field in enumerate(self.fields):
+            data[field] = self._column_list(index)
+        return data
+
+    def to_json(self):
+        """
+        Return the data in the compact JSON form (parallel arrays).
+        """
+        return json.dumps(self.to_dict())
+
+
+def load_rrd_file(
+    file_path, start_time=None, duration=86400, resolution=300, columnar=False
+):
     """
     Load RRD file and return data as a list of dictionaries.
 
     :param file_path: Path to the RRD file.
     :param start_time: The start time for fetching data (timestamp). Defaults to now.
     :param duration: The duration for fetching data in seconds. Defaults to 24 hours (86400 seconds).
+    :param resolution: The resolution for fetching data in seconds.
+    :param columnar: If True, return an `RRDData` instance instead of a list of dictionaries. Requires numpy.
     """
+    if columnar:
+        if np is None:
+            raise ImportError("numpy is required for columnar rrd data")
+        return RRDData(
+            *fetch_rrd_arrays(
+                file_path,
+                start_time=start_time,
+                duration=duration,
+                resolution=resolution,
+            )
+        )
+
     # Set the default start time to now if not provided
     if start_time is None:
         start_time = int(time.time())
@@ -23,41 +156,20 @@ def load_rrd_file(file_path, start_time=None, duration=86400, resolution=300):
     # Calculate the end time based on the start time and duration
     end_time = start_time - duration
 
-    # Fetch data from the RRD file for the specified time range
-    data_avg = rrdtool.fetch(
-        file_path,
-        "AVERAGE",
-        "-s",
-        str(end_time),
-        "-e",
-        str(start_time),
-        "-r",
-        str(resolution),
-    )
-    data_max = rrdtool.fetch(
-        file_path,
-        "MAX",
-        "-s",
-        str(end_time),
-        "-e",
-        str(start_time),
-        "-r",
-        str(resolution),
-    )
+    args = ["-s", str(end_time), "-e", str(start_time), "-r", str(resolution)]
+
+    data_avg = rrdtool.fetch(file_path, "AVERAGE", *args)
+    data_max = rrdtool.fetch(file_path, "MAX", *args)
 
     start_avg, end_avg, step_avg = data_avg[0]
-    start_max, end_max, step_max = data_max[0]
-    values_avg = data_avg[2]
-    values_max = data_max[2]
 
     result = []
-    for row_avg, row_max in zip(values_avg, values_max):
-        timestamp = start_avg
+    for row_avg, row_max in zip(data_avg[2], data_max[2]):
         bps_in, bps_out, _, _ = row_avg
         _, _, bps_in_max, bps_out_max = row_max
         result.append(
             {
-                "timestamp": timestamp,
+                "timestamp": start_avg,
                 "bps_in": bps_in,
                 "bps_out": bps_out,
                 "bps_in_max": bps_in_max,
@@ -72,7 +184,11 @@ def load_rrd_file(file_path, start_time=None, duration=86400, resolution=300):
 def rrd_data_to_json(rrd_data):
     """
     Convert RRD data to JSON format.
+
+    `RRDData` instances are converted to the compact JSON form (parallel arrays).
     """
+    if isinstance(rrd_data, RRDData):
+        return rrd_data.to_json()
     return json.dumps(rrd_data)
 
 
@@ -91,64 +207,150 @@ def get_last_update_time(file_path):
     return int(rrd_info["last_update"])
 
 
-def update_rrd_from_log(file_path, log_file_path, last_update_time=None):
+def read_log_lines_reverse(log_file_path, chunk_size=READ_CHUNK_SIZE):
     """
-    Update an RRD file with data from a plain text log file.
+    Read lines from a plain text log file in reverse order without
+    loading the entire file into memory.
+
+    MRTG logs store the most recent data point first, so reading them
+    in reverse yields the oldest data point first.
 
-    :param file_path: Path to the RRD file.
     :param log_file_path: Path to the plain text log file.
-    :param last_update_time: The most recent timestamp in the RRD file. If not provided, the function will fetch it automatically.
+    :param chunk_size: Number of bytes to read from the file at a time.
+    :return: A generator yielding log lines (str), last line first.
     """
-    # Read log lines from the log file
-    with open(log_file_path) as log_file:
-        log_lines = log_file.readlines()
+    with open(log_file_path, "rb") as log_file:
+        log_file.seek(0, os.SEEK_END)
+        position = log_file.tell()
+        remainder = b""
 
-    # reverse the log lines so that the oldest log line is first
-    log_lines.reverse()
+        while position > 0:
+            read_size = min(chunk_size, position)
+            position -= read_size
+            log_file.seek(position)
+            chunk = log_file.read(read_size) + remainder
 
-    # Check if RRD file exists, if not create it
-    if not os.path.exists(file_path):
-        # Get the timestamp of the first log line
-        first_log_line = log_lines[0]
-        first_timestamp = int(first_log_line.split()[0])
+            lines = chunk.split(b"\n")
 
-        # Create the RRD file with the first timestamp as the start time
-        create_rrd_file(file_path, first_timestamp)
+            # the first line may be incomplete, keep it for the next chunk
+            remainder = lines.pop(0)
 
-    # Fetch the most recent timestamp in the RRD file if not provided
-    if last_update_time is None:
-        last_update_time = get_last_update_time(file_path)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode()
+
+        if remainder.strip():
+            yield remainder.decode()
+
+
+def parse_log_lines(log_lines, last_update_time=None, is_bytes=True):
+    """
+    Parse log lines into RRD update values.
+
+    Lines are expected in chronological order (oldest first). Lines that are
+    not at or before `last_update_time`, lines that do not move time forward
+    and lines that do not contain the five expected values (such as the MRTG
+    log header line) are skipped, since rrdtool would reject them.
+
+    :param log_lines: An iterable of log lines.
+    :param last_update_time: The most recent timestamp in the RRD file. If provided, only newer lines will be returned.
+    :param is_bytes: A boolean value indicating whether the data is in bytes. If True, the data will be converted to bits.
+    :return: A generator yielding `timestamp:bps_in:bps_out:bps_in_max:bps_out_max` strings.
+    """
+    multiplier = 8 if is_bytes else 1
 
-    # Process each log line and update the RRD file
     for log_line in log_lines:
-        update_rrd(file_path, log_line, last_update_time)
+        parts = log_line.split()
 
+        if len(parts) < 5:
+            continue
+
+        timestamp = int(parts[0])
+
+        if last_update_time is not None and timestamp <= last_update_time:
+            continue
+
+        avg_in, avg_out, max_in, max_out = (
+            int(value) * multiplier for value in parts[1:5]
+        )
 
-def stream_log_lines_to_rrd(file_path, log_stream, last_update_time=None):
+        yield f"{timestamp}:{avg_in}:{avg_out}:{max_in}:{max_out}"
+
+        last_update_time = timestamp
+
+
+def update_rrd_batch(file_path, updates, batch_size=UPDATE_BATCH_SIZE):
     """
-    Stream log lines from a file-like object and update the RRD file.
+    Update the RRD file with multiple data points, passing up to
+    `batch_size` data points to each `rrdtool.update` call.
 
     :param file_path: Path to the RRD file.
-    :param log_stream: A file-like object that yields log lines.
+    :param updates: An iterable of `timestamp:values` strings in chronological order.
+    :param batch_size: The maximum number of data points per `rrdtool.update` call.
+    :return: The number of data points written.
+    """
+    updates = iter(updates)
+    count = 0
+
+    while True:
+        batch = list(itertools.islice(updates, batch_size))
+        if not batch:
+            break
+        rrdtool.update(file_path, *batch)
+        count += len(batch)
+
+    return count
+
+
+def update_rrd_from_log(
+    file_path, log_file_path, last_update_time=None, batch_size=UPDATE_BATCH_SIZE
+):
+    """
+    Update an RRD file with data from a plain text log file.
+
+    :param file_path: Path to the RRD file.
+    :param log_file_path: Path to the plain text log file.
     :param last_update_time: The most recent timestamp in the RRD file. If not provided, the function will fetch it automatically.
+    :param batch_size: The maximum number of data points per `rrdtool.update` call.
+    :return: The number of data points written.
     """
-    # Check if RRD file exists, if not create it
-    if not os.path.exists(file_path):
-        create_rrd = True
-    else:
-        create_rrd = False
+    # read the log lines in reverse so that the oldest log line is first
+    return stream_log_lines_to_rrd(
+        file_path,
+        read_log_lines_reverse(log_file_path),
+        last_update_time=last_update_time,
+        batch_size=batch_size,
+    )
 
+
+def stream_log_lines_to_rrd(
+    file_path, log_stream, last_update_time=None, batch_size=UPDATE_BATCH_SIZE
+):
+    """
+    Stream log lines from a file-like object and update the RRD file.
+
+    :param file_path: Path to the RRD file.
+    :param log_stream: A file-like object that yields log lines, oldest first.
+    :param last_update_time: The most recent timestamp in the RRD file. If not provided, the function will fetch it automatically.
+    :param batch_size: The maximum number of data points per `rrdtool.update` call.
+    :return: The number of data points written.
+    """
     # Fetch the most recent timestamp in the RRD file if not provided
     if last_update_time is None:
         last_update_time = get_last_update_time(file_path)
 
-    # Process each log line from the stream and update the RRD file
-    for log_line in log_stream:
-        if create_rrd:
-            create_rrd_file(file_path, int(log_line.split()[0]))
-            create_rrd = False
+    updates = parse_log_lines(log_stream, last_update_time=last_update_time)
 
-        update_rrd(file_path, log_line)
+    # Check if RRD file exists, if not create it using the timestamp
+    # of the first log line as the start time
+    if not os.path.exists(file_path):
+        first_update = next(updates, None)
+        if first_update is None:
+            return 0
+        create_rrd_file(file_path, int(first_update.split(":")[0]))
+        updates = itertools.chain([first_update], updates)
+
+    return update_rrd_batch(file_path, updates, batch_size=batch_size)
 
 
 def create_rrd_file(file_path, start_time, heartbeat=90000):
@@ -235,73 +437,166 @@ def update_rrd(file_path, log_line, last_update_time=None, is_bytes=True):
         )
 
 
-def aggregate_rrd_files(rrd_files, output_file):
+def fetch_rrd_arrays(file_path, start_time=None, duration=86400, resolution=300):
     """
-    Aggregate multiple RRD files into one.
+    Fetch RRD data as NumPy arrays.
 
-    :param rrd_files: A list of paths to the RRD files to be aggregated.
-    :param output_file: Path to the output RRD file.
+    Performs one `AVERAGE` and one `MAX` fetch, unknown values are returned as NaN.
+
+    :param file_path: Path to the RRD file.
+    :param start_time: The start time for fetching data (timestamp). Defaults to now.
+    :param duration: The duration for fetching data in seconds. Defaults to 24 hours (86400 seconds).
+    :param resolution: The resolution for fetching data in seconds.
+    :return: A tuple of (timestamps, values) where timestamps is an int64 array and
+        values is a float array with the columns bps_in, bps_out, bps_in_max, bps_out_max.
+    """
+    if start_time is None:
+        start_time = int(time.time())
+
+    end_time = start_time - duration
+
+    args = ["-s", str(end_time), "-e", str(start_time), "-r", str(resolution)]
+
+    data_avg = rrdtool.fetch(file_path, "AVERAGE", *args)
+    data_max = rrdtool.fetch(file_path, "MAX", *args)
+
+    start_avg, _, step_avg = data_avg[0]
+
+    values_avg = np.array(data_avg[2], dtype=float).reshape(-1, 4)
+    values_max = np.array(data_max[2], dtype=float).reshape(-1, 4)
+
+    num_rows = min(len(values_avg), len(values_max))
+
+    timestamps = start_avg + np.arange(num_rows, dtype=np.int64) * step_avg
+    values = np.column_stack(
+        (
+            values_avg[:num_rows, 0],
+            values_avg[:num_rows, 1],
+            values_max[:num_rows, 2],
+            values_max[:num_rows, 3],
+        )
+    )
+
+    return timestamps, values
+
+
+def fetch_rrd_file_history(file_path, now=None):
     """
-    # Define the durations for each RRA in descending order
-    durations = [86400 * 365 * 19, 86400 * 335, 86400 * 30, 86400 * 6, 86400]
+    Fetch the full history of an RRD file as NumPy arrays, using the finest
+    resolution available for each of the `AGGREGATE_WINDOWS`.
 
-    # Initialize an empty dictionary to store the aggregated data
-    aggregated_data = {}
+    Rows without a `bps_in` value are dropped.
 
-    # Loop through each RRD file
-    for rrd_file in rrd_files:
-        start_time = None
-        idx = 0
+    :param file_path: Path to the RRD file.
+    :param now: The timestamp the windows are relative to. Defaults to now.
+    :return: A tuple of (timestamps, values) sorted by timestamp, see `fetch_rrd_arrays`.
+    """
+    if now is None:
+        now = int(time.time())
+
+    all_timestamps = []
+    all_values = []
+    oldest = None
+
+    for duration, offset in AGGREGATE_WINDOWS:
+        timestamps, values = fetch_rrd_arrays(
+            file_path, start_time=now - offset, duration=duration
+        )
+
+        # finer windows are fetched first, only keep older data points
+        # from coarser windows
+        mask = ~np.isnan(values[:, 0])
+        if oldest is not None:
+            mask &= timestamps < oldest
 
-        # Loop through each duration
-        for duration in durations:
-            try:
-                start_time = int(time.time()) - durations[idx + 1]
-            except IndexError:
-                start_time = None
+        timestamps = timestamps[mask]
+        values = values[mask]
 
-            # Load the RRD file data for the current duration
-            rrd_data = load_rrd_file(rrd_file, start_time=start_time, duration=duration)
+        if len(timestamps):
+            oldest = timestamps[0]
 
-            # Add the RRD data to the aggregated data
-            for data in rrd_data:
-                if data["bps_in"] is None:
-                    continue
+        all_timestamps.insert(0, timestamps)
+        all_values.insert(0, values)
 
-                timestamp = data["timestamp"]
+    return np.concatenate(all_timestamps), np.concatenate(all_values)
 
-                if timestamp not in aggregated_data:
-                    aggregated_data[timestamp] = {"timestamp": timestamp}
-                # Merge data points with the same timestamp by adding the values
-                for key in data:
-                    if key in ["bps_in", "bps_out", "bps_in_max", "bps_out_max"]:
-                        if key not in aggregated_data[timestamp]:
-                            aggregated_data[timestamp][key] = 0
-                        aggregated_data[timestamp][key] += int(data[key])
 
-            # Update the last update time for the next duration
-            last_update_time = start_time
+def sum_rrd_arrays(arrays):
+    """
+    Align and sum RRD data arrays by timestamp, NaN values are treated as 0.
 
-            idx += 1
+    :param arrays: An iterable of (timestamps, values) tuples, see `fetch_rrd_arrays`.
+    :return: A tuple of (timestamps, values) with unique, sorted timestamps.
+    """
+    arrays = list(arrays)
 
-    # print(f"Aggregated {len(rrd_files)} RRD files into {len(aggregated_data)} data points.")
+    if not arrays:
+        return np.empty(0, dtype=np.int64), np.empty((0, 4))
 
-    # Sort the aggregated data by timestamp
-    aggregated_data = sorted(aggregated_data.values(), key=lambda x: x["timestamp"])
+    all_timestamps = np.concatenate([timestamps for timestamps, _ in arrays])
+    all_values = np.nan_to_num(np.concatenate([values for _, values in arrays]))
+
+    timestamps, inverse = np.unique(all_timestamps, return_inverse=True)
+
+    values = np.column_stack(
+        [
+            np.bincount(
+                inverse, weights=all_values[:, column], minlength=len(timestamps)
+            )
+            for column in range(all_values.shape[1])
+        ]
+    )
+
+    return timestamps, values
+
+
+def aggregate_rrd_files(
+    rrd_files, output_file, processes=None, batch_size=UPDATE_BATCH_SIZE
+):
+    """
+    Aggregate multiple RRD files into one.
+
+    :param rrd_files: A list of paths to the RRD files to be aggregated.
+    :param output_file: Path to the output RRD file.
+    :param processes: Number of processes used to fetch the RRD files. Defaults to the number of CPUs, pass 1 to fetch in the current process.
+    :param batch_size: The maximum number of data points per `rrdtool.update` call.
+    :return: The number of data points written.
+    """
+    now = int(time.time())
+
+    if processes != 1 and len(rrd_files) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            arrays = list(
+                executor.map(fetch_rrd_file_history, rrd_files, itertools.repeat(now))
+            )
+    else:
+        arrays = [fetch_rrd_file_history(rrd_file, now) for rrd_file in rrd_files]
+
+    timestamps, values = sum_rrd_arrays(arrays)
+
+    if not len(timestamps):
+        return 0
 
     # Create the output RRD file
     if not os.path.exists(output_file):
-        create_rrd_file(output_file, aggregated_data[0]["timestamp"] + 1)
+        create_rrd_file(output_file, int(timestamps[0]) + 1)
 
-    # Fetch the most recent timestamp in the RRD file if not provided
+    # Fetch the most recent timestamp in the RRD file
     last_update_time = get_last_update_time(output_file)
 
-    # Update the output RRD file with the aggregated data
-    for data in aggregated_data:
-        update_rrd(
-            output_file,
-            f"{data['timestamp']} {int(data['bps_in'])} {int(data['bps_out'])} {int(data['bps_in_max'])} {int(data['bps_out_max'])}",
-            last_update_time=last_update_time,
-            # We are aggregating from existing rrd files, which already store as bits
-            is_bytes=False,
+    if last_update_time is not None:
+        mask = timestamps > last_update_time
+        timestamps = timestamps[mask]
+        values = values[mask]
+
+    # We are aggregating from existing rrd files, which already store as bits
+    values = values.astype(np.int64)
+
+    updates = (
+        f"{timestamp}:{bps_in}:{bps_out}:{bps_in_max}:{bps_out_max}"
+        for timestamp, (bps_in, bps_out, bps_in_max, bps_out_max) in zip(
+            timestamps.tolist(), values.tolist()
         )
+    )
+
+    return update_rrd_batch(output_file, updates, batch_size=batch_size)
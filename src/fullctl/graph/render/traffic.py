@@ -1,13 +1,34 @@
+import hashlib
 import io
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 import matplotlib.dates as mdates
-import matplotlib.pyplot as plt
 import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from matplotlib.lines import Line2D
 from matplotlib.ticker import FuncFormatter
-from PIL import Image
 
-from .util import render_service_logo
+from fullctl.graph.downsample import downsample_indices
+from fullctl.graph.mrtg.rrd import RRDData
+
+from .util import render_service_logo, resize_in_buffer
+
+# number of rendered graphs kept in the output cache
+RENDER_CACHE_SIZE = 128
+
+# default number of points plotted per graph, the rendered graph
+# is 1000 pixels wide
+RENDER_MAX_POINTS = 1000
+
+# figure is re-used per thread, see `get_figure`
+_figures = threading.local()
+
+_render_cache = OrderedDict()
+_render_cache_lock = threading.Lock()
 
 
 def format_y_axis(y, pos=None):
@@ -38,16 +59,120 @@ def calculate_peak(data):
     return bps_in_peak, bps_out_peak
 
 
-def render_graph(data, selector="#graph", title_label="", service=None, save_path=None):
+def get_figure():
+    """
+    This function is used to get the figure and axes to render a graph to.
+
+    The figure and its Agg canvas are created once per thread and re-used,
+    only the axes are cleared and re-styled for each graph.
+    """
+    fig = getattr(_figures, "figure", None)
+
+    if fig is None:
+        # Set up dimensions and margins for the graph
+        fig = Figure(figsize=(10, 4))
+        FigureCanvasAgg(fig)
+        fig.add_subplot()
+        fig.subplots_adjust(right=0.99, left=0.1)
+
+        # Set the background color
+        fig.patch.set_facecolor("#191b22")
+
+        _figures.figure = fig
+
+    ax = fig.axes[0]
+    ax.cla()
+    ax.set_facecolor("#191b22")
+
+    # Set the font / border colors
+    ax.spines["bottom"].set_color("#fff")
+    ax.spines["top"].set_color("#fff")
+    ax.spines["right"].set_color("#fff")
+    ax.spines["left"].set_color("#fff")
+
+    ax.spines["right"].set_visible(False)
+    ax.spines["top"].set_visible(False)
+
+    ax.xaxis.label.set_color("#fff")
+    ax.yaxis.label.set_color("#fff")
+    ax.tick_params(axis="x", colors="#fff")
+    ax.tick_params(axis="y", colors="#fff")
+
+    return fig, ax
+
+
+def render_cache_key(data, **params):
+    """
+    This function is used to compute the output cache key for a graph
+    from its data and render parameters.
+    """
+    key = hashlib.sha256()
+
+    if isinstance(data, RRDData):
+        key.update(data.timestamps.tobytes())
+        key.update(data.values.tobytes())
+    else:
+        key.update(json.dumps(data, default=str).encode())
+
+    key.update(json.dumps(params, sort_keys=True, default=str).encode())
+
+    return key.hexdigest()
+
+
+def clear_render_cache():
+    """
+    This function is used to clear the rendered graph output cache.
+    """
+    with _render_cache_lock:
+        _render_cache.clear()
+
+
+def render_graph(
+    data,
+    selector="#graph",
+    title_label="",
+    service=None,
+    save_path=None,
+    cache=True,
+    max_points=RENDER_MAX_POINTS,
+    downsample_method="lttb",
+):
     """
     This function is used to render the graph.
+
+    When `save_path` is not set the PNG data is returned and, if `cache` is True,
+    kept in an output cache so identical graphs are not rendered twice.
+
+    Series with more than `max_points` points are downsampled using
+    `downsample_method` (`lttb` or `minmax`) before plotting, peak and current
+    values are always computed from the full data. Pass `max_points=None`
+    to plot every point.
     """
     # Check if data is empty
     if not data:
         return
 
+    cache_key = None
+
+    if cache and not save_path:
+        cache_key = render_cache_key(
+            data,
+            selector=selector,
+            title_label=title_label,
+            service=service,
+            max_points=max_points,
+            downsample_method=downsample_method,
+        )
+        with _render_cache_lock:
+            if cache_key in _render_cache:
+                _render_cache.move_to_end(cache_key)
+                return _render_cache[cache_key]
+
     # Convert data to pandas DataFrame
-    df = pd.DataFrame(data)
+    if isinstance(data, RRDData):
+        df = pd.DataFrame(data.columns())
+    else:
+        df = pd.DataFrame(data)
 
     # Convert timestamp to datetime
     df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
@@ -64,36 +189,30 @@ def render_graph(data, selector="#graph", title_label="", service=None, save_pat
     # Calculate the duration in days
     duration = (df["timestamp"].max() - df["timestamp"].min()).days
 
-    # Set up dimensions and margins for the graph
-    fig, ax = plt.subplots(figsize=(10, 4))
-
-    plt.subplots_adjust(right=0.99, left=0.1)
-
-    # Set the background color
-    fig.patch.set_facecolor("#191b22")
-    ax.set_facecolor("#191b22")
-
-    # Set the font / border colors
-    ax.spines["bottom"].set_color("#fff")
-    ax.spines["top"].set_color("#fff")
-    ax.spines["right"].set_color("#fff")
-    ax.spines["left"].set_color("#fff")
-
-    ax.spines["right"].set_visible(False)
-    ax.spines["top"].set_visible(False)
-
-    ax.xaxis.label.set_color("#fff")
-    ax.yaxis.label.set_color("#fff")
-    ax.tick_params(axis="x", colors="#fff")
-    ax.tick_params(axis="y", colors="#fff")
+    # Get the pre-styled figure and axes
+    fig, ax = get_figure()
 
     # Calculate bps_in_peak and bps_out_peak
     bps_in_peak, bps_out_peak = calculate_peak(df)
-    
+
     # Get current (most recent) bps_in and bps_out values
     bps_in_current = df["bps_in"].iloc[-1]
     bps_out_current = df["bps_out"].iloc[-1]
 
+    # Get the lowest bps_in and bps_out value
+    bps_min = df[["bps_in", "bps_out"]].min().min()
+
+    # Downsample the plotted series, a 1000 pixel wide graph
+    # can't show more points than that
+    if max_points and len(df) > max_points:
+        indices = downsample_indices(
+            df["timestamp"].astype("int64").to_numpy(),
+            [df["bps_in_smooth"].to_numpy(), df["bps_out_smooth"].to_numpy()],
+            max_points,
+            method=downsample_method,
+        )
+        df = df.iloc[indices]
+
     # Plot bps_in and bps_out
     ax.plot(df["timestamp"], df["bps_in_smooth"], color="#d1ff27", linewidth=1.5)
     ax.plot(df["timestamp"], df["bps_out_smooth"], color="#0d6efd", linewidth=1.5)
@@ -101,7 +220,7 @@ def render_graph(data, selector="#graph", title_label="", service=None, save_pat
     # Set the x and y limits to make the plot sit snug against the left and bottom axis
     ax.set_xlim(left=df["timestamp"].min(), right=df["timestamp"].max())
     ax.set_ylim(
-        bottom=df[["bps_in", "bps_out"]].min().min(),
+        bottom=bps_min,
         top=max(bps_in_peak, bps_out_peak) * 1.1,
     )
 
@@ -179,17 +298,31 @@ def render_graph(data, selector="#graph", title_label="", service=None, save_pat
     buf.seek(0)
 
     # resize
-    # Load the image data into a PIL Image
-    img = Image.open(buf)
+    result = resize_in_buffer(buf, 1000, 400)
+
+    if cache_key:
+        with _render_cache_lock:
+            _render_cache[cache_key] = result
+            while len(_render_cache) > RENDER_CACHE_SIZE:
+                _render_cache.popitem(last=False)
+
+    return result
+
 
-    # Resize the image
-    img_resized = img.resize((1000, 400))
+def _render_graph(kwargs):
+    return render_graph(**kwargs)
 
-    # Save the resized image to a BytesIO object
-    buf_resized = io.BytesIO()
-    img_resized.save(buf_resized, format="png")
-    # close figure to prevent memory leak
-    plt.close(fig)
-    buf_resized.seek(0)
 
-    return buf_resized.getvalue()
+def render_graphs(graphs, processes=None):
+    """
+    This function is used to render a batch of graphs in a process pool.
+
+    `graphs` is a list of dicts holding the keyword arguments for `render_graph`,
+    results are returned in the same order. Pass `processes=1` to render in
+    the current process.
+    """
+    if processes == 1 or len(graphs) < 2:
+        return [_render_graph(kwargs) for kwargs in graphs]
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(_render_graph, graphs))
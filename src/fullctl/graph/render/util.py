@@ -1,3 +1,4 @@
+import functools
 import io
 import os
 
@@ -6,7 +7,13 @@ from matplotlib.offsetbox import AnnotationBbox, OffsetImage
 from PIL import Image
 
 
-def render_service_logo(service, ax):
+@functools.lru_cache(maxsize=None)
+def load_service_logo(service):
+    """
+    Rasterize the service logo and composite it onto the graph background.
+
+    The result is cached per service for the lifetime of the process.
+    """
     image_path = os.path.join(
         os.path.dirname(__file__),
         "..",
@@ -26,7 +33,11 @@ def render_service_logo(service, ax):
 
     img = img.convert("RGBA")
     bg = Image.new("RGBA", img.size, (25, 27, 34))
-    img = Image.alpha_composite(bg, img)
+    return Image.alpha_composite(bg, img)
+
+
+def render_service_logo(service, ax):
+    img = load_service_logo(service)
 
     # Create an OffsetImage from the PIL image
     # Increase the zoom level to make the logo bigger
@@ -13,8 +13,10 @@ https://docs.victoriametrics.com/url-examples/#influxwrite
 
 curl http://localhost:8428/prometheus/api/v1/query -d 'query=vm_http_request_errors_total'
 
-## Cluster version query (not yet supported)
+## Cluster version
+
 curl http://<vmselect>:8481/select/0/prometheus/api/v1/query -d 'query=vm_http_request_errors_total'
+curl -d 'measurement,tag1=value1 field1=123' -X POST http://<vminsert>:8480/insert/0/influx/write
 
 ## Python API usage
 
@@ -24,15 +26,48 @@ metrics.write("cpu", {"host": "server1"}, {"usage": 0.5})
 metrics.query("cpu_usage")
 metrics.query("cpu_usage{host='server1'}")
 metrics.query_range("cpu_usage", "-1d", "1h")
+
+## Cluster version usage
+
+metrics = Metrics("http://vmselect:8481", tenant=0, insert_url="http://vminsert:8480")
+
+## Sharded queries
+
+Long time ranges and large metric lists can be split into shards that
+are queried concurrently and merged into one result.
+
+metrics.query_range("cpu_usage", "-30d", "5m", shard_duration="1d", shard_timeout=10)
+metrics.query_range_metrics("sum", metric_names, {"host": "server1"}, "-1d", "5m")
+
+## Cached queries
+
+metrics = Metrics("http://victoriametrics:8428", cache=QueryCache(ttl=60))
+
+## Async client
+
+async with AsyncMetrics("http://victoriametrics:8428") as metrics:
+    await metrics.query_range("cpu_usage", "-1d", "1h")
+
+## Buffered writes
+
+writer = metrics.buffered_writer()
+writer.write("cpu", {"host": "server1"}, {"usage": 0.5})
 """
 
+import functools
+import itertools
 import os
 
 import requests
 
-from fullctl.service_bridge.client import url_join
-
+from .aio import AsyncMetrics  # noqa: F401
+from .base import METRICS_PER_SHARD, SHARD_WORKERS, BaseMetrics
+from .cache import QueryCache  # noqa: F401
+from .columnar import ColumnarQueryResult, decode_response, np
+from .line_protocol import CHUNK_SIZE, iter_encoded_chunks
 from .schema import Point, QueryResult
+from .shard import combine_shards, merge_time_shards, run_shards
+from .writer import BufferedWriter
 
 try:
     from django.conf import settings
@@ -40,127 +75,17 @@ try:
     TIMESERIES_DB_URL = settings.TIMESERIES_DB_URL
     TIMESERIES_DB_USER = settings.TIMESERIES_DB_USER
     TIMESERIES_DB_PASSWORD = settings.TIMESERIES_DB_PASSWORD
-except ImportError:
+except Exception:
+    # Improperly configured, settings missing or django not installed
     TIMESERIES_DB_URL = os.getenv("TIMESERIES_DB_URL", "")
     TIMESERIES_DB_USER = os.getenv("TIMESERIES_DB_USER", "")
     TIMESERIES_DB_PASSWORD = os.getenv("TIMESERIES_DB_PASSWORD", "")
 
-try:
-    import pytimeparse2
-except ImportError:
-    pytimeparse2 = None
-
-
-class Metrics:
-    def __init__(self, url: str, auth: tuple[str, str] | None = None):
-        """
-        Initialize the Metrics client
-
-        Arguments:
-
-        - url: The Victoriametrics URL, e.g. http://victoriametrics:8428
-        - auth: Optional. A tuple of (username, password) for basic authentication
-        """
-
-        self.url = url
-        self.auth = auth
-
-    @classmethod
-    def validate_period(cls, period: str | int):
-        """
-        Validate the period string
-
-        Arguments:
-
-        - period: The period string, e.g. "-1d", "1h", "5m" etc.
-          if an integer is passed, it is considered valid as well
-          and assumed to be in seconds (or nanoseconds)
-
-        Raises:
-
-        - ValueError: If the period string is invalid
-        """
-
-        if pytimeparse2 is None:
-            return
-
-        if isinstance(period, int):
-            return
-
-        try:
-            pytimeparse2.parse(period.lstrip("-"))
-        except ValueError:
-            raise ValueError(f"Invalid period string: {period}")
-
-    @classmethod
-    def build_query_string(
-        cls, aggregator: str, metrics: list[str], tags: dict, time_range: str
-    ) -> str:
-        """
-        Build a query string for Victoriametrics
-
-        Arguments:
-
-        - aggregator: The aggregator function, e.g. sum, avg, max, min etc.
-        - metrics: A list of metric names
-        - tags: A dictionary of tags
-        - time_range: The time range, e.g. "-1d", "1h", "5m" etc.
-
-        Returns:
-
-        - The query string (PromQL/MetricsQL)
-
-        Examples:
-
-        ## Query all cpu_usage metrics
-        metrics.query("sum", ["cpu_usage"], {}, "-1d")
-        > sum({__name__=~"cpu_usage"}[-1d])
-        """
-
-        cls.validate_period(time_range)
-
-        # Build the metric selector
-        metric_selector = f'__name__=~"{"|".join(metrics)}"'
-
-        # Build the tag selectors
-        tag_selectors = ",".join(
-            [f'{k}="{v}"' for k, v in tags.items() if v is not None]
-        )
-
-        # Combine metric and tag selectors
-        selector = (
-            f'{{{metric_selector}{", " if tag_selectors else ""}{tag_selectors}}}'
-        )
-
-        # Construct the full query
-        if aggregator and time_range:
-            query = f"{aggregator}({selector}[{time_range}])"
-        elif aggregator:
-            query = f"{aggregator}({selector})"
-        elif time_range:
-            query = f"{selector}[{time_range}]"
-
-        return query
-
-    def to_line_protocol(
-        self,
-        measurement: str,
-        tags: dict[str, str | int | float],
-        fields: dict[str, int | float],
-        timestamp: int | None = None,
-    ) -> str:
-        tags_str = ",".join([f"{k}={v}" for k, v in tags.items()])
-        fields_str = ",".join([f"{k}={v}" for k, v in fields.items()])
-        line = f"{measurement},{tags_str} {fields_str}"
-
-        if timestamp is not None:
-            # if timestamp is not nanoseconds convert to nanoseconds
-            if timestamp < 1e18:  # If timestamp is in seconds or milliseconds
-                timestamp = int(timestamp * 1e9)  # Convert to nanoseconds
 
-            line += f" {int(timestamp)}"
-
-        return line
+class Metrics(BaseMetrics):
+    """
+    Victoriametrics client
+    """
 
     def write(
         self,
@@ -182,21 +107,25 @@ class Metrics:
         metrics.write("cpu", {"host": "server1"}, {"usage": 0.5})
         metrics.write("cpu", {"host": "server1"}, {"usage": 0.5}, timestamp=1609459200)
         """
-        url = url_join(self.url, "/write").rstrip("/")
         requests.post(
-            url, data=self.to_line_protocol(measurement, tags, fields, timestamp)
+            self.write_url,
+            data=self.to_line_protocol(measurement, tags, fields, timestamp),
+            auth=self.auth,
         )
 
     def write_many(
         self,
         data: list[Point | dict],
+        chunk_size: int = CHUNK_SIZE,
     ):
         """
         Write multiple metrics to VictoriaMetrics
 
         Arguments:
 
-        - data: A list of Point objects or dictionaries
+        - data: A list (or any iterable) of Point objects or dictionaries,
+          dictionaries are trusted and not validated
+        - chunk_size: Payloads larger than this (bytes) are streamed in chunks
 
         Examples:
 
@@ -217,23 +146,39 @@ class Metrics:
         metrics.write_many(points)
 
         """
-        url = url_join(self.url, "/write").rstrip("/")
+        # dictionaries are encoded as is, without validation through `Point`
+        chunks = iter_encoded_chunks(data, chunk_size=chunk_size)
 
-        lines = []
+        # small payloads are sent in one piece, larger ones are streamed
+        # to victoriametrics in chunks as they are encoded
+        first = next(chunks, b"")
+        second = next(chunks, None)
 
-        for point in data:
+        if second is None:
+            body = first
+        else:
+            body = itertools.chain([first, second], chunks)
 
-            if not isinstance(point, Point):
-                point = Point(**point)
+        requests.post(self.write_url, data=body, auth=self.auth)
 
-            lines.append(
-                self.to_line_protocol(
-                    point.measurement, point.tags, point.fields, point.timestamp
-                )
-            )
+    def buffered_writer(self, **kwargs) -> BufferedWriter:
+        """
+        Returns a BufferedWriter that queues points in memory and writes
+        them to Victoriametrics in batches from a background thread
 
-        lines = "\n".join(lines)
-        requests.post(url, data=lines, auth=self.auth)
+        The writer should be long lived, e.g., one per process.
+
+        Arguments:
+
+        - kwargs: Passed to BufferedWriter (batch_size, flush_interval,
+          max_queue_size, drop_policy, retries, retry_backoff, compress, timeout)
+
+        Examples:
+
+        writer = metrics.buffered_writer(batch_size=500, flush_interval=1)
+        writer.write("cpu", {"host": "server1"}, {"usage": 0.5})
+        """
+        return BufferedWriter(self, **kwargs)
 
     def query(self, query: str, keep_metric_names: bool = False) -> QueryResult:
         """
@@ -255,12 +200,19 @@ class Metrics:
         metrics.query("cpu_usage{host='server1'}")
         """
 
-        url = url_join(self.url, "/api/v1/query").rstrip("/")
+        url = self.select_url("/api/v1/query")
+        params = self.query_params(query, keep_metric_names)
+
+        if self.cache is not None:
+            return self.cache.query(self._query, url, params)
 
-        if keep_metric_names and "keep_metric_names" not in query:
-            query = f"{query} keep_metric_names"
+        return self._query(params, url=url)
 
-        data = requests.get(url, params={"query": query}, auth=self.auth).json()
+    def _query(self, params: dict, url: str | None = None) -> QueryResult:
+        if url is None:
+            url = self.select_url("/api/v1/query")
+
+        data = requests.get(url, params=params, auth=self.auth).json()
         return QueryResult(**data)
 
     def query_range(
@@ -272,7 +224,12 @@ class Metrics:
         timeout: str | None = None,
         keep_metric_names: bool = False,
         max_lookback: str | None = None,
-    ) -> QueryResult:
+        columnar: bool = False,
+        stream: bool = False,
+        shard_duration: str | int | None = None,
+        shard_timeout: float | None = None,
+        max_workers: int = SHARD_WORKERS,
+    ) -> QueryResult | ColumnarQueryResult:
         """
         Query a metric range from Victoriametrics
 
@@ -287,6 +244,14 @@ class Metrics:
         - timeout: optional query timeout. For example, timeout=5s. Query is canceled when the timeout is reached. By default the timeout is set to the value of -search.maxQueryDuration command-line flag passed to single-node VictoriaMetrics or to vmselect component in VictoriaMetrics cluster.
         - keep_metric_names: If True, the metric names are preserved in the result. If False, the metric names are removed from the result.
         - max_lookback: optional maximum lookback duration for the query. This affects the interpolation of missing data points. A small value like `1s` will for example ensure no data points are interpolated more than 1 second away from the actual data points.
+        - columnar: If True, return a ColumnarQueryResult holding the series as numpy arrays. Requires numpy.
+        - stream: If True, decode the series while the response is read. Requires ijson, stats are not returned in this mode.
+        - shard_duration: If set, the time range is split into step aligned windows of this duration (e.g. "1d" or seconds) that are queried concurrently and merged. Requires numpy, stats are not returned in this mode.
+        - shard_timeout: Optional. Timeout (seconds) for each request, also passed to Victoriametrics as the query timeout unless `timeout` is set.
+        - max_workers: Maximum number of shards queried at the same time.
+
+        Unless `columnar`, `stream` or `shard_duration` is set the response is returned as a QueryResult with the values as parsed from the response. Otherwise series are decoded to float64 arrays, the returned QueryResult is built from them without validation.
+
         Examples:
 
         ## Query all cpu_usage metrics for the last day
@@ -294,27 +259,163 @@ class Metrics:
 
         ## Query cpu_usage metric for host server1 (tag) for the last day
         metrics.query_range("cpu_usage{host='server1'}", "-1d", "1h")
+
+        ## Query the last 30 days in concurrent 1 day windows
+        metrics.query_range("cpu_usage", "-30d", "5m", shard_duration="1d", shard_timeout=10)
         """
 
-        url = url_join(self.url, "/api/v1/query_range").rstrip("/")
+        url = self.select_url("/api/v1/query_range")
+        params = self.query_range_params(
+            query,
+            start,
+            step,
+            end=end,
+            timeout=timeout,
+            keep_metric_names=keep_metric_names,
+            max_lookback=max_lookback,
+            shard_timeout=shard_timeout,
+        )
 
-        if keep_metric_names and "keep_metric_names" not in query:
-            query = f"{query} keep_metric_names"
+        if not (columnar or stream or shard_duration):
+            # values are returned as parsed from the response, the float64
+            # arrays of the columnar result would change their type
+            fetch = functools.partial(
+                self._query_range_result, url=url, timeout=shard_timeout
+            )
+            if self.cache is not None:
+                return self.cache.query(fetch, url, params)
+            return fetch(params)
 
-        params = {"query": query, "start": start, "step": step}
+        if np is None:
+            raise ImportError("numpy is required for columnar and sharded queries")
 
-        if end:
-            params["end"] = end
+        fetch = functools.partial(self._query_range, url=url, timeout=shard_timeout)
 
-        if timeout:
-            params["timeout"] = timeout
+        if shard_duration:
+            result = self._query_range_sharded(
+                fetch, url, params, shard_duration, max_workers
+            )
+        elif self.cache is not None and not stream:
+            result = self.cache.query_range(fetch, url, params)
+        else:
+            result = fetch(params, stream=stream)
 
-        if max_lookback:
-            params["max_lookback"] = max_lookback
+        if columnar:
+            return result
 
-        data = requests.get(url, params=params, auth=self.auth).json()
+        return result.to_query_result()
 
-        return QueryResult(**data)
+    def _query_range_result(
+        self, params: dict, url: str, timeout: float | None = None
+    ) -> QueryResult:
+        response = requests.get(url, params=params, auth=self.auth, timeout=timeout)
+        return QueryResult(**response.json())
+
+    def _query_range(
+        self,
+        params: dict,
+        url: str | None = None,
+        stream: bool = False,
+        timeout: float | None = None,
+    ) -> ColumnarQueryResult:
+        if url is None:
+            url = self.select_url("/api/v1/query_range")
+
+        response = requests.get(
+            url, params=params, auth=self.auth, stream=stream, timeout=timeout
+        )
+        return decode_response(response, stream=stream)
+
+    def _query_range_sharded(
+        self,
+        fetch,
+        url: str,
+        params: dict,
+        shard_duration: str | int,
+        max_workers: int,
+    ) -> ColumnarQueryResult:
+        windows = self.time_shards(params, shard_duration)
+
+        if self.cache is not None:
+            fetch = functools.partial(self.cache.query_range, fetch, url)
+
+        def fetch_window(window):
+            return fetch(dict(params, start=window[0], end=window[1]))
+
+        return merge_time_shards(run_shards(fetch_window, windows, max_workers))
+
+    def query_range_metrics(
+        self,
+        aggregator: str,
+        metrics: list[str],
+        tags: dict,
+        start: str,
+        step: str,
+        end: str | None = None,
+        time_range: str = "",
+        metrics_per_shard: int = METRICS_PER_SHARD,
+        max_workers: int = SHARD_WORKERS,
+        shard_timeout: float | None = None,
+        shard_duration: str | int | None = None,
+        timeout: str | None = None,
+        keep_metric_names: bool = False,
+        max_lookback: str | None = None,
+        columnar: bool = False,
+    ) -> QueryResult | ColumnarQueryResult:
+        """
+        Range query over a large list of metric names
+
+        The metric names are split into shards of `metrics_per_shard`
+        names, one query is built for each shard with `build_query_string`
+        and the queries are run concurrently. Requires numpy.
+
+        Arguments:
+
+        - aggregator: The aggregator function. Results of sum, count, min and max are
+          combined across shards, other aggregators raise a ValueError if more than
+          one shard is needed. Can be empty.
+        - metrics: A list of metric names
+        - tags: A dictionary of tags
+        - start, step, end, timeout, keep_metric_names, max_lookback, columnar,
+          shard_duration, shard_timeout: see `query_range`
+        - time_range: Optional. The range selector duration passed to `build_query_string`
+        - metrics_per_shard: Maximum number of metric names per shard
+        - max_workers: Maximum number of shards queried at the same time
+
+        Examples:
+
+        ## Total of all port traffic metrics for the last day
+        metrics.query_range_metrics("sum", port_metric_names, {"org": "1"}, "-1d", "5m")
+        """
+
+        shards = self.metric_shards(aggregator, metrics, metrics_per_shard)
+
+        def fetch_shard(shard):
+            return self.query_range(
+                self.build_query_string(aggregator, shard, tags, time_range),
+                start,
+                step,
+                end=end,
+                timeout=timeout,
+                keep_metric_names=keep_metric_names,
+                max_lookback=max_lookback,
+                columnar=True,
+                shard_duration=shard_duration,
+                shard_timeout=shard_timeout,
+                max_workers=max_workers,
+            )
+
+        results = run_shards(fetch_shard, shards, max_workers)
+
+        if len(results) == 1:
+            result = results[0]
+        else:
+            result = combine_shards(results, aggregator or "")
+
+        if columnar:
+            return result
+
+        return result.to_query_result()
 
     def delete(self, match: str):
         """
@@ -331,9 +432,8 @@ class Metrics:
         metrics.delete('{__name__=~"http_requests_total_count"}')
         """
 
-        url = url_join(self.url, "/api/v1/admin/tsdb/delete_series").rstrip("/")
         params = {"match[]": match}
-        response = requests.get(url, params=params, auth=self.auth)
+        response = requests.get(self.delete_url, params=params, auth=self.auth)
         if response.status_code != 204:
             raise Exception(
                 f"Failed to delete metric: {response.status_code} {response.text}"
@@ -0,0 +1,268 @@
+"""
+Async Victoriametrics client
+
+Mirrors the `Metrics` API on top of a pooled httpx client so async code
+(e.g. the task poller or ASGI views) can write and query metrics without
+handing off to a thread. Line protocol encoding, query building and
+sharding are shared with `Metrics`.
+
+Requires httpx.
+
+## Python API usage
+
+from fullctl.metrics import AsyncMetrics
+
+async with AsyncMetrics("http://victoriametrics:8428") as metrics:
+    await metrics.write("cpu", {"host": "server1"}, {"usage": 0.5})
+    await metrics.query_range("cpu_usage", "-1d", "1h")
+"""
+
+import asyncio
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from .base import METRICS_PER_SHARD, SHARD_WORKERS, BaseMetrics
+from .columnar import ColumnarQueryResult, decode_content, np
+from .line_protocol import encode_points
+from .schema import Point, QueryResult
+from .shard import combine_shards, merge_time_shards
+
+__all__ = ["AsyncMetrics"]
+
+
+class AsyncMetrics(BaseMetrics):
+    """
+    Async Victoriametrics client
+
+    The httpx client is created on first use and should be closed with
+    `aclose` (or by using the client as an async context manager).
+    Query results are not cached, `QueryCache` is for the sync client only.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        auth: tuple[str, str] | None = None,
+        tenant: str | int | None = None,
+        insert_url: str | None = None,
+        max_connections: int = 10,
+        timeout: float = 30.0,
+        client=None,
+    ):
+        """
+        Initialize the async Metrics client
+
+        Arguments:
+
+        - url, auth, tenant, insert_url: see `Metrics`
+        - max_connections: Size of the connection pool
+        - timeout: Default request timeout (seconds)
+        - client: Optional. An `httpx.AsyncClient` to use instead of creating one
+        """
+
+        if httpx is None:
+            raise ImportError("httpx is required for AsyncMetrics")
+
+        super().__init__(url, auth=auth, tenant=tenant, insert_url=insert_url)
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def _request(self, method: str, url: str, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = httpx.USE_CLIENT_DEFAULT
+        return await self.client.request(
+            method, url, auth=self.auth, timeout=timeout, **kwargs
+        )
+
+    async def write(
+        self,
+        measurement: str,
+        tags: dict[str, str | int | float],
+        fields: dict[str, int | float],
+        timestamp: int | None = None,
+    ):
+        """
+        Write a metric to VictoriaMetrics, see `Metrics.write`
+        """
+        await self._request(
+            "POST",
+            self.write_url,
+            content=self.to_line_protocol(measurement, tags, fields, timestamp),
+        )
+
+    async def write_many(self, data: list[Point | dict]):
+        """
+        Write multiple metrics to VictoriaMetrics, see `Metrics.write_many`
+        """
+        await self._request("POST", self.write_url, content=encode_points(data))
+
+    async def query(self, query: str, keep_metric_names: bool = False) -> QueryResult:
+        """
+        Query a metric from Victoriametrics, see `Metrics.query`
+        """
+        response = await self._request(
+            "GET",
+            self.select_url("/api/v1/query"),
+            params=self.query_params(query, keep_metric_names),
+        )
+        return QueryResult(**response.json())
+
+    async def query_range(
+        self,
+        query: str,
+        start: str,
+        step: str,
+        end: str | None = None,
+        timeout: str | None = None,
+        keep_metric_names: bool = False,
+        max_lookback: str | None = None,
+        columnar: bool = False,
+        shard_duration: str | int | None = None,
+        shard_timeout: float | None = None,
+        max_workers: int = SHARD_WORKERS,
+    ) -> QueryResult | ColumnarQueryResult:
+        """
+        Query a metric range from Victoriametrics, see `Metrics.query_range`
+
+        Shards are queried concurrently as tasks on the running event loop.
+        """
+
+        url = self.select_url("/api/v1/query_range")
+        params = self.query_range_params(
+            query,
+            start,
+            step,
+            end=end,
+            timeout=timeout,
+            keep_metric_names=keep_metric_names,
+            max_lookback=max_lookback,
+            shard_timeout=shard_timeout,
+        )
+
+        if not (columnar or shard_duration):
+            response = await self._request(
+                "GET", url, params=params, timeout=shard_timeout
+            )
+            return QueryResult(**response.json())
+
+        if np is None:
+            raise ImportError("numpy is required for columnar and sharded queries")
+
+        if shard_duration:
+            semaphore = asyncio.Semaphore(max_workers)
+
+            async def fetch_window(window):
+                async with semaphore:
+                    return await self._query_range(
+                        dict(params, start=window[0], end=window[1]),
+                        url,
+                        timeout=shard_timeout,
+                    )
+
+            windows = self.time_shards(params, shard_duration)
+            result = merge_time_shards(
+                await asyncio.gather(*[fetch_window(window) for window in windows])
+            )
+        else:
+            result = await self._query_range(params, url, timeout=shard_timeout)
+
+        if columnar:
+            return result
+
+        return result.to_query_result()
+
+    async def _query_range(
+        self, params: dict, url: str, timeout: float | None = None
+    ) -> ColumnarQueryResult:
+        response = await self._request("GET", url, params=params, timeout=timeout)
+        return decode_content(response.content)
+
+    async def query_range_metrics(
+        self,
+        aggregator: str,
+        metrics: list[str],
+        tags: dict,
+        start: str,
+        step: str,
+        end: str | None = None,
+        time_range: str = "",
+        metrics_per_shard: int = METRICS_PER_SHARD,
+        max_workers: int = SHARD_WORKERS,
+        shard_timeout: float | None = None,
+        timeout: str | None = None,
+        keep_metric_names: bool = False,
+        max_lookback: str | None = None,
+        columnar: bool = False,
+    ) -> QueryResult | ColumnarQueryResult:
+        """
+        Range query over a large list of metric names, see
+        `Metrics.query_range_metrics`
+        """
+
+        shards = self.metric_shards(aggregator, metrics, metrics_per_shard)
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def fetch_shard(shard):
+            async with semaphore:
+                return await self.query_range(
+                    self.build_query_string(aggregator, shard, tags, time_range),
+                    start,
+                    step,
+                    end=end,
+                    timeout=timeout,
+                    keep_metric_names=keep_metric_names,
+                    max_lookback=max_lookback,
+                    columnar=True,
+                    shard_timeout=shard_timeout,
+                )
+
+        results = await asyncio.gather(*[fetch_shard(shard) for shard in shards])
+
+        if len(results) == 1:
+            result = results[0]
+        else:
+            result = combine_shards(results, aggregator or "")
+
+        if columnar:
+            return result
+
+        return result.to_query_result()
+
+    async def delete(self, match: str):
+        """
+        Delete a metric from Victoriametrics, see `Metrics.delete`
+        """
+        response = await self._request(
+            "GET", self.delete_url, params={"match[]": match}
+        )
+        if response.status_code != 204:
+            raise Exception(
+                f"Failed to delete metric: {response.status_code} {response.text}"
+            )
@@ -0,0 +1,274 @@
+"""
+Victoriametrics client base shared by the sync and async clients
+"""
+
+import time
+
+from fullctl.service_bridge.client import url_join
+
+from .cache import QueryCache, parse_duration, parse_time
+from .line_protocol import encode_line
+from .shard import COMBINABLE_AGGREGATORS, split_time_range
+
+try:
+    import pytimeparse2
+except ImportError:
+    pytimeparse2 = None
+
+__all__ = ["BaseMetrics", "SHARD_WORKERS", "METRICS_PER_SHARD"]
+
+# default number of concurrent shard queries
+SHARD_WORKERS = 4
+
+# default number of metric names per shard for `query_range_metrics`
+METRICS_PER_SHARD = 50
+
+
+class BaseMetrics:
+    """
+    Victoriametrics client base, holds everything that does not do I/O
+    and is shared by `Metrics` and `AsyncMetrics`
+    """
+
+    def __init__(
+        self,
+        url: str,
+        auth: tuple[str, str] | None = None,
+        cache: QueryCache | None = None,
+        tenant: str | int | None = None,
+        insert_url: str | None = None,
+    ):
+        """
+        Initialize the client
+
+        Arguments:
+
+        - url: The Victoriametrics URL, e.g. http://victoriametrics:8428, or the
+          vmselect URL of a cluster, e.g. http://vmselect:8481
+        - auth: Optional. A tuple of (username, password) for basic authentication
+        - cache: Optional. A QueryCache to cache and coalesce query and query_range results
+        - tenant: Optional. The cluster tenant (account id or account_id:project_id),
+          if set the cluster version URL layout is used
+        - insert_url: Optional. The vminsert URL of a cluster, e.g. http://vminsert:8480,
+          defaults to `url`
+        """
+
+        self.url = url
+        self.auth = auth
+        self.cache = cache
+        self.tenant = tenant
+        self.insert_url = insert_url
+
+    @property
+    def cluster(self) -> bool:
+        return self.tenant is not None
+
+    @property
+    def write_url(self) -> str:
+        """
+        The influx line protocol write URL
+        """
+        if self.cluster:
+            return url_join(
+                self.insert_url or self.url, f"/insert/{self.tenant}/influx/write"
+            ).rstrip("/")
+        return url_join(self.url, "/write").rstrip("/")
+
+    def select_url(self, path: str) -> str:
+        """
+        Returns the URL for a prometheus API path, e.g. /api/v1/query
+        """
+        if self.cluster:
+            return url_join(self.url, f"/select/{self.tenant}/prometheus", path).rstrip(
+                "/"
+            )
+        return url_join(self.url, path).rstrip("/")
+
+    @classmethod
+    def validate_period(cls, period: str | int):
+        """
+        Validate the period string
+
+        Arguments:
+
+        - period: The period string, e.g. "-1d", "1h", "5m" etc.
+          if an integer is passed, it is considered valid as well
+          and assumed to be in seconds (or nanoseconds)
+
+        Raises:
+
+        - ValueError: If the period string is invalid
+        """
+
+        if pytimeparse2 is None:
+            return
+
+        if isinstance(period, int):
+            return
+
+        try:
+            pytimeparse2.parse(period.lstrip("-"))
+        except ValueError:
+            raise ValueError(f"Invalid period string: {period}")
+
+    @classmethod
+    def build_query_string(
+        cls, aggregator: str, metrics: list[str], tags: dict, time_range: str
+    ) -> str:
+        """
+        Build a query string for Victoriametrics
+
+        Arguments:
+
+        - aggregator: The aggregator function, e.g. sum, avg, max, min etc.
+        - metrics: A list of metric names
+        - tags: A dictionary of tags
+        - time_range: The time range, e.g. "-1d", "1h", "5m" etc.
+
+        Returns:
+
+        - The query string (PromQL/MetricsQL)
+
+        Examples:
+
+        ## Query all cpu_usage metrics
+        metrics.query("sum", ["cpu_usage"], {}, "-1d")
+        > sum({__name__=~"cpu_usage"}[-1d])
+        """
+
+        cls.validate_period(time_range)
+
+        # Build the metric selector
+        metric_selector = f'__name__=~"{"|".join(metrics)}"'
+
+        # Build the tag selectors
+        tag_selectors = ",".join(
+            [f'{k}="{v}"' for k, v in tags.items() if v is not None]
+        )
+
+        # Combine metric and tag selectors
+        selector = (
+            f'{{{metric_selector}{", " if tag_selectors else ""}{tag_selectors}}}'
+        )
+
+        # Construct the full query
+        if aggregator and time_range:
+            query = f"{aggregator}({selector}[{time_range}])"
+        elif aggregator:
+            query = f"{aggregator}({selector})"
+        elif time_range:
+            query = f"{selector}[{time_range}]"
+        else:
+            query = selector
+
+        return query
+
+    def to_line_protocol(
+        self,
+        measurement: str,
+        tags: dict[str, str | int | float],
+        fields: dict[str, int | float],
+        timestamp: int | None = None,
+    ) -> str:
+        """
+        Encode a point to a line protocol line
+
+        Arguments:
+
+        - measurement: The name of the metric
+        - tags: A dictionary of tags
+        - fields: A dictionary of fields and their values
+        - timestamp: Optional. The timestamp in seconds, milliseconds, microseconds
+          or nanoseconds, it is converted to nanoseconds
+        """
+        return encode_line(measurement, tags, fields, timestamp)
+
+    @property
+    def delete_url(self) -> str:
+        """
+        The delete series URL
+        """
+        if self.cluster:
+            return url_join(
+                self.url,
+                f"/delete/{self.tenant}/prometheus/api/v1/admin/tsdb/delete_series",
+            ).rstrip("/")
+        return url_join(self.url, "/api/v1/admin/tsdb/delete_series").rstrip("/")
+
+    def query_params(self, query: str, keep_metric_names: bool = False) -> dict:
+        """
+        Returns the request params for an instant query
+        """
+        if keep_metric_names and "keep_metric_names" not in query:
+            query = f"{query} keep_metric_names"
+
+        return {"query": query}
+
+    def query_range_params(
+        self,
+        query: str,
+        start: str,
+        step: str,
+        end: str | None = None,
+        timeout: str | None = None,
+        keep_metric_names: bool = False,
+        max_lookback: str | None = None,
+        shard_timeout: float | None = None,
+    ) -> dict:
+        """
+        Returns the request params for a range query, see `Metrics.query_range`
+        """
+        params = self.query_params(query, keep_metric_names)
+        params.update(start=start, step=step)
+
+        if end:
+            params["end"] = end
+
+        if timeout:
+            params["timeout"] = timeout
+        elif shard_timeout:
+            params["timeout"] = f"{shard_timeout}s"
+
+        if max_lookback:
+            params["max_lookback"] = max_lookback
+
+        return params
+
+    def time_shards(
+        self, params: dict, shard_duration: str | int
+    ) -> list[tuple[int, int]]:
+        """
+        Returns the (start, end) windows a range query is split into
+        """
+        now = time.time()
+        step = parse_duration(params["step"])
+        start = parse_time(params["start"], now)
+        end = parse_time(params.get("end"), now)
+        duration = parse_duration(shard_duration)
+
+        if not step or not duration or start is None or end is None:
+            raise ValueError(
+                "Unable to shard query, start, end, step and shard_duration "
+                "need to be timestamps or durations"
+            )
+
+        return split_time_range(start, end, step, duration)
+
+    def metric_shards(
+        self, aggregator: str, metrics: list[str], metrics_per_shard: int
+    ) -> list[list[str]]:
+        """
+        Returns the metric name lists a large selector is split into
+        """
+        names = list(metrics)
+        shards = [
+            names[i : i + metrics_per_shard]
+            for i in range(0, len(names), metrics_per_shard)
+        ] or [[]]
+
+        if len(shards) > 1 and (aggregator or "") not in COMBINABLE_AGGREGATORS:
+            raise ValueError(
+                f"Results of aggregator {aggregator} cannot be combined across shards"
+            )
+
+        return shards
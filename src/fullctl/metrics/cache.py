@@ -0,0 +1,335 @@
+"""
+Query result cache for the Metrics client
+
+Columnar range query results are cached per query and step, with start
+and end aligned to step boundaries. Requests for a window that overlaps a
+cached window only fetch the missing head and / or tail from
+VictoriaMetrics. Other query results are cached as a whole.
+
+Identical queries that are in flight at the same time are coalesced
+into a single request.
+
+## Python API usage
+
+from fullctl.metrics import Metrics, QueryCache
+metrics = Metrics("http://victoriametrics:8428", cache=QueryCache(ttl=60))
+metrics.query_range("cpu_usage", "-1d", "5m", columnar=True)
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .columnar import ColumnarQueryResult, Series
+
+__all__ = ["QueryCache", "parse_duration"]
+
+DURATION_UNITS = {
+    "ms": 0.001,
+    "s": 1,
+    "m": 60,
+    "h": 3600,
+    "d": 86400,
+    "w": 86400 * 7,
+    "y": 86400 * 365,
+}
+
+DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h|d|w|y)")
+
+
+def parse_duration(value: str | int | float) -> float | None:
+    """
+    Parse a MetricsQL duration (e.g. "5m", "1h30m") or number of
+    seconds, returns None if the value cannot be parsed
+    """
+
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    value = value.strip()
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    position = 0
+    seconds = 0.0
+
+    for match in DURATION_RE.finditer(value):
+        if match.start() != position:
+            return None
+        seconds += float(match.group(1)) * DURATION_UNITS[match.group(2)]
+        position = match.end()
+
+    if not position or position != len(value):
+        return None
+
+    return seconds
+
+
+def parse_time(value: str | int | float | None, now: float) -> float | None:
+    """
+    Parse an absolute unix timestamp or a time relative to now
+    (e.g. "-1d"), returns None if the value cannot be parsed
+    """
+
+    if value is None or value == "":
+        return now
+
+    if isinstance(value, str) and value.startswith("-"):
+        duration = parse_duration(value[1:])
+        return None if duration is None else now - duration
+
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+    return float(value)
+
+
+def _series_key(metric: dict) -> tuple:
+    return tuple(sorted(metric.items()))
+
+
+class _Entry:
+    def __init__(self, start: float, end: float, result_type: str, series: dict):
+        self.start = start
+        self.end = end
+        self.result_type = result_type
+        # series key -> Series
+        self.series = series
+        self.created = time.time()
+
+
+class _ResultEntry:
+    def __init__(self, result):
+        self.result = result
+        self.created = time.time()
+
+
+class QueryCache:
+    """
+    In memory cache for Metrics query results
+
+    Arguments:
+
+    - ttl: Seconds a cached window is used for, after that it is refetched
+      in full
+    - max_size: Maximum number of cached queries, least recently used
+      queries are evicted first
+    """
+
+    def __init__(self, ttl: float = 60, max_size: int = 256):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.inflight = {}
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def _get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry.created > self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def _set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def coalesce(self, key, fn):
+        """
+        Call `fn`, unless a call for the same key is already in flight,
+        in which case its result is waited for and returned
+        """
+
+        with self.lock:
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+
+    def query(self, fetch, url: str, params: dict):
+        """
+        Cached instant query
+
+        Arguments:
+
+        - fetch: Callable that takes the request params and returns a result
+        - url: The query url, part of the cache key
+        - params: The request params
+        """
+
+        key = ("query", url, tuple(sorted(params.items())))
+
+        entry = self._get(key)
+        if entry is not None:
+            return entry.result.model_copy(deep=True)
+
+        result = self.coalesce(key, lambda: fetch(params))
+
+        if result.status == "success":
+            self._set(key, _ResultEntry(result))
+
+        return result.model_copy(deep=True)
+
+    def query_range(self, fetch, url: str, params: dict) -> ColumnarQueryResult:
+        """
+        Cached range query
+
+        Arguments:
+
+        - fetch: Callable that takes the request params and returns a
+          ColumnarQueryResult
+        - url: The query url, part of the cache key
+        - params: The request params (query, start, step, end and
+          optionally timeout and max_lookback)
+        """
+
+        now = time.time()
+        step = parse_duration(params["step"])
+        start = parse_time(params["start"], now)
+        end = parse_time(params.get("end"), now)
+
+        if not step or start is None or end is None or np is None:
+            return fetch(params)
+
+        # align to step boundaries
+        start = start - start % step
+        end = end - end % step
+
+        key = (
+            "query_range",
+            url,
+            params["query"],
+            step,
+            params.get("max_lookback"),
+        )
+
+        entry = self._get(key)
+
+        if entry is None or end < entry.start or start > entry.end:
+            ranges = [(start, end)]
+            entry = None
+        else:
+            ranges = []
+            if start < entry.start:
+                ranges.append((start, entry.start - step))
+            # when fetching the tail also refetch the last cached step,
+            # it may have been incomplete
+            if end > entry.end:
+                ranges.append((entry.end, end))
+
+        fetched = []
+
+        for range_start, range_end in ranges:
+            range_params = dict(params, start=int(range_start), end=int(range_end))
+            range_key = key + (range_start, range_end)
+            result = self.coalesce(range_key, lambda p=range_params: fetch(p))
+
+            if result.status != "success":
+                return result
+
+            fetched.append((range_start, range_end, result))
+
+        if fetched:
+            entry = self._merge(entry, fetched)
+            self._set(key, entry)
+
+        return self._slice(entry, start, end)
+
+    def _merge(self, entry: _Entry | None, fetched: list) -> _Entry:
+        if entry is None:
+            entry = _Entry(fetched[0][0], fetched[0][1], "matrix", {})
+        else:
+            # copy, the entry may be in use by another thread.
+            # extended windows keep the creation time of the original
+            # window, so the full window is refetched once the ttl expires
+            previous = entry
+            entry = _Entry(
+                previous.start,
+                previous.end,
+                previous.result_type,
+                dict(previous.series),
+            )
+            entry.created = previous.created
+
+        for range_start, range_end, result in fetched:
+            entry.result_type = result.result_type or entry.result_type
+
+            # drop cached points covered by the fetched range
+            for series_key, series in list(entry.series.items()):
+                mask = (series.timestamps < range_start) | (
+                    series.timestamps > range_end
+                )
+                entry.series[series_key] = Series(
+                    series.metric, series.timestamps[mask], series.values[mask]
+                )
+
+            for series in result.series:
+                series_key = _series_key(series.metric)
+                cached = entry.series.get(series_key)
+                if cached is None:
+                    entry.series[series_key] = series
+                    continue
+                timestamps = np.concatenate([cached.timestamps, series.timestamps])
+                values = np.concatenate([cached.values, series.values])
+                order = np.argsort(timestamps, kind="stable")
+                entry.series[series_key] = Series(
+                    series.metric, timestamps[order], values[order]
+                )
+
+            entry.start = min(entry.start, range_start)
+            entry.end = max(entry.end, range_end)
+
+        return entry
+
+    def _slice(self, entry: _Entry, start: float, end: float) -> ColumnarQueryResult:
+        series = []
+
+        for cached in entry.series.values():
+            mask = (cached.timestamps >= start) & (cached.timestamps <= end)
+            if not mask.any():
+                continue
+            series.append(
+                Series(cached.metric, cached.timestamps[mask], cached.values[mask])
+            )
+
+        return ColumnarQueryResult(
+            status="success", result_type=entry.result_type, series=series
+        )
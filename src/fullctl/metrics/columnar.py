@@ -0,0 +1,238 @@
+"""
+Columnar decoding of VictoriaMetrics query responses
+
+Series values are decoded straight into NumPy arrays instead of being
+validated through the pydantic `Result` model, the pydantic `QueryResult`
+is only built when it is accessed.
+
+Requires numpy, `to_dataframe` requires pandas and streaming decoding
+requires ijson.
+"""
+
+import json
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from .schema import Data, QueryResult, Result, Stats
+
+__all__ = ["Series", "ColumnarQueryResult", "decode_content", "decode_response"]
+
+
+class Series:
+    """
+    A single series of a query result
+
+    - metric: The metric labels
+    - timestamps: float64 array of timestamps (seconds)
+    - values: float64 array of values
+    """
+
+    def __init__(self, metric: dict, timestamps, values):
+        self.metric = metric
+        self.timestamps = timestamps
+        self.values = values
+
+    @classmethod
+    def from_pairs(cls, metric: dict, pairs: list) -> "Series":
+        """
+        Build a series from a list of [timestamp, "value"] pairs
+        """
+        count = len(pairs)
+        timestamps = np.fromiter(
+            (pair[0] for pair in pairs), dtype=np.float64, count=count
+        )
+        values = np.array([pair[1] for pair in pairs], dtype=np.float64)
+        return cls(metric, timestamps, values)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def to_result(self, vector: bool = False) -> Result:
+        """
+        Return the series as a pydantic `Result`, built without validation
+        """
+        timestamps = self.timestamps.tolist()
+        if len(timestamps) and np.all(self.timestamps % 1 == 0):
+            timestamps = [int(timestamp) for timestamp in timestamps]
+
+        pairs = [list(pair) for pair in zip(timestamps, self.values.tolist())]
+
+        if vector:
+            return Result.model_construct(
+                metric=self.metric, value=pairs[0] if pairs else None, values=None
+            )
+        return Result.model_construct(metric=self.metric, value=None, values=pairs)
+
+
+class ColumnarQueryResult:
+    """
+    Columnar VictoriaMetrics query result
+
+    Has the same attributes as `QueryResult`, `data` is built from the
+    series arrays on first access.
+    """
+
+    def __init__(
+        self,
+        status: str,
+        result_type: str | None = None,
+        series: list[Series] | None = None,
+        error: str | None = None,
+        errorType: str | None = None,
+        stats: Stats | None = None,
+    ):
+        self.status = status
+        self.result_type = result_type
+        self.series = series or []
+        self.error = error
+        self.errorType = errorType
+        self.stats = stats
+        self._data = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ColumnarQueryResult":
+        """
+        Build the result from a decoded VictoriaMetrics response
+        """
+        result_data = data.get("data") or {}
+        result_type = result_data.get("resultType")
+        series = []
+
+        for result in result_data.get("result", []):
+            if "values" in result:
+                pairs = result["values"]
+            elif result.get("value"):
+                pairs = [result["value"]]
+            else:
+                pairs = []
+            series.append(Series.from_pairs(result.get("metric", {}), pairs))
+
+        stats = data.get("stats")
+
+        return cls(
+            status=data.get("status"),
+            result_type=result_type,
+            series=series,
+            error=data.get("error"),
+            errorType=data.get("errorType"),
+            stats=Stats(**stats) if stats else None,
+        )
+
+    @property
+    def data(self) -> Data | None:
+        if self._data is None and self.result_type is not None:
+            vector = self.result_type == "vector"
+            self._data = Data.model_construct(
+                resultType=self.result_type,
+                result=[series.to_result(vector=vector) for series in self.series],
+            )
+        return self._data
+
+    def to_query_result(self) -> QueryResult:
+        """
+        Return the result as a pydantic `QueryResult`
+        """
+        return QueryResult.model_construct(
+            status=self.status,
+            error=self.error,
+            errorType=self.errorType,
+            data=self.data,
+            stats=self.stats,
+        )
+
+    def to_dataframe(self):
+        """
+        Return the result as a pandas DataFrame in long format with the
+        columns `timestamp`, `value` and one column per metric label
+        """
+        import pandas as pd
+
+        frames = []
+        for series in self.series:
+            frame = pd.DataFrame(
+                {"timestamp": series.timestamps, "value": series.values}
+            )
+            for label, value in series.metric.items():
+                frame[label] = value
+            frames.append(frame)
+
+        if not frames:
+            return pd.DataFrame(columns=["timestamp", "value"])
+
+        return pd.concat(frames, ignore_index=True)
+
+    def __add__(self, other: "ColumnarQueryResult") -> "ColumnarQueryResult":
+        self.series = self.series + other.series
+        if self.result_type is None:
+            self.result_type = other.result_type
+        self._data = None
+        return self
+
+
+def _decode_stream(raw) -> ColumnarQueryResult:
+    result_type = None
+    series = []
+
+    for result in ijson.items(raw, "data.result.item", use_float=True):
+        if "values" in result:
+            result_type = "matrix"
+            pairs = result["values"]
+        else:
+            result_type = "vector"
+            pairs = [result["value"]] if result.get("value") else []
+        series.append(Series.from_pairs(result.get("metric", {}), pairs))
+
+    return ColumnarQueryResult(
+        status="success", result_type=result_type or "matrix", series=series
+    )
+
+
+def decode_response(response, stream: bool = False) -> ColumnarQueryResult:
+    """
+    Decode a VictoriaMetrics query response into a `ColumnarQueryResult`
+
+    Arguments:
+
+    - response: A requests response
+    - stream: If True and ijson is installed, series are decoded one at a time
+      while the response is read, the response needs to have been requested
+      with `stream=True`. Stats are not decoded in this mode.
+    """
+
+    if np is None:
+        raise ImportError("numpy is required for columnar query results")
+
+    if stream and ijson is not None and response.status_code == 200:
+        response.raw.decode_content = True
+        return _decode_stream(response.raw)
+
+    return decode_content(response.content)
+
+
+def decode_content(content: bytes) -> ColumnarQueryResult:
+    """
+    Decode a VictoriaMetrics query response body into a `ColumnarQueryResult`
+    """
+
+    if np is None:
+        raise ImportError("numpy is required for columnar query results")
+
+    if orjson is not None:
+        data = orjson.loads(content)
+    else:
+        data = json.loads(content)
+
+    return ColumnarQueryResult.from_dict(data)
@@ -0,0 +1,197 @@
+"""
+InfluxDB line protocol encoder
+
+https://docs.influxdata.com/influxdb/v1/write_protocols/line_protocol_reference/
+
+Encodes points straight to bytes without pydantic validation, points can
+be passed as `Point` objects or as trusted dictionaries with the keys
+`measurement`, `tags`, `fields` and optionally `timestamp`.
+"""
+
+from collections.abc import Generator, Iterable
+
+from .schema import Point
+
+__all__ = [
+    "escape_measurement",
+    "escape_key",
+    "format_field_value",
+    "to_nanoseconds",
+    "encode_line",
+    "encode_points",
+    "iter_encoded_chunks",
+]
+
+# default size of the chunks yielded by `iter_encoded_chunks` (bytes)
+CHUNK_SIZE = 1024 * 1024
+
+_MEASUREMENT_ESCAPES = str.maketrans({",": "\\,", " ": "\\ ", "\n": "\\n"})
+_KEY_ESCAPES = str.maketrans({",": "\\,", "=": "\\=", " ": "\\ ", "\n": "\\n"})
+
+
+# escaped measurement names, tag keys, tag values and field keys repeat
+# a lot between points so they are cached
+_measurement_cache = {}
+_key_cache = {}
+_ESCAPE_CACHE_SIZE = 10000
+
+
+def escape_measurement(value: str) -> str:
+    """
+    Escape commas and spaces in a measurement name
+    """
+    try:
+        return _measurement_cache[value]
+    except KeyError:
+        pass
+
+    if len(_measurement_cache) >= _ESCAPE_CACHE_SIZE:
+        _measurement_cache.clear()
+
+    escaped = _measurement_cache[value] = value.translate(_MEASUREMENT_ESCAPES)
+    return escaped
+
+
+def escape_key(value) -> str:
+    """
+    Escape commas, equal signs and spaces in a tag key, tag value or field key
+    """
+    if value.__class__ is not str:
+        value = str(value)
+
+    try:
+        return _key_cache[value]
+    except KeyError:
+        pass
+
+    if len(_key_cache) >= _ESCAPE_CACHE_SIZE:
+        _key_cache.clear()
+
+    escaped = _key_cache[value] = value.translate(_KEY_ESCAPES)
+    return escaped
+
+
+def format_field_value(value) -> str:
+    """
+    Format a field value, strings are quoted, booleans are written as
+    true / false and numbers as is
+    """
+    cls = value.__class__
+
+    if cls is float or cls is int:
+        return str(value)
+
+    if cls is bool:
+        return "true" if value else "false"
+
+    if isinstance(value, (int, float)):
+        return str(value)
+
+    value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{value}"'
+
+
+def to_nanoseconds(timestamp: int | float) -> int:
+    """
+    Convert a timestamp in seconds, milliseconds, microseconds or nanoseconds
+    to nanoseconds
+
+    The unit is determined by the magnitude of the timestamp, integer
+    timestamps are converted exactly.
+    """
+    # seconds, most common
+    if timestamp.__class__ is int and 0 <= timestamp < 10**12:
+        return timestamp * 1_000_000_000
+
+    if isinstance(timestamp, float):
+        seconds = int(timestamp)
+        if abs(timestamp) < 1e12:
+            return seconds * 1_000_000_000 + round((timestamp - seconds) * 1e9)
+        timestamp = seconds
+
+    magnitude = abs(timestamp)
+
+    if magnitude >= 10**18:
+        return timestamp
+    if magnitude >= 10**15:
+        return timestamp * 1_000
+    if magnitude >= 10**12:
+        return timestamp * 1_000_000
+    return timestamp * 1_000_000_000
+
+
+def encode_line(
+    measurement: str,
+    tags: dict[str, str | int | float] | None,
+    fields: dict[str, int | float | str | bool],
+    timestamp: int | float | None = None,
+) -> str:
+    """
+    Encode a single point to a line protocol line (without line break)
+    """
+    line = escape_measurement(measurement)
+
+    if tags:
+        for key, value in tags.items():
+            if value is None:
+                continue
+            line += f",{escape_key(key)}={escape_key(value)}"
+
+    line += " " + ",".join(
+        [
+            f"{escape_key(key)}={format_field_value(value)}"
+            for key, value in fields.items()
+        ]
+    )
+
+    if timestamp is not None:
+        line += f" {to_nanoseconds(timestamp)}"
+
+    return line
+
+
+def _encode_point(point: Point | dict) -> bytes:
+    if isinstance(point, Point):
+        line = encode_line(point.measurement, point.tags, point.fields, point.timestamp)
+    else:
+        line = encode_line(
+            point["measurement"],
+            point.get("tags"),
+            point["fields"],
+            point.get("timestamp"),
+        )
+    return line.encode()
+
+
+def iter_encoded_chunks(
+    points: Iterable[Point | dict], chunk_size: int = CHUNK_SIZE
+) -> Generator[bytes, None, None]:
+    """
+    Encode points and yield the line protocol data in chunks of
+    approximately `chunk_size` bytes, chunks always end on a line break
+    """
+    buffer = bytearray()
+
+    for point in points:
+        buffer += _encode_point(point)
+        buffer += b"\n"
+
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+
+    if buffer:
+        yield bytes(buffer)
+
+
+def encode_points(points: Iterable[Point | dict]) -> bytes:
+    """
+    Encode points to line protocol data
+    """
+    buffer = bytearray()
+
+    for point in points:
+        buffer += _encode_point(point)
+        buffer += b"\n"
+
+    return bytes(buffer)
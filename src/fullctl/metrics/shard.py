@@ -0,0 +1,172 @@
+"""
+Sharded query execution for the Metrics client
+
+Long time ranges are split into consecutive, step aligned windows and
+large metric selector sets into multiple selectors. Shards are queried
+concurrently and their results merged back into one result.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .columnar import ColumnarQueryResult, Series
+
+__all__ = [
+    "COMBINABLE_AGGREGATORS",
+    "split_time_range",
+    "run_shards",
+    "merge_time_shards",
+    "combine_shards",
+]
+
+# aggregators whose results can be combined across metric shards
+# (aggregator -> numpy function used to combine them)
+COMBINABLE_AGGREGATORS = {
+    "": None,
+    "sum": "nansum",
+    "count": "nansum",
+    "min": "nanmin",
+    "max": "nanmax",
+}
+
+
+def split_time_range(
+    start: float, end: float, step: float, shard_duration: float
+) -> list[tuple[int, int]]:
+    """
+    Split a time range into consecutive (start, end) windows of at most
+    `shard_duration` seconds, windows start on step boundaries and do
+    not overlap
+    """
+
+    start = start - start % step
+    shard_duration = max(shard_duration - shard_duration % step, step)
+
+    windows = []
+
+    while start <= end:
+        window_end = min(start + shard_duration - step, end)
+        windows.append((int(start), int(window_end)))
+        start = window_end + step
+
+    return windows
+
+
+def run_shards(fn, shards: list, max_workers: int) -> list:
+    """
+    Call `fn` for each shard concurrently and return the results in
+    shard order, exceptions raised by any shard are re-raised
+    """
+
+    if len(shards) == 1:
+        return [fn(shards[0])]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(shards))) as executor:
+        return list(executor.map(fn, shards))
+
+
+def _series_key(metric: dict) -> tuple:
+    return tuple(sorted(metric.items()))
+
+
+def _first_error(results: list[ColumnarQueryResult]) -> ColumnarQueryResult | None:
+    for result in results:
+        if result.status != "success":
+            return result
+    return None
+
+
+def merge_time_shards(results: list[ColumnarQueryResult]) -> ColumnarQueryResult:
+    """
+    Merge the results of consecutive time windows, series with the same
+    labels are concatenated
+    """
+
+    error = _first_error(results)
+    if error:
+        return error
+
+    merged = {}
+    result_type = None
+
+    for result in results:
+        result_type = result_type or result.result_type
+        for series in result.series:
+            merged.setdefault(_series_key(series.metric), []).append(series)
+
+    series = []
+    for parts in merged.values():
+        timestamps = np.concatenate([part.timestamps for part in parts])
+        values = np.concatenate([part.values for part in parts])
+        order = np.argsort(timestamps, kind="stable")
+        series.append(Series(parts[0].metric, timestamps[order], values[order]))
+
+    return ColumnarQueryResult(
+        status="success", result_type=result_type or "matrix", series=series
+    )
+
+
+def combine_shards(
+    results: list[ColumnarQueryResult], aggregator: str
+) -> ColumnarQueryResult:
+    """
+    Combine the results of metric selector shards
+
+    Without an aggregator the shards hold distinct series and are simply
+    joined. With an aggregator, series with the same labels are
+    re-aggregated per timestamp.
+    """
+
+    if aggregator not in COMBINABLE_AGGREGATORS:
+        raise ValueError(f"Results of aggregator {aggregator} cannot be combined")
+
+    error = _first_error(results)
+    if error:
+        return error
+
+    result_type = next(
+        (result.result_type for result in results if result.result_type), "matrix"
+    )
+
+    if not aggregator:
+        return ColumnarQueryResult(
+            status="success",
+            result_type=result_type,
+            series=[series for result in results for series in result.series],
+        )
+
+    combine = getattr(np, COMBINABLE_AGGREGATORS[aggregator])
+    grouped = {}
+
+    for result in results:
+        for series in result.series:
+            grouped.setdefault(_series_key(series.metric), []).append(series)
+
+    combined = []
+
+    for parts in grouped.values():
+        if len(parts) == 1:
+            combined.append(parts[0])
+            continue
+
+        timestamps = np.unique(np.concatenate([part.timestamps for part in parts]))
+        matrix = np.full((len(parts), len(timestamps)), np.nan)
+
+        for index, part in enumerate(parts):
+            matrix[index, np.searchsorted(timestamps, part.timestamps)] = part.values
+
+        # all-NaN columns are expected where shards have no data
+        with np.errstate(all="ignore"):
+            mask = ~np.isnan(matrix).all(axis=0)
+            values = np.full(len(timestamps), np.nan)
+            values[mask] = combine(matrix[:, mask], axis=0)
+
+        combined.append(Series(parts[0].metric, timestamps, values))
+
+    return ColumnarQueryResult(
+        status="success", result_type=result_type, series=combined
+    )
@@ -0,0 +1,282 @@
+"""
+Buffered, non-blocking metrics writer
+
+Points are queued in memory and written to VictoriaMetrics from a
+background thread, either once `batch_size` points are queued or every
+`flush_interval` seconds.
+
+## Python API usage
+
+from fullctl.metrics import make_metrics
+writer = make_metrics().buffered_writer()
+writer.write("cpu", {"host": "server1"}, {"usage": 0.5})
+"""
+
+import atexit
+import gzip
+import queue
+import threading
+import time
+import weakref
+
+import requests
+import structlog
+from requests.adapters import HTTPAdapter
+
+from .schema import Point
+
+__all__ = ["BufferedWriter"]
+
+logger = structlog.getLogger(__name__)
+
+# open writers, closed when the process exits. Held weakly so writers
+# that are no longer referenced can be garbage collected
+_writers = weakref.WeakSet()
+
+
+@atexit.register
+def _close_writers():
+    for writer in list(_writers):
+        writer.close()
+
+
+class BufferedWriter:
+    """
+    Buffers metric points and writes them to VictoriaMetrics in batches
+    from a background thread.
+
+    The queue is bounded, once `max_queue_size` points are queued new points
+    are handled according to `drop_policy`:
+
+    - "oldest": drop the oldest queued point to make room (default)
+    - "newest": drop the point being written
+
+    Remaining points are flushed when the process exits. Points written
+    after `close` are counted as dropped.
+    """
+
+    def __init__(
+        self,
+        metrics,
+        batch_size: int = 1000,
+        flush_interval: float = 5.0,
+        max_queue_size: int = 100000,
+        drop_policy: str = "oldest",
+        retries: int = 3,
+        retry_backoff: float = 0.5,
+        compress: bool = True,
+        timeout: float = 10.0,
+    ):
+        """
+        Arguments:
+
+        - metrics: The Metrics client to write with
+        - batch_size: Number of points that triggers a flush, also the maximum
+          number of points per request
+        - flush_interval: Maximum number of seconds points are buffered
+        - max_queue_size: Maximum number of buffered points
+        - drop_policy: "oldest" or "newest", see class docstring
+        - retries: Number of times a failed request is retried
+        - retry_backoff: Seconds to wait before the first retry, doubled for
+          each subsequent retry
+        - compress: gzip compress request bodies
+        - timeout: Request timeout in seconds
+        """
+
+        if drop_policy not in ("oldest", "newest"):
+            raise ValueError(f"Invalid drop policy: {drop_policy}")
+
+        self.metrics = metrics
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.compress = compress
+        self.timeout = timeout
+
+        self.url = metrics.write_url
+
+        self.session = requests.Session()
+        self.session.auth = metrics.auth
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=1))
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=1))
+
+        self.queue = queue.Queue(maxsize=max_queue_size)
+
+        # number of points that were dropped because the queue was full
+        # or because writing them failed
+        self.dropped = 0
+
+        # number of points that were written
+        self.written = 0
+
+        self._flush_requested = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        _writers.add(self)
+
+    def _start(self):
+        if self._thread is not None or self._stopped.is_set():
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="metrics-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _count(self, written: int = 0, dropped: int = 0):
+        with self._lock:
+            self.written += written
+            self.dropped += dropped
+
+    def _enqueue(self, line: str):
+        if self._stopped.is_set():
+            # closed, the point would never be flushed
+            self._count(dropped=1)
+            return
+
+        try:
+            self.queue.put_nowait(line)
+        except queue.Full:
+            if self.drop_policy == "newest":
+                self._count(dropped=1)
+                return
+
+            try:
+                self.queue.get_nowait()
+                self._count(dropped=1)
+            except queue.Empty:
+                pass
+
+            try:
+                self.queue.put_nowait(line)
+            except queue.Full:
+                self._count(dropped=1)
+
+        if self.queue.qsize() >= self.batch_size:
+            self._flush_requested.set()
+
+    def write(
+        self,
+        measurement: str,
+        tags: dict[str, str | int | float],
+        fields: dict[str, int | float],
+        timestamp: int | None = None,
+    ):
+        """
+        Queue a metric point, see `Metrics.write`
+
+        If no timestamp is passed the current time is used, since the
+        point may only be written to VictoriaMetrics later.
+        """
+
+        if timestamp is None:
+            timestamp = time.time_ns()
+
+        self._enqueue(
+            self.metrics.to_line_protocol(measurement, tags, fields, timestamp)
+        )
+        self._start()
+
+    def write_many(self, data: list[Point | dict]):
+        """
+        Queue multiple metric points, see `Metrics.write_many`
+        """
+
+        for point in data:
+            if isinstance(point, Point):
+                self.write(point.measurement, point.tags, point.fields, point.timestamp)
+            else:
+                self.write(
+                    point["measurement"],
+                    point.get("tags"),
+                    point["fields"],
+                    point.get("timestamp"),
+                )
+
+    def _drain(self) -> list[str]:
+        lines = []
+        while len(lines) < self.batch_size:
+            try:
+                lines.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return lines
+
+    def _post(self, lines: list[str]):
+        body = "\n".join(lines).encode()
+        headers = {}
+
+        if self.compress:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+
+        backoff = self.retry_backoff
+
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.post(
+                    self.url, data=body, headers=headers, timeout=self.timeout
+                )
+                if response.status_code < 500:
+                    if response.status_code >= 400:
+                        logger.error(
+                            "metrics write rejected",
+                            status=response.status_code,
+                            response=response.text,
+                        )
+                        self._count(dropped=len(lines))
+                    else:
+                        self._count(written=len(lines))
+                    return
+                error = f"{response.status_code} {response.text}"
+            except requests.exceptions.RequestException as exc:
+                error = str(exc)
+
+            if attempt < self.retries and not self._stopped.is_set():
+                time.sleep(backoff)
+                backoff *= 2
+
+        logger.error("metrics write failed", error=error, points=len(lines))
+        self._count(dropped=len(lines))
+
+    def flush(self):
+        """
+        Write all queued points, blocking until done
+        """
+
+        while True:
+            lines = self._drain()
+            if not lines:
+                return
+            self._post(lines)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._flush_requested.wait(self.flush_interval)
+            self._flush_requested.clear()
+            try:
+                self.flush()
+            except Exception as exc:
+                logger.error("metrics writer error", error=str(exc))
+
+    def close(self):
+        """
+        Stop the background thread and flush remaining points
+        """
+
+        self._stopped.set()
+        self._flush_requested.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self.flush()
+        self.session.close()
+        _writers.discard(self)
@@ -61,7 +61,8 @@ class ServiceApplicationObject(AaactlEntity):
 
     def sanitize(self):
         # config may contain sensitive information, so we remove it
-        delattr(self, "config")
+        # (cached snapshots are stored without it)
+        self.__dict__.pop("config", None)
         return self
 
 
@@ -11,9 +11,23 @@ except Exception:
         AUDITCTL_URL = ""
 
 
+import atexit
+import fcntl
+import json
+import os
+import queue
+import threading
+import time
+
+import requests
 import structlog
 
-from fullctl.service_bridge.client import Bridge, DataObject, url_join
+from fullctl.service_bridge.client import (
+    Bridge,
+    DataObject,
+    ServiceBridgeError,
+    url_join,
+)
 from fullctl.utils import chunk_list
 
 CACHE = {}
@@ -66,6 +80,7 @@ class Event(Auditctl):
         error_message: str = "",
         api_key: str = "",
         username: str = "",
+        spool: bool = False,
     ):
         """
         Logs an action to the auditctl service
@@ -80,6 +95,52 @@ class Event(Auditctl):
             status_code (`int`): status code of the request
             append_path (`list`): additional path components
             error_message (`str`): error message
+            spool (`bool`): queue the event on the process' `EventSpool`
+                instead of sending it during the call
+        """
+
+        event = self.action_event(
+            org_slug,
+            service,
+            ref_tag,
+            action,
+            id=id,
+            request_url=request_url,
+            payload=payload,
+            status_code=status_code,
+            append_path=append_path,
+            error_message=error_message,
+            api_key=api_key,
+            username=username,
+        )
+
+        if event is None:
+            return
+
+        if spool:
+            get_spool().put(event)
+        else:
+            Event().create(event)
+
+    def action_event(
+        self,
+        org_slug: str,
+        service: str,
+        ref_tag: str,
+        action: str,
+        id: int | str | None = None,
+        request_url: str | None = None,
+        payload: dict | None = None,
+        status_code: int = 200,
+        append_path: list[str] | None = None,
+        error_message: str = "",
+        api_key: str = "",
+        username: str = "",
+    ) -> dict | None:
+        """
+        Builds the auditctl event for an action, see `log_action`
+
+        Returns None for actions that are not logged (4xx responses)
         """
 
         object_id = f"v0.1/{org_slug}/action/{service}/{ref_tag}/{action}/"
@@ -111,34 +172,39 @@ class Event(Auditctl):
 
             # log the event as successful
 
-            Event().create(
-                {
-                    "org": org_slug,
-                    "object_id": object_id,
-                    "status": "ok",
-                    "source": service,
-                    "data": {
-                        "components": components,
-                    },
-                }
-            )
+            return {
+                "org": org_slug,
+                "object_id": object_id,
+                "status": "ok",
+                "source": service,
+                "data": {
+                    "components": components,
+                },
+            }
         elif status_code >= 500:
 
             # log the event as failed
             # Current assumption is that we dont want log 4xx errors
 
-            Event().create(
-                {
-                    "org": org_slug,
-                    "object_id": object_id,
-                    "status": "error",
-                    "source": service,
-                    "error": {
-                        "message": f"Request failed with status code {status_code}\n{error_message}",
-                        "components": components,
-                    },
-                }
-            )
+            return {
+                "org": org_slug,
+                "object_id": object_id,
+                "status": "error",
+                "source": service,
+                "error": {
+                    "message": f"Request failed with status code {status_code}\n{error_message}",
+                    "components": components,
+                },
+            }
+
+        return None
+
+    def create_many(self, events: list[dict]):
+        """
+        Creates multiple events with a single request
+        """
+        url = f"{self.url_prefix}/{self.ref_tag}"
+        return self.post(url, json=events)
 
     def send_email(
         self,
@@ -214,3 +280,344 @@ class Event(Auditctl):
         ):
             events.extend(list(self.objects(ids=event_ids_chunk)))
         return events
+
+
+class EventSpool:
+    """
+    Ships auditctl events from a background thread in batches
+
+    Events are put on a bounded in-process queue and sent to auditctl
+    every `flush_interval` seconds or once `batch_size` events are queued.
+    Each event is tagged with a sequence number and events are sent in
+    order per org, an org's events are held back after a failed send
+    until the failed ones went through.
+
+    If `path` is set, events that do not fit into the queue or could not
+    be sent after `retries` are appended to that file and replayed by the
+    sender (shared between processes, access is serialized with a file
+    lock). Otherwise failed events are retried from memory and events
+    that do not fit into the queue are dropped.
+
+    Events are sent one request per event unless `batch` is set, batch
+    requests POST a list of events to the event create endpoint. If
+    auditctl answers a batch request with 404 / 405, batching is turned
+    off again.
+
+    `stats` returns queue and delivery counters, a warning with them is
+    logged when the queue fills up past `high_water` (fraction of
+    `max_queue_size`).
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_queue_size: int = 10000,
+        retries: int = 3,
+        retry_backoff: float = 0.5,
+        high_water: float = 0.8,
+        batch: bool = False,
+        bridge_cls=None,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.high_water = high_water
+        self.bridge_cls = bridge_cls or Event
+
+        self.queue = queue.Queue(maxsize=max_queue_size)
+
+        # (seq, event) tuples that failed to send, if there is no spool file
+        self.pending = []
+
+        # send events in batch requests, False if batching is disabled
+        # or auditctl rejected a batch request as unsupported
+        self.batch_supported = batch
+
+        self.sent = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.spooled = 0
+        self.failed = 0
+
+        self._seq = 0
+        self._warned = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        atexit.register(self.close)
+
+    def _start(self):
+        if self._thread is not None or self._stopped.is_set():
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="auditctl-spool", daemon=True
+                )
+                self._thread.start()
+
+    def _next_seq(self) -> int:
+        # monotonic across processes sharing a spool file as long as
+        # their clocks agree
+        with self._lock:
+            self._seq = max(time.time_ns(), self._seq + 1)
+            return self._seq
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "pending": len(self.pending),
+            "sent": self.sent,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "spooled": self.spooled,
+            "failed": self.failed,
+        }
+
+    def put(self, event: dict):
+        """
+        Queue an event for sending
+        """
+
+        item = (self._next_seq(), event)
+
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            if self.path:
+                self._spool([item])
+            else:
+                self.dropped += 1
+
+        size = self.queue.qsize()
+
+        if size >= self.max_queue_size * self.high_water:
+            now = time.time()
+            if now - self._warned > 60:
+                self._warned = now
+                logger.warning("auditctl spool backpressure", **self.stats())
+
+        if size >= self.batch_size:
+            self._flush_requested.set()
+
+        self._start()
+
+    def _spool(self, items: list[tuple]):
+        with open(self.path, "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                for seq, event in items:
+                    fh.write(json.dumps({"seq": seq, "event": event}) + "\n")
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+        self.spooled += len(items)
+
+    def _unspool(self) -> list[tuple]:
+        if not self.path or not os.path.exists(self.path):
+            return []
+
+        with open(self.path, "r+") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                lines = fh.readlines()
+                fh.seek(0)
+                fh.truncate()
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+        items = []
+        for line in lines:
+            try:
+                row = json.loads(line)
+                items.append((row["seq"], row["event"]))
+            except (ValueError, KeyError):
+                # partially written line
+                logger.error("invalid line in auditctl spool", line=line)
+        return items
+
+    def _drain(self) -> list[tuple]:
+        items = []
+        while len(items) < self.max_queue_size:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _post(self, bridge, events: list[dict]):
+        """
+        Send events, events are removed from the list once sent
+        """
+
+        if self.batch_supported and len(events) > 1:
+            try:
+                bridge.create_many(events)
+                self.sent += len(events)
+                events.clear()
+                return
+            except ServiceBridgeError as exc:
+                if exc.status in (404, 405):
+                    self.batch_supported = False
+                elif exc.status != 400:
+                    raise
+                # a rejected batch is sent per event so only the invalid
+                # events are lost
+
+        while events:
+            try:
+                bridge.create(events[0])
+                self.sent += 1
+            except ServiceBridgeError as exc:
+                if exc.status != 400:
+                    raise
+                logger.error(
+                    "auditctl rejected event", event=events[0], errors=exc.data
+                )
+                self.rejected += 1
+            events.pop(0)
+
+    def _send(self, bridge, events: list[dict]) -> bool:
+        backoff = self.retry_backoff
+
+        for attempt in range(self.retries + 1):
+            try:
+                self._post(bridge, events)
+                return True
+            except (ServiceBridgeError, requests.exceptions.RequestException) as exc:
+                error = str(exc)
+
+            self.failed += 1
+
+            if attempt < self.retries and not self._stopped.is_set():
+                time.sleep(backoff)
+                backoff *= 2
+
+        logger.error("auditctl event shipping failed", error=error, events=len(events))
+        return False
+
+    def flush(self):
+        """
+        Send all queued, pending and spooled events, blocking until done
+        """
+
+        with self._flush_lock:
+            items = self.pending + self._unspool() + self._drain()
+            self.pending = []
+
+            if not items:
+                return
+
+            items.sort(key=lambda item: item[0])
+
+            orgs = {}
+            for item in items:
+                orgs.setdefault(item[1].get("org"), []).append(item)
+
+            bridge = self.bridge_cls()
+            unsent = []
+
+            for org_items in orgs.values():
+                for index in range(0, len(org_items), self.batch_size):
+                    batch = org_items[index : index + self.batch_size]
+                    events = [event for _, event in batch]
+                    if not self._send(bridge, events):
+                        # keep the unsent part of the batch and everything
+                        # after it to preserve the org's event order
+                        unsent.extend(batch[len(batch) - len(events) :])
+                        unsent.extend(org_items[index + self.batch_size :])
+                        break
+
+            if not unsent:
+                return
+
+            if self.path:
+                self._spool(unsent)
+            else:
+                self.pending = unsent[: self.max_queue_size]
+                self.dropped += len(unsent) - len(self.pending)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._flush_requested.wait(self.flush_interval)
+            self._flush_requested.clear()
+            try:
+                self.flush()
+            except Exception as exc:
+                logger.error("auditctl spool error", error=str(exc))
+
+    def close(self):
+        """
+        Stop the background thread and try to send remaining events
+        """
+
+        self._stopped.set()
+        self._flush_requested.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        try:
+            self.flush()
+        except Exception as exc:
+            logger.error("auditctl spool error", error=str(exc))
+
+
+_spool = None
+_spool_lock = threading.Lock()
+_spool_path_warned = False
+
+
+def spool_enabled() -> bool:
+    """
+    Returns whether api action events are spooled (`AUDITCTL_SPOOL`)
+
+    Spooling requires `AUDITCTL_SPOOL_PATH` to be set, events that are only
+    held in memory are lost when the worker is stopped. Without it events
+    are sent during the request.
+    """
+    global _spool_path_warned
+
+    if not getattr(settings, "AUDITCTL_SPOOL", False):
+        return False
+
+    if not getattr(settings, "AUDITCTL_SPOOL_PATH", ""):
+        if not _spool_path_warned:
+            logger.warning(
+                "AUDITCTL_SPOOL requires AUDITCTL_SPOOL_PATH, "
+                "sending auditctl events during the request"
+            )
+            _spool_path_warned = True
+        return False
+
+    return True
+
+
+def get_spool() -> EventSpool:
+    """
+    Returns the process wide `EventSpool`, configured from the
+    AUDITCTL_SPOOL_* settings
+    """
+    global _spool
+
+    if _spool is None:
+        with _spool_lock:
+            if _spool is None:
+                _spool = EventSpool(
+                    path=getattr(settings, "AUDITCTL_SPOOL_PATH", "") or None,
+                    batch_size=getattr(settings, "AUDITCTL_SPOOL_BATCH_SIZE", 100),
+                    batch=getattr(settings, "AUDITCTL_SPOOL_BATCH", False),
+                    max_queue_size=getattr(
+                        settings, "AUDITCTL_SPOOL_MAX_QUEUE_SIZE", 10000
+                    ),
+                )
+    return _spool
@@ -36,6 +36,22 @@ def url_join(left, *args):
     return f"{left.rstrip('/')}/{right}/"
 
 
+def conditional_headers(response):
+    """
+    Returns the request headers to revalidate a response with
+    (If-None-Match / If-Modified-Since)
+    """
+
+    headers = {}
+
+    if response.headers.get("ETag"):
+        headers["If-None-Match"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        headers["If-Modified-Since"] = response.headers["Last-Modified"]
+
+    return headers
+
+
 # Location of test data
 TEST_DATA_PATH = "."
 
@@ -72,6 +88,10 @@ class Bridge:
     # responses for the specified duration (seconds)
     cache_duration = 0
 
+    # set to > 0 to have `objects` request listings in pages of this
+    # size, following the `next` cursor of each page
+    page_size = 0
+
     results_key = "data"
     url_prefix = "data"
 
@@ -99,11 +119,15 @@ class Bridge:
         self.host = host
         self.cache = kwargs.get("cache", None)
         self.cache_duration = kwargs.get("cache_duration", 5)
+        self.page_size = kwargs.get("page_size", self.page_size)
 
     def _data(self, response):
+        return self._container(response).get(self.results_key)
+
+    def _container(self, response):
         status = response.status_code
         if status in [200, 201, 202, 203, 204, 205]:
-            return response.json().get(self.results_key)
+            return response.json()
         elif status in [401, 403]:
             raise AuthError(self, status)
         elif status in [400]:
@@ -120,21 +144,34 @@ class Bridge:
         return kwargs
 
     def cached(self, url, now, params):
-        if self.cache is None:
+        entry = self.cache_entry(url, params)
+        if entry is None:
             return None
-        data, timestamp = self.cache.get(url, {}).get(params, (None, 0))
+        data, timestamp, _ = entry
         if now - timestamp > self.cache_duration:
             return None
         return data
 
+    def cache_entry(self, url, params):
+        """
+        Returns the cached (data, timestamp, validators) tuple for a
+        request, expired entries are kept for revalidation
+        """
+        if self.cache is None:
+            return None
+        return self.cache.get(url, {}).get(params)
+
     def test_data(self, path, params):
+        return self.test_container(path, params)[self.results_key]
+
+    def test_container(self, path, params):
         if params:
             param_str = "/" + urllib.parse.quote(urllib.parse.urlencode(params))
         else:
             param_str = ""
         file_path = os.path.join(TEST_DATA_PATH, f"{path.rstrip('/')}{param_str}.json")
         with open(file_path) as fh:
-            return json.load(fh)[self.results_key]
+            return json.load(fh)
 
     def get(self, endpoint, **kwargs):
         url = url_join(self.url, endpoint)
@@ -151,17 +188,46 @@ class Bridge:
         if cached_data:
             return cached_data
 
-        data = self._data(requests.get(url, **self._requests_kwargs(**kwargs)))
+        # revalidate an expired cache entry if the service sent
+        # validators for it
+        entry = self.cache_entry(url, params)
+        if entry and entry[2]:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), **entry[2]}
+
+        response = requests.get(url, **self._requests_kwargs(**kwargs))
+
+        if response.status_code == 304 and entry:
+            data, validators = entry[0], entry[2]
+        else:
+            data = self._data(response)
+            validators = conditional_headers(response)
 
         # uncomment to debug non-cached request performance in all bridges
         # process_time = time.time() - now
         # print(f"SERVICE BRIDGE GET: {url} {params} - {process_time:.2f}s")
 
         if self.cache is not None:
-            self.cache.setdefault(url, {})[params] = (data, now)
+            self.cache.setdefault(url, {})[params] = (data, now, validators)
 
         return data
 
+    def get_page(self, endpoint, **kwargs):
+        """
+        Request a page of a paginated listing, responses are not cached
+
+        Returns a tuple of (data, cursor of the next page or None)
+        """
+        url = url_join(self.url, endpoint)
+
+        if url.startswith("test://"):
+            container = self.test_container(url.split("://")[1], kwargs.get("params"))
+        else:
+            container = self._container(
+                requests.get(url, **self._requests_kwargs(**kwargs))
+            )
+
+        return container.get(self.results_key), container.get("next")
+
     def post(self, endpoint, **kwargs):
         url = url_join(self.url, endpoint)
         return self._data(requests.post(url, **self._requests_kwargs(**kwargs)))
@@ -198,14 +264,38 @@ class Bridge:
                 raise KeyError(f"{self.data_object_cls.description} does not exist")
             return None
 
-    def objects(self, **kwargs):
+    def objects(self, page_size=None, **kwargs):
+        """
+        Yields the objects matching the filters in `kwargs`
+
+        If `page_size` (or the bridge's `page_size`) is set the listing is
+        requested in pages, following the cursor of each page until the
+        last one. Services that do not support pagination return
+        everything in the first page. Requests with a `limit` are not
+        paginated.
+        """
         url = f"{self.url_prefix}/{self.ref_tag}"
         for k, v in kwargs.items():
             if isinstance(v, list):
                 kwargs[k] = ",".join([str(a) for a in v])
-        data = self.get(url, params=kwargs)
-        for row in data:
-            yield self.data_object_cls(ref_tag=self.ref_tag, **row)
+
+        page_size = page_size or self.page_size
+
+        if not page_size or kwargs.get("limit"):
+            data = self.get(url, params=kwargs)
+            for row in data:
+                yield self.data_object_cls(ref_tag=self.ref_tag, **row)
+            return
+
+        params = dict(kwargs, page_size=page_size)
+
+        while True:
+            data, cursor = self.get_page(url, params=params)
+            for row in data:
+                yield self.data_object_cls(ref_tag=self.ref_tag, **row)
+            if not cursor:
+                break
+            params["cursor"] = cursor
 
     def create(self, data):
         url = f"{self.url_prefix}/{self.ref_tag}"
@@ -249,8 +339,8 @@ class Bridge:
         for o in self.objects(**kwargs):
             return o
 
-    def heartbeat(self):
-        data = self.get("system/heartbeat")
+    def heartbeat(self, timeout=None):
+        data = self.get("system/heartbeat", timeout=timeout)
         return data[0].get("status")
 
     def status(self):
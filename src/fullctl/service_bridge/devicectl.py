@@ -18,6 +18,12 @@ except Exception:
 
 from fullctl.service_bridge.client import Bridge, DataObject, url_join
 
+try:
+    from fullctl.graph.downsample import downsample_rows
+except ImportError:
+    # numpy not installed
+    downsample_rows = None
+
 CACHE = {}
 
 
@@ -204,7 +210,21 @@ class VirtualPort(Devicectl):
         duration: int = None,
         step: int = None,
         traffic_source: str = "vm_sflow",
+        max_points: int = None,
+        downsample_method: str = "lttb",
     ):
+        """
+        Returns traffic data rows
+
+        Arguments:
+            max_points (`int`) -- if set, downsample the rows to approximately
+                this many points, the rows holding the `bps_in_max` and
+                `bps_out_max` peaks are always kept (requires numpy)
+            downsample_method (`str`) -- `lttb` or `minmax`
+        """
+        if max_points and downsample_rows is None:
+            raise ImportError("numpy is required for max_points")
+
         params = {}
         if start_time:
             params["start_time"] = start_time
@@ -220,11 +240,16 @@ class VirtualPort(Devicectl):
 
         params["traffic_source"] = traffic_source
 
-        return self.get(
+        data = self.get(
             f"data/virtual_port/{pk}/traffic",
             params=params,
         )
 
+        if max_points:
+            data = downsample_rows(data, max_points, method=downsample_method)
+
+        return data
+
     def traffic_asn_pair(
         self,
         pk: int,
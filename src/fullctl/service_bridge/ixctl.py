@@ -23,6 +23,12 @@ import structlog
 import fullctl.service_bridge.pdbctl as pdbctl
 from fullctl.service_bridge.client import Bridge, DataObject, url_join
 
+try:
+    from fullctl.graph.downsample import downsample_rows
+except ImportError:
+    # numpy not installed
+    downsample_rows = None
+
 logger = structlog.getLogger(__name__)
 
 CACHE = {}
@@ -153,7 +159,21 @@ class InternetExchangeMember(Ixctl):
         end_time: str | int = None,
         duration: int = None,
         step: int = None,
+        max_points: int = None,
+        downsample_method: str = "lttb",
     ):
+        """
+        Returns traffic data rows
+
+        Arguments:
+            max_points (`int`) -- if set, downsample the rows to approximately
+                this many points, the rows holding the `bps_in_max` and
+                `bps_out_max` peaks are always kept (requires numpy)
+            downsample_method (`str`) -- `lttb` or `minmax`
+        """
+        if max_points and downsample_rows is None:
+            raise ImportError("numpy is required for max_points")
+
         params = {}
         if start_time:
             params["start_time"] = start_time
@@ -167,11 +187,16 @@ class InternetExchangeMember(Ixctl):
         if step:
             params["step"] = step
 
-        return self.get(
+        data = self.get(
             f"data/member/{pk}/traffic",
             params=params,
         )
 
+        if max_points:
+            data = downsample_rows(data, max_points, method=downsample_method)
+
+        return data
+
     def traffic_asn_pair(
         self,
         pk: int,
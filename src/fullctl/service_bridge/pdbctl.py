@@ -51,6 +51,11 @@ class InternetExchange(Pdbctl):
         ref_tag = "ix"
 
 
+class Organization(Pdbctl):
+    class Meta(Pdbctl.Meta):
+        ref_tag = "org"
+
+
 class Facility(Pdbctl):
     class Meta(Pdbctl.Meta):
         ref_tag = "fac"
@@ -0,0 +1,57 @@
+import json
+
+from django.contrib.contenttypes.models import ContentType
+
+from fullctl.django import auditlog
+from fullctl.django.models import AuditLog, Task
+
+
+def test_context_bulk_create(db, dj_account_objects, django_assert_num_queries):
+    org = dj_account_objects.org
+    tasks = [Task.objects.create(op="task_test", param_json="{}") for _ in range(5)]
+
+    # warm up the content type cache
+    ContentType.objects.get_for_models(Task, type(org))
+
+    with django_assert_num_queries(1):
+        with auditlog.Context() as ctx:
+            ctx.set("org", org)
+            for task in tasks:
+                ctx.log("task_update", log_object=task)
+
+    entries = list(AuditLog.objects.filter(action="task_update").order_by("id"))
+    assert len(entries) == 5
+    assert [entry.object_id for entry in entries] == [task.id for task in tasks]
+    assert entries[0].org == org
+    assert json.loads(entries[0].data)["snapshot"]["op"] == "task_test"
+
+
+def test_context_defer(
+    db, dj_account_objects, settings, monkeypatch, django_capture_on_commit_callbacks
+):
+    settings.AUDITLOG_DEFER = True
+    queued = []
+
+    class Writer:
+        def put(self, entries):
+            queued.append(entries)
+
+    monkeypatch.setattr(auditlog, "get_writer", Writer)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        with auditlog.Context() as ctx:
+            ctx.log("org_update", log_object=dj_account_objects.org)
+
+        # handed to the writer once the transaction is committed
+        assert queued == []
+
+    assert len(queued) == 1
+    assert queued[0][0].action == "org_update"
+    assert not AuditLog.objects.filter(action="org_update").exists()
+
+
+def test_get_fields_cached():
+    task = Task(op="task_test")
+    assert auditlog.get_fields(task) == auditlog.get_fields(Task)
+    assert "op" in auditlog.get_fields(task)
+    assert auditlog._get_fields.cache_info().hits > 0
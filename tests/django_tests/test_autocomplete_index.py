@@ -0,0 +1,167 @@
+import threading
+
+from django.test import RequestFactory, override_settings
+
+import fullctl.django.autocomplete.pdb as pdb_autocomplete
+from fullctl.django.autocomplete.index import AutocompleteIndex
+from fullctl.service_bridge.pdbctl import NetworkObject
+
+
+def networks():
+    return [
+        NetworkObject(id=1, asn=63311, name="20C"),
+        NetworkObject(id=2, asn=6939, name="Hurricane Electric"),
+        NetworkObject(id=3, asn=13335, name="Cloudflare"),
+        NetworkObject(id=4, asn=16509, name="Amazon Cloud Services"),
+        NetworkObject(id=5, asn=6, name="Cloud"),
+    ]
+
+
+def make_index(**kwargs):
+    return AutocompleteIndex(
+        networks, lambda net: [net.name, str(net.asn), f"as{net.asn}"], **kwargs
+    )
+
+
+def test_autocomplete_index_search():
+    index = make_index()
+    index.refresh()
+
+    def ids(q, limit=50):
+        return [net.id for net in index.search(q, limit=limit)]
+
+    # exact match, then prefix, then word prefix
+    assert ids("cloud") == [5, 3, 4]
+    assert ids("CLOUD", limit=2) == [5, 3]
+    # substring matches through trigrams
+    assert ids("flare") == [3]
+    assert ids("ricane") == [2]
+    # asn prefix
+    assert ids("6") == [5, 1, 2]
+    assert ids("as633") == [1]
+    assert ids("nomatch") == []
+    # blank query returns the first objects
+    assert ids("", limit=2) == [1, 2]
+
+
+def test_autocomplete_index_prefix_only():
+    index = AutocompleteIndex(
+        networks, lambda net: [str(net.asn), f"as{net.asn}"], substring=False
+    )
+    index.refresh()
+
+    def ids(q):
+        return [net.id for net in index.search(q)]
+
+    assert ids("133") == [3]
+    assert ids("AS1") == [3, 4]
+    # no substring matches
+    assert ids("335") == []
+    assert index._index.trigrams == {}
+
+
+def test_autocomplete_index_cold():
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return networks()
+
+    index = AutocompleteIndex(fetch, lambda net: [net.name])
+
+    # cold index returns None and refreshes in the background
+    assert index.search("cloud") is None
+    assert index.search("cloud") is None
+    release.set()
+    index.wait()
+    assert index.ready
+    assert [net.id for net in index.search("cloud")] == [5, 3, 4]
+    assert len(calls) == 1
+
+
+def test_autocomplete_index_stale():
+    names = ["Cloud"]
+    release = threading.Event()
+    release.set()
+
+    def fetch():
+        release.wait(5)
+        return [NetworkObject(id=1, asn=1, name=names[0])]
+
+    index = AutocompleteIndex(fetch, lambda net: [net.name], ttl=0)
+    index.refresh()
+    names[0] = "Other"
+    release.clear()
+
+    # stale index keeps answering while it is refreshed
+    assert [net.name for net in index.search("cloud")] == ["Cloud"]
+    release.set()
+    index.wait()
+    assert [net.name for net in index.search("other")] == ["Other"]
+
+
+def test_autocomplete_index_refresh_failure():
+    def fetch():
+        raise OSError("pdbctl unavailable")
+
+    index = AutocompleteIndex(fetch, lambda net: [net.name])
+    assert index.search("cloud") is None
+    index.wait()
+    assert not index.ready
+    # failed refreshes are not retried immediately
+    index.search("cloud")
+    assert index._thread is None
+
+
+def test_peeringdb_asn_autocomplete(monkeypatch):
+    monkeypatch.setattr(pdb_autocomplete, "INDEXES", {})
+
+    def bridge_objects(self, **kwargs):
+        # only the index is loaded from pdbctl
+        assert kwargs == {"page_size": pdb_autocomplete.INDEX_PAGE_SIZE}
+        return iter(networks())
+
+    monkeypatch.setattr(pdb_autocomplete.pdbctl.Network, "objects", bridge_objects)
+
+    view = pdb_autocomplete.peeringdb_asn()
+    view.request = RequestFactory().get("/")
+
+    with override_settings(
+        PDB_AUTOCOMPLETE_INDEX=True,
+        AUTOCOMPLETE_NUM_BLANK_QUERY_RESULTS=3,
+        PDBCTL_URL="test://pdbctl",
+    ):
+        pdb_autocomplete.asn_index().refresh()
+
+        view.q = "13335"
+        assert [net.asn for net in view.get_queryset()] == [13335]
+
+        # only asn prefixes match, like the pdbctl `q_asn` lookup
+        view.q = "cloudflare"
+        assert view.get_queryset() == []
+        view.q = "335"
+        assert view.get_queryset() == []
+
+        view.q = ""
+        assert len(view.get_queryset()) == 3
+
+
+def test_peeringdb_asn_autocomplete_fallback(monkeypatch):
+    monkeypatch.setattr(pdb_autocomplete, "INDEXES", {})
+
+    def bridge_objects(self, **kwargs):
+        assert kwargs == {"q_asn": "63311"}
+        return iter(networks()[:1])
+
+    monkeypatch.setattr(pdb_autocomplete.pdbctl.Network, "objects", bridge_objects)
+
+    view = pdb_autocomplete.peeringdb_asn()
+    view.q = "63311"
+
+    with override_settings(PDB_AUTOCOMPLETE_INDEX=False, PDBCTL_URL="test://pdbctl"):
+        assert [net.asn for net in view.get_queryset()] == [63311]
+
+        view.q = ""
+        assert view.get_queryset() == []
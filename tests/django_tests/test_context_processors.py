@@ -1,9 +1,12 @@
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
+from django.core.cache import cache
 from django.http import HttpRequest
 
 from fullctl.django import context_processors
 from fullctl.django.auth import RemotePermissionsError
+from fullctl.service_bridge.aaactl import ServiceApplicationObject
 
 
 # Settings fixture allows for safe manipulations of settings inside test
@@ -154,3 +157,65 @@ def test_conf(db, dj_account_objects, settings):
 
     conf = context_processors.conf(request)
     assert conf == conf_support_email
+
+
+@patch("fullctl.django.context_processors.OrganizationBranding")
+def test_account_service_cached(mock_org_branding, db, dj_account_objects, settings):
+    request = HttpRequest()
+    request.org = dj_account_objects.org
+    settings.BRANDING_ORG = dj_account_objects.org.slug
+    settings.ACCOUNT_SERVICE_CACHE_EXPIRY = 60
+    cache.clear()
+
+    first = mock_org_branding.return_value.first
+    first.return_value = SimpleNamespace(
+        org_name="Branded",
+        html_footer="",
+        css={},
+        dark_logo_url="dark.svg",
+        light_logo_url=None,
+        show_logo=True,
+    )
+
+    context = context_processors.account_service(request)
+
+    # branding is only fetched once the context is used
+    assert not first.called
+    assert context["service_name"] == "Branded"
+    assert context["service_logo_dark"] == "dark.svg"
+    assert context["service_logo_light"] == "fullctl/logo-lightbg.svg"
+    assert first.call_count == 1
+
+    context = context_processors.account_service(request)
+    assert context["org_branding"]["name"] == "Branded"
+    assert first.call_count == 1
+
+    context_processors.invalidate_account_service_cache(request.org.slug)
+    context = context_processors.account_service(request)
+    assert context["org_branding"]["name"] == "Branded"
+    assert first.call_count == 2
+
+    context_processors.invalidate_account_service_cache()
+    context = context_processors.account_service(request)
+    assert context["org_branding"]["name"] == "Branded"
+    assert first.call_count == 3
+
+
+@patch("fullctl.django.context_processors.ServiceApplication")
+def test_service_applications_snapshot_without_config(mock_service_application):
+    mock_service_application.return_value.objects.return_value = [
+        ServiceApplicationObject(
+            slug="ixctl",
+            name="ixctl",
+            grainy="service.ixctl",
+            config={"secret": "value"},
+        )
+    ]
+
+    rows = context_processors.service_applications_snapshot("test")
+
+    assert rows == [{"slug": "ixctl", "name": "ixctl", "grainy": "service.ixctl"}]
+
+    # rows restored from the cache no longer have a config to remove
+    service_application = ServiceApplicationObject(**rows[0]).sanitize()
+    assert not hasattr(service_application, "config")
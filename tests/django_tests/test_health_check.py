@@ -0,0 +1,195 @@
+import contextlib
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import override_settings
+
+import tests.django_tests.testapp.models as models
+from fullctl.django import health_check
+
+
+@pytest.fixture
+def extra_checks():
+    """
+    Registers health checks for the test and removes them afterwards
+    """
+    names = []
+
+    def add(name, func, **kwargs):
+        names.append(name)
+        health_check.register(name, **kwargs)(func)
+
+    yield add
+
+    for name in names:
+        health_check.HEALTH_CHECKS.pop(name, None)
+        health_check.HEALTH_CHECK_OPTIONS.pop(name, None)
+
+
+@override_settings(MAX_PENDING_TASKS=10, TASK_MAX_AGE_THRESHOLD=24)
+def test_check_all_task_checks_single_query(db, django_assert_num_queries):
+    for _ in range(11):
+        models.TestTask.create_task(1, 2)
+
+    with django_assert_num_queries(1):
+        results = health_check.check_all(exclude=["db"], use_cache=False)
+
+    assert results["task_stack_queue"]["ok"] is False
+    assert results["task_heartbeat"] == {"ok": True}
+    assert results["db"] == {"excluded": True, "ok": True}
+
+
+def test_check_all_concurrent(db, extra_checks):
+    threads = set()
+
+    def slow_check():
+        threads.add(threading.current_thread().name)
+        time.sleep(0.3)
+
+    extra_checks("slow_1", slow_check)
+    extra_checks("slow_2", slow_check)
+
+    t_start = time.monotonic()
+    results = health_check.check_all(use_cache=False)
+
+    assert time.monotonic() - t_start < 0.55
+    assert results["slow_1"] == {"ok": True}
+    assert results["slow_2"] == {"ok": True}
+    assert len(threads) == 2
+    assert list(results)[-2:] == ["slow_1", "slow_2"]
+
+
+def test_check_all_timeout(db, extra_checks):
+    release = threading.Event()
+
+    def hanging_check():
+        release.wait(5)
+
+    def failing_check():
+        raise OSError("service unavailable")
+
+    extra_checks("hanging", hanging_check, timeout=0.1)
+    extra_checks("failing", failing_check)
+
+    try:
+        results = health_check.check_all(use_cache=False)
+    finally:
+        release.set()
+
+    assert results["hanging"] == {"ok": False, "error": "timed out after 0.1s"}
+    assert results["failing"] == {"ok": False, "error": "service unavailable"}
+    assert results["db"] == {"ok": True}
+
+
+@override_settings(HEALTH_CHECK_CACHE_TTL=5)
+def test_check_all_cached(db, extra_checks):
+    calls = []
+    extra_checks("counted", lambda: calls.append(1))
+
+    cache.clear()
+    try:
+        assert health_check.check_all() == health_check.check_all()
+        assert len(calls) == 1
+
+        # excluded checks are part of the cache key
+        health_check.check_all(exclude=["db"])
+        assert len(calls) == 2
+
+        health_check.check_all(use_cache=False)
+        assert len(calls) == 3
+    finally:
+        cache.clear()
+
+
+class FakeCursor:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+    def fetchone(self):
+        return ["30s"]
+
+
+class FakeConnection:
+    vendor = "postgresql"
+
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self.statements)
+
+
+def test_statement_timeout_restored(monkeypatch):
+    fake = FakeConnection()
+    monkeypatch.setattr(health_check, "connection", fake)
+    monkeypatch.setattr(
+        health_check.transaction, "atomic", lambda: contextlib.nullcontext()
+    )
+
+    with health_check.statement_timeout(2):
+        fake.statements.append(("check", None))
+
+    # the previous timeout is restored, releasing a savepoint would not
+    assert fake.statements == [
+        ("SELECT current_setting('statement_timeout')", None),
+        ("SELECT set_config('statement_timeout', %s, true)", ["2000"]),
+        ("check", None),
+        ("SELECT set_config('statement_timeout', %s, true)", ["30s"]),
+    ]
+
+
+class SlowPostgresCursor(FakeCursor):
+    """
+    Cancels the version query like postgresql does when it takes
+    longer than the statement timeout
+    """
+
+    duration = 1000
+    timeout = None
+
+    def execute(self, sql, params=None):
+        super().execute(sql, params)
+        if sql.startswith("SELECT set_config"):
+            SlowPostgresCursor.timeout = params[0]
+        elif sql == "SELECT version()" and int(self.timeout) < self.duration:
+            raise OperationalError("canceling statement due to statement timeout")
+
+
+class SlowPostgresConnection(FakeConnection):
+    def cursor(self):
+        return SlowPostgresCursor(self.statements)
+
+
+@override_settings(HEALTH_CHECK_TIMEOUT=0.1)
+def test_check_all_database_check_timeout(monkeypatch):
+    fake = SlowPostgresConnection()
+    monkeypatch.setattr(health_check, "connection", fake)
+    monkeypatch.setattr(
+        health_check.transaction, "atomic", lambda: contextlib.nullcontext()
+    )
+
+    results = health_check.check_all(
+        exclude=["task_stack_queue", "task_heartbeat"], use_cache=False
+    )
+
+    # the built-in db check runs in the calling thread, its timeout
+    # is applied as statement timeout
+    assert results["db"] == {
+        "ok": False,
+        "error": "canceling statement due to statement timeout",
+    }
+    assert ("SELECT set_config('statement_timeout', %s, true)", ["100"]) in (
+        fake.statements
+    )
@@ -23,6 +23,33 @@ def test_org_display_name(db, dj_account_objects):
     assert dj_account_objects.orgs[1].display_name == "ORGtest-2"
 
 
+def test_org_accessible(db, dj_account_objects, django_assert_num_queries):
+    from django.contrib.auth import get_user_model
+
+    user = dj_account_objects.user
+    orgs = dj_account_objects.orgs
+
+    assert set(models.Organization.accessible(user)) == set(orgs)
+    assert models.Organization.is_accessible(user, orgs[1])
+    assert not models.Organization.is_accessible(user, dj_account_objects.other_org)
+    assert not models.Organization.is_accessible(user, None)
+
+    # index is kept on the permissions object
+    with django_assert_num_queries(0):
+        assert models.Organization.is_accessible(user, orgs[0])
+
+    # and cached per permission set for new requests, only the
+    # permissions (user and group permissions) are loaded
+    user = get_user_model().objects.get(id=user.id)
+    with django_assert_num_queries(2):
+        assert models.Organization.is_accessible(user, orgs[0])
+
+    # membership changes invalidate the index
+    models.OrganizationUser.objects.create(org=dj_account_objects.other_org, user=user)
+    user = get_user_model().objects.get(id=user.id)
+    assert models.Organization.is_accessible(user, dj_account_objects.other_org)
+
+
 def test_org_sync_single_change(db, dj_account_objects):
     org = dj_account_objects.org
     data = {
@@ -61,6 +88,64 @@ def test_org_sync_multiple(db, dj_account_objects):
     assert org_names == {"org3-test", "org4-test"}
 
 
+def test_org_sync_bulk(db, dj_account_objects):
+    import reversion.models
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    user = dj_account_objects.user
+    orgs = [
+        {"id": 1, "name": "renamed", "slug": "test", "personal": True},
+        {"id": 2, "name": "ORGtest-2", "slug": "test-2", "personal": False},
+    ] + [
+        {
+            "id": remote_id,
+            "name": f"org{remote_id}",
+            "slug": f"org{remote_id}",
+            "personal": False,
+            "is_default": remote_id == 10,
+        }
+        for remote_id in range(10, 60)
+    ]
+
+    versions = reversion.models.Version.objects.count()
+
+    with CaptureQueriesContext(connection) as queries:
+        synced = models.Organization.sync(orgs, user, None)
+
+    # orgs and memberships are inserted in bulk
+    inserts = [
+        query["sql"].split("(")[0]
+        for query in queries.captured_queries
+        if query["sql"].startswith('INSERT INTO "fullctl_org')
+    ]
+    assert inserts == [
+        'INSERT INTO "fullctl_org" ',
+        'INSERT INTO "fullctl_org_user" ',
+    ]
+
+    assert [org.remote_id for org in synced] == [data["id"] for data in orgs]
+    assert synced[0].name == "renamed"
+    assert models.Organization.objects.get(remote_id=1).name == "renamed"
+    assert user.org_set.count() == 52
+    assert user.org_set.get(is_default=True).org.remote_id == 10
+
+    # one version per created or changed org and created membership
+    assert reversion.models.Version.objects.count() - versions == 101
+
+    # membership changes and removals
+    orgs = orgs[:2] + [dict(orgs[2], is_default=False)]
+    models.Organization.sync(orgs, user, None)
+    assert user.org_set.count() == 3
+    assert not user.org_set.filter(is_default=True).exists()
+
+    # removed memberships are hard deleted, like OrganizationUser.delete()
+    assert not models.OrganizationUser.objects.filter(
+        user=user, org__remote_id__gt=10
+    ).exists()
+    assert models.Organization.objects.filter(remote_id__gt=10).count() == 49
+
+
 def test_orguser(db, dj_account_objects):
     orguser = models.OrganizationUser.objects.filter(
         org=dj_account_objects.org, user=dj_account_objects.user
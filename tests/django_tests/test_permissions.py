@@ -0,0 +1,62 @@
+import itertools
+
+import pytest
+from grainy.core import PermissionSet
+
+from fullctl.django.auth import PermissionMatcher
+
+RULES = {
+    "org": 1,
+    "org.1": 15,
+    "org.1.private": 0,
+    "org.2.net": 3,
+    "service.fullctl.1": 1,
+    "service.other": 15,
+}
+
+WILDCARD_RULES = dict(RULES, **{"org.*.net": 1, "org.2.*.private": 0})
+
+NAMESPACES = [
+    ".".join(keys)
+    for length in (1, 2, 3, 4)
+    for keys in itertools.product(
+        ["org", "service", "1", "2", "net", "private", "fullctl", "other"],
+        repeat=length,
+    )
+]
+
+
+@pytest.mark.parametrize("rules", [RULES, WILDCARD_RULES])
+def test_permission_matcher(rules):
+    pset = PermissionSet(rules)
+    matcher = PermissionMatcher(pset)
+
+    assert (matcher.rules is None) == (rules is WILDCARD_RULES)
+
+    for namespace in NAMESPACES:
+        for explicit in (False, True):
+            assert matcher.get_permissions(
+                namespace, explicit=explicit
+            ) == pset.get_permissions(namespace, explicit=explicit), namespace
+
+    assert matcher.check("org.?", 2) == pset.check("org.?", 2)
+
+    assert matcher.matches(pset)
+    pset.update({"org.3": 15})
+    assert not matcher.matches(pset)
+
+
+def test_permissions_check_memoized(db, dj_account_objects):
+    perms = dj_account_objects.perms
+    org = dj_account_objects.orgs[1]
+
+    assert perms.check(org, "r")
+    assert not perms.check(org, "u")
+
+    matcher = perms.matcher
+    assert len(matcher.flags) == 1
+    assert perms.matcher is matcher
+
+    perms.pset.update({f"org.{org.permission_id}": 15})
+    assert perms.check(org, "u")
+    assert perms.matcher is not matcher
@@ -0,0 +1,71 @@
+import datetime
+import json
+
+import django_countries.fields
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from fullctl.django.rest.renderers import JSONRenderer, StreamingJSONResponse
+
+
+def render(data, status=200, path="/"):
+    request = APIRequestFactory().get(path)
+    return JSONRenderer().render(
+        data,
+        renderer_context={"response": Response(status=status), "request": request},
+    )
+
+
+def test_json_renderer():
+    now = datetime.datetime(2024, 1, 1, 12, 30, tzinfo=datetime.timezone.utc)
+
+    data = json.loads(
+        render(
+            [
+                {
+                    "id": 1,
+                    "created": now,
+                    "country": django_countries.fields.Country("US"),
+                }
+            ]
+        )
+    )
+
+    assert data == {
+        "data": [{"id": 1, "created": now.isoformat(), "country": "US"}],
+        "errors": {},
+    }
+
+    assert json.loads(render({"id": 1}))["data"] == [{"id": 1}]
+    assert json.loads(render({"name": ["required"]}, status=400))["errors"] == {
+        "name": ["required"]
+    }
+
+
+def test_json_renderer_profiling(settings):
+    settings.REST_PROFILING = False
+    assert "profiling" not in json.loads(render([]))
+
+    settings.REST_PROFILING = True
+    assert "queries" in json.loads(render([]))["profiling"]
+
+
+def test_streaming_json_response(settings):
+    settings.REST_PROFILING = False
+
+    rows = ({"id": i} for i in range(7))
+    response = StreamingJSONResponse(rows, chunk_size=3)
+    response.map_chunks(lambda chunk: [row for row in chunk if row["id"] % 2])
+
+    content = b"".join(response.streaming_content)
+
+    assert json.loads(content) == {
+        "data": [{"id": 1}, {"id": 3}, {"id": 5}],
+        "errors": {},
+    }
+
+    response = StreamingJSONResponse(iter([]))
+    assert json.loads(b"".join(response.streaming_content)) == {
+        "data": [],
+        "errors": {},
+    }
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+from rest_framework import serializers
+
+from fullctl.django.models import Organization, Task
+from fullctl.django.rest.renderers import dumps
+from fullctl.django.rest.serializers.values import compile_serializer
+
+
+class OrgSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Organization
+        fields = ["id", "slug", "name", "personal"]
+
+
+class TaskSerializer(serializers.ModelSerializer):
+    org = OrgSerializer(read_only=True)
+    org_id = serializers.PrimaryKeyRelatedField(source="org", read_only=True)
+    org_slug = serializers.SlugRelatedField(
+        source="org", slug_field="slug", read_only=True
+    )
+    org_name = serializers.CharField(source="org.name", read_only=True)
+    parent_op = serializers.CharField(source="parent.op", read_only=True)
+    parent_status = serializers.CharField(
+        source="parent.status", read_only=True, allow_null=True
+    )
+
+    class Meta:
+        model = Task
+        fields = [
+            "id",
+            "op",
+            "status",
+            "time",
+            "created",
+            "updated",
+            "param_json",
+            "parent",
+            "user",
+            "org",
+            "org_id",
+            "org_slug",
+            "org_name",
+            "parent_op",
+            "parent_status",
+        ]
+
+
+class MethodSerializer(serializers.ModelSerializer):
+    extra = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Task
+        fields = ["id", "extra"]
+
+    def get_extra(self, obj):
+        return None
+
+
+@pytest.fixture
+def tasks(db, dj_account_objects):
+    org = dj_account_objects.org
+    parent = Task.objects.create(op="task_test", param_json="{}", org=org)
+    Task.objects.create(op="task_test", param_json="{}", parent=parent, org=org)
+    Task.objects.create(
+        op="task_test", param_json="{}", user=dj_account_objects.user, time=1.5
+    )
+    return Task.objects.all().select_related("org").order_by("id")
+
+
+def test_compiled_output_matches_serializer(tasks):
+    compiled = compile_serializer(TaskSerializer())
+
+    assert compiled is not None
+
+    expected = TaskSerializer(tasks, many=True).data
+    result = compiled.serialize(tasks)
+
+    assert dumps(result) == dumps(expected)
+    assert json.loads(dumps(result))[0]["org"]["slug"] == tasks[0].org.slug
+
+    # missing related objects
+    assert "parent_op" not in result[0]
+    assert result[0]["parent_status"] is None
+    assert result[1]["parent_op"] == "task_test"
+    assert result[2]["org"] is None
+
+    assert dumps(list(compiled.iter_serialize(tasks.all()[:2], chunk_size=1))) == dumps(
+        expected[:2]
+    )
+
+
+def test_compile_unsupported():
+    assert compile_serializer(MethodSerializer()) is None
+    assert compile_serializer(TaskSerializer(many=True)) is None
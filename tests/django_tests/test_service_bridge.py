@@ -1,4 +1,22 @@
+import json
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework import serializers
+from rest_framework.test import APIRequestFactory
+
 import fullctl.service_bridge.aaactl as aaactl
+import fullctl.service_bridge.auditctl as auditctl
+from fullctl.django.models import Task
+from fullctl.django.rest.renderers import JSONRenderer
+from fullctl.django.rest.views.service_bridge import (
+    DataViewSet,
+    LatencyWindow,
+    StatusViewSet,
+)
 
 
 def test_aaactl_federated_service_url(settings):
@@ -22,3 +40,220 @@ def test_aaactl_federated_service_url(settings):
     assert results[0]["peerctl"]["ix.pdbctl:1"].service_slug == "peerctl"
     assert results[0]["peerctl"]["ix.pdbctl:1"].url == "https://peerctl.example.com"
     assert list(results[0].keys()) == ["peerctl"]
+
+
+class TaskSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Task
+        fields = ["id", "op", "created"]
+
+
+class TaskDataViewSet(DataViewSet):
+    queryset = Task.objects.all()
+    serializer_class = TaskSerializer
+    allow_unfiltered = True
+
+
+def list_tasks(**params):
+    request = APIRequestFactory().get("/", params)
+    response = TaskDataViewSet()._list(request)
+    return json.loads(
+        JSONRenderer().render(
+            response.data, renderer_context={"response": response, "request": request}
+        )
+    )
+
+
+@pytest.mark.parametrize("fast_list", [False, True])
+def test_data_viewset_pagination(db, fast_list, monkeypatch):
+    monkeypatch.setattr(TaskDataViewSet, "fast_list", fast_list)
+
+    for _ in range(5):
+        Task.objects.create(op="task_test", param_json="{}")
+
+    ids = list(Task.objects.order_by("id").values_list("id", flat=True))
+
+    data = list_tasks()
+    assert "next" not in data
+    assert len(data["data"]) == 5
+
+    pages = []
+    cursor = None
+    while True:
+        params = {"page_size": 2}
+        if cursor:
+            params["cursor"] = cursor
+        data = list_tasks(**params)
+        pages.append([row["id"] for row in data["data"]])
+        cursor = data["next"]
+        if not cursor:
+            break
+
+    assert pages == [ids[0:2], ids[2:4], ids[4:5]]
+
+    # descending ordering on a non unique field
+    monkeypatch.setattr(TaskDataViewSet, "cursor_ordering", ("-op",))
+    data = list_tasks(page_size=3)
+    data = list_tasks(page_size=3, cursor=data["next"])
+    assert [row["id"] for row in data["data"]] == ids[3:5]
+    assert data["next"] is None
+
+
+def test_data_viewset_pagination_invalid_cursor(db):
+    request = APIRequestFactory().get("/", {"page_size": 2, "cursor": "invalid"})
+    response = TaskDataViewSet()._list(request)
+    assert response.status_code == 400
+
+
+def test_data_viewset_conditional_default(db):
+    Task.objects.create(op="task_test", param_json="{}")
+
+    # conditional requests are opt-in
+    response = TaskDataViewSet()._list(APIRequestFactory().get("/"))
+    assert response.status_code == 200
+    assert not response.has_header("ETag")
+
+
+def test_data_viewset_conditional(db, monkeypatch):
+    monkeypatch.setattr(TaskDataViewSet, "conditional", True)
+    task = Task.objects.create(op="task_test", param_json="{}")
+
+    response = TaskDataViewSet()._list(APIRequestFactory().get("/"))
+    assert response.status_code == 200
+    etag = response["ETag"]
+    assert response["Last-Modified"]
+
+    request = APIRequestFactory().get("/", HTTP_IF_NONE_MATCH=etag)
+    response = TaskDataViewSet()._list(request)
+    assert response.status_code == 304
+
+    # different listing, different etag
+    request = APIRequestFactory().get("/", {"limit": 1}, HTTP_IF_NONE_MATCH=etag)
+    assert TaskDataViewSet()._list(request).status_code == 200
+
+    task.status = "completed"
+    task.save()
+
+    request = APIRequestFactory().get("/", HTTP_IF_NONE_MATCH=etag)
+    response = TaskDataViewSet()._list(request)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+class SlowStatusViewSet(StatusViewSet):
+    checks = ["bridge_fast", "bridge_slow", "bridge_failing"]
+    release = threading.Event()
+
+    def check_bridge_fast(self, request):
+        time.sleep(0.2)
+        return "ok"
+
+    def check_bridge_slow(self, request):
+        self.release.wait(5)
+        return "ok"
+
+    def check_bridge_failing(self, request):
+        time.sleep(0.2)
+        raise OSError("unreachable")
+
+
+@override_settings(SERVICE_BRIDGE_STATUS_TIMEOUT=0.5)
+def test_status_viewset_concurrent():
+    request = APIRequestFactory().get("/")
+
+    t_start = time.time()
+    try:
+        results = SlowStatusViewSet().status(request)
+    finally:
+        SlowStatusViewSet.release.set()
+
+    # checks run concurrently, the slow check is cut off at the timeout
+    assert time.time() - t_start < 0.9
+    assert results["bridge_fast"]["status"] == "ok"
+    assert results["bridge_failing"]["status"] == "failure"
+    assert results["bridge_failing"]["details"] == "unreachable"
+    assert results["bridge_slow"] == {
+        "status": "failure",
+        "details": "timed out after 0.5s",
+        "time": 0.5,
+        "latency": results["bridge_slow"]["latency"],
+    }
+    assert results["bridge_slow"]["latency"]["p99"] >= 0.5
+    assert results["bridge_fast"]["latency"]["samples"] >= 1
+
+
+@override_settings(SERVICE_BRIDGE_STATUS_CACHE_TTL=5)
+def test_status_viewset_cached():
+    calls = []
+
+    class CountedStatusViewSet(StatusViewSet):
+        checks = ["bridge_counted"]
+
+        def check_bridge_counted(self, request):
+            calls.append(1)
+            return "ok"
+
+    request = APIRequestFactory().get("/")
+
+    cache.clear()
+    try:
+        first = CountedStatusViewSet().status(request)
+        assert CountedStatusViewSet().status(request) == first
+        assert len(calls) == 1
+    finally:
+        cache.clear()
+
+
+def test_latency_window():
+    window = LatencyWindow(size=100)
+    assert window.percentiles("check") == {
+        "samples": 0,
+        "p50": None,
+        "p90": None,
+        "p99": None,
+    }
+
+    for value in range(1, 201):
+        window.add("check", value)
+
+    # only the latest 100 samples are kept
+    assert window.percentiles("check") == {
+        "samples": 100,
+        "p50": 150,
+        "p90": 190,
+        "p99": 199,
+    }
+
+
+def test_auditctl_spool_disabled_by_default(settings, monkeypatch, tmp_path):
+    created = []
+    settings.AUDITCTL_URL = "test://auditctl"
+    monkeypatch.setattr(
+        auditctl.Event, "create", lambda self, event: created.append(event)
+    )
+    monkeypatch.setattr(auditctl, "get_spool", lambda: pytest.fail("spooled"))
+
+    def log_action():
+        auditctl.Event().log_action(
+            org_slug="test",
+            service="fullctl",
+            ref_tag="member",
+            action="create",
+            id=1,
+            spool=auditctl.spool_enabled(),
+        )
+
+    # not configured, events are sent during the request
+    assert not auditctl.spool_enabled()
+    log_action()
+    assert len(created) == 1
+
+    # spooling without a durable spool path is refused
+    settings.AUDITCTL_SPOOL = True
+    settings.AUDITCTL_SPOOL_PATH = ""
+    assert not auditctl.spool_enabled()
+    log_action()
+    assert len(created) == 2
+
+    settings.AUDITCTL_SPOOL_PATH = str(tmp_path / "spool.jsonl")
+    assert auditctl.spool_enabled()
@@ -1,3 +1,5 @@
+import os
+
 import pytest
 from django.test import RequestFactory
 from django_grainy.util import Permissions
@@ -66,3 +68,54 @@ def test_can_delete(db, dj_account_objects, test_request):
     request.perms = Permissions(user)
 
     assert fullctl_util.can_delete(request, "org.1") is True
+
+
+def test_resolve_themed_path(monkeypatch, settings):
+    settings.FREEZE_TEMPLATE_RESOLUTION = True
+    monkeypatch.setattr(fullctl_util, "THEMED_PATH_CACHE", {})
+    lookups = []
+
+    def get_template(path):
+        lookups.append(path)
+        if path != "common/v2/base.html":
+            raise fullctl_util.template.loader.TemplateDoesNotExist(path)
+
+    monkeypatch.setattr(fullctl_util.template.loader, "get_template", get_template)
+
+    for _ in range(2):
+        assert fullctl_util.resolve_themed_path("v2", "common/base.html") == (
+            "common/v2/base.html"
+        )
+        assert fullctl_util.resolve_themed_path("v2", "other.html") == "other.html"
+
+    assert lookups == ["common/v2/base.html", "v2/other.html"]
+
+
+def test_include_css(monkeypatch, settings, tmp_path):
+    settings.FREEZE_TEMPLATE_RESOLUTION = False
+    monkeypatch.setattr(fullctl_util, "INCLUDE_CSS_CACHE", {})
+
+    css = tmp_path / "test.css"
+    css.write_text("a {}")
+    finds = []
+
+    def find(path):
+        finds.append(path)
+        return str(css)
+
+    monkeypatch.setattr(fullctl_util.finders, "find", find)
+
+    assert fullctl_util.include_css("test.css") == "<style>a {}</style>"
+    assert fullctl_util.include_css("test.css") == "<style>a {}</style>"
+    assert len(finds) == 1
+
+    # re-read on mtime change
+    css.write_text("b {}")
+    os.utime(css, (0, 0))
+    assert fullctl_util.include_css("test.css") == "<style>b {}</style>"
+
+    # frozen, no re-validation
+    settings.FREEZE_TEMPLATE_RESOLUTION = True
+    css.write_text("c {}")
+    os.utime(css, (1, 1))
+    assert fullctl_util.include_css("test.css") == "<style>b {}</style>"
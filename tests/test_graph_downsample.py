@@ -0,0 +1,76 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from fullctl.graph.downsample import (  # noqa: E402
+    downsample_indices,
+    downsample_rows,
+    lttb_indices,
+    minmax_indices,
+)
+
+
+def test_lttb_indices():
+    x = np.arange(1000)
+    y = np.sin(x / 50.0)
+    y[500] = 10
+
+    indices = lttb_indices(x, y, 100)
+
+    assert len(indices) == 100
+    assert indices[0] == 0
+    assert indices[-1] == 999
+    assert (np.diff(indices) > 0).all()
+    assert 500 in indices
+
+    assert lttb_indices(x, y, 2000).tolist() == x.tolist()
+
+
+def test_minmax_indices():
+    y = np.arange(1000, dtype=float)
+    y[123] = 5000
+    y[456] = -5000
+
+    indices = minmax_indices(y, 100)
+
+    assert len(indices) <= 100
+    assert 123 in indices
+    assert 456 in indices
+
+
+def test_downsample_indices_preserve():
+    x = np.arange(1000)
+    y = np.zeros(1000)
+    peak = np.zeros(1000)
+    peak[777] = 1
+
+    indices = downsample_indices(x, [y], 10, method="minmax", preserve=[peak])
+    assert 777 in indices
+
+    with pytest.raises(ValueError):
+        downsample_indices(x, [y], 10, method="unknown")
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_downsample_rows(method):
+    rows = [
+        {
+            "timestamp": i * 300,
+            "bps_in": i % 7,
+            "bps_out": i % 11,
+            "bps_in_max": i % 13,
+            "bps_out_max": None if i % 2 else i,
+        }
+        for i in range(5000)
+    ]
+    rows[4321]["bps_in_max"] = 100
+
+    result = downsample_rows(rows, 500, method=method)
+
+    assert len(result) <= 510
+    assert result[0] is rows[0]
+    assert result[-1] is rows[-1]
+    assert max(row["bps_in_max"] for row in result) == 100
+    assert max(row["bps_out_max"] or 0 for row in result) == 4998
+
+    assert downsample_rows(rows[:10], 500) == rows[:10]
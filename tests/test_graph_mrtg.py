@@ -0,0 +1,168 @@
+import pytest
+
+import fullctl.graph.mrtg.rrd as rrd
+
+
+class RecordingRRDTool:
+    def __init__(self, data=None):
+        self.updates = []
+        self.data = data or {}
+
+    def update(self, file_path, *values):
+        self.updates.append(values)
+
+    def fetch(self, file_path, cf, *args):
+        start = int(args[1])
+        end = int(args[3])
+        data = dict(self.data.get(file_path, []))
+        rows = [
+            data.get(timestamp, (None,) * 4) for timestamp in range(start, end, 300)
+        ]
+        return ((start, end, 300), ("a", "b", "c", "d"), rows)
+
+    def info(self, file_path):
+        return {"last_update": 0}
+
+
+def test_read_log_lines_reverse(tmp_path):
+    log_path = tmp_path / "port.log"
+    lines = [f"{1000 - i * 300} {i} {i} {i} {i}" for i in range(100)]
+    log_path.write_text("\n".join(lines) + "\n")
+
+    # small chunk size to exercise lines spanning chunk boundaries
+    result = list(rrd.read_log_lines_reverse(log_path, chunk_size=7))
+    assert result == list(reversed(lines))
+
+
+def test_parse_log_lines():
+    lines = [
+        "100 1 2 3 4",
+        "200 1 2 3 4",
+        "200 5 6 7 8",
+        "150 1 2 3 4",
+        "300 1 2",
+        "400 1 2 3 4",
+    ]
+
+    assert list(rrd.parse_log_lines(lines)) == [
+        "100:8:16:24:32",
+        "200:8:16:24:32",
+        "400:8:16:24:32",
+    ]
+
+    assert list(rrd.parse_log_lines(lines, last_update_time=200, is_bytes=False)) == [
+        "400:1:2:3:4",
+    ]
+
+
+def test_stream_log_lines_to_rrd(tmp_path, monkeypatch):
+    rrdtool = RecordingRRDTool()
+    monkeypatch.setattr(rrd, "rrdtool", rrdtool)
+
+    rrd_path = tmp_path / "port.rrd"
+    rrd_path.touch()
+
+    lines = [f"{i * 300} 1 1 1 1" for i in range(1, 11)]
+
+    count = rrd.stream_log_lines_to_rrd(
+        rrd_path, lines, last_update_time=600, batch_size=3
+    )
+
+    assert count == 8
+    assert [len(batch) for batch in rrdtool.updates] == [3, 3, 2]
+    assert rrdtool.updates[0][0] == "900:8:8:8:8"
+
+
+def test_sum_rrd_arrays():
+    np = pytest.importorskip("numpy")
+
+    result = rrd.sum_rrd_arrays(
+        [
+            (np.array([300, 600]), np.array([[1, 1, 1, 1], [2, np.nan, 2, 2]])),
+            (np.array([600, 900]), np.array([[1, 1, 1, 1], [3, 3, 3, 3]])),
+        ]
+    )
+
+    assert result[0].tolist() == [300, 600, 900]
+    assert result[1].tolist() == [[1, 1, 1, 1], [3, 1, 3, 3], [3, 3, 3, 3]]
+
+
+def test_aggregate_rrd_files(tmp_path, monkeypatch):
+    pytest.importorskip("numpy")
+
+    now = 86400 * 400
+    monkeypatch.setattr(rrd, "AGGREGATE_WINDOWS", [(86400, 0), (86400 * 6, 86400)])
+    monkeypatch.setattr(rrd.time, "time", lambda: now)
+    monkeypatch.setattr(rrd, "create_rrd_file", lambda *args: None)
+
+    rrdtool = RecordingRRDTool(
+        {
+            "a.rrd": [(now - 600, (1, 1, 1, 1)), (now - 86400 * 2, (1, 1, 1, 1))],
+            "b.rrd": [(now - 600, (2, 2, 2, 2)), (now - 300, (None,) * 4)],
+        }
+    )
+    monkeypatch.setattr(rrd, "rrdtool", rrdtool)
+
+    count = rrd.aggregate_rrd_files(
+        ["a.rrd", "b.rrd"], str(tmp_path / "out.rrd"), processes=1
+    )
+
+    assert count == 2
+    assert rrdtool.updates == [
+        (f"{now - 86400 * 2}:1:1:1:1", f"{now - 600}:3:3:3:3"),
+    ]
+
+
+def test_load_rrd_file_columnar(monkeypatch):
+    pytest.importorskip("numpy")
+
+    now = 86400
+    rrdtool = RecordingRRDTool(
+        {"a.rrd": [(now - 600, (1, 2, 3, 4)), (now - 300, (5, 6, 7, 8))]}
+    )
+    monkeypatch.setattr(rrd, "rrdtool", rrdtool)
+
+    data = rrd.load_rrd_file("a.rrd", start_time=now, duration=900, columnar=True)
+
+    assert data.timestamps.tolist() == [now - 900, now - 600, now - 300]
+    assert data.bps_in_max.tolist()[1:] == [3, 7]
+    assert data.to_dict()["bps_out"] == [None, 2, 6]
+
+    rows = rrd.load_rrd_file("a.rrd", start_time=now, duration=900)
+    assert rows == data.rows()
+    assert rows[0] == {
+        "timestamp": now - 900,
+        "bps_in": None,
+        "bps_out": None,
+        "bps_in_max": None,
+        "bps_out_max": None,
+    }
+    assert rows[2] == data[2]
+
+
+def test_load_rrd_file_without_numpy(monkeypatch):
+    now = 86400
+    rrdtool = RecordingRRDTool({"a.rrd": [(now - 300, (5, 6, 7, 8))]})
+    monkeypatch.setattr(rrd, "rrdtool", rrdtool)
+    monkeypatch.setattr(rrd, "np", None)
+
+    rows = rrd.load_rrd_file("a.rrd", start_time=now, duration=600)
+    assert rows == [
+        {
+            "timestamp": now - 600,
+            "bps_in": None,
+            "bps_out": None,
+            "bps_in_max": None,
+            "bps_out_max": None,
+        },
+        {
+            "timestamp": now - 300,
+            "bps_in": 5,
+            "bps_out": 6,
+            "bps_in_max": 7,
+            "bps_out_max": 8,
+        },
+    ]
+
+    with pytest.raises(ImportError, match="numpy is required"):
+        rrd.load_rrd_file("a.rrd", start_time=now, duration=600, columnar=True)
@@ -0,0 +1,86 @@
+import pytest
+
+try:
+    import fullctl.graph.render.traffic as traffic
+except (ImportError, OSError) as exc:
+    # cairosvg raises OSError if the cairo library is not installed
+    pytest.skip(f"graph rendering not available: {exc}", allow_module_level=True)
+
+
+def traffic_data(points=50, scale=1):
+    return [
+        {
+            "timestamp": 1700000000 + i * 300,
+            "bps_in": (i % 7) * 1000 * scale,
+            "bps_out": (i % 5) * 800 * scale,
+            "bps_in_max": (i % 7) * 1200 * scale,
+            "bps_out_max": (i % 5) * 900 * scale,
+        }
+        for i in range(points)
+    ]
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """
+    Counts the graphs that are actually rendered (not served from cache)
+    """
+    calls = []
+    get_figure = traffic.get_figure
+
+    def counting_get_figure():
+        calls.append(1)
+        return get_figure()
+
+    monkeypatch.setattr(traffic, "get_figure", counting_get_figure)
+    traffic.clear_render_cache()
+    yield calls
+    traffic.clear_render_cache()
+
+
+def test_render_cache_hit(renders):
+    data = traffic_data()
+
+    first = traffic.render_graph(data, title_label="port 1")
+    second = traffic.render_graph(data, title_label="port 1")
+
+    assert first[:8] == b"\x89PNG\r\n\x1a\n"
+    assert second == first
+    assert len(renders) == 1
+
+
+def test_render_cache_miss(renders):
+    data = traffic_data()
+
+    base = traffic.render_graph(data, title_label="port 1")
+
+    # different data
+    traffic.render_graph(traffic_data(scale=2), title_label="port 1")
+    assert len(renders) == 2
+
+    # different options
+    traffic.render_graph(data, title_label="port 2")
+    assert len(renders) == 3
+    traffic.render_graph(data, title_label="port 1", max_points=10)
+    assert len(renders) == 4
+
+    # cache disabled
+    assert traffic.render_graph(data, title_label="port 1", cache=False) == base
+    assert len(renders) == 5
+
+
+def test_render_reused_figure_matches_fresh(renders):
+    data = traffic_data()
+
+    # render a different graph first so the per-thread figure holds
+    # another title, series and limits
+    traffic.render_graph(
+        traffic_data(points=3000, scale=5), title_label="other", cache=False
+    )
+    reused = traffic.render_graph(data, cache=False)
+
+    # drop the per-thread figure so the next render creates a new one
+    del traffic._figures.figure
+    fresh = traffic.render_graph(data, cache=False)
+
+    assert reused == fresh
@@ -0,0 +1,560 @@
+import asyncio
+import gc
+import gzip
+import threading
+import time
+import weakref
+
+import pytest
+
+from fullctl.metrics import AsyncMetrics, Metrics, QueryCache
+from fullctl.metrics.cache import parse_duration
+from fullctl.metrics.line_protocol import (
+    encode_line,
+    encode_points,
+    iter_encoded_chunks,
+    to_nanoseconds,
+)
+from fullctl.metrics.schema import Point, QueryResult
+from fullctl.metrics.shard import split_time_range
+
+URL = "http://victoriametrics:8428"
+
+
+@pytest.fixture
+def metrics():
+    return Metrics(URL, auth=("user", "pass"))
+
+
+def test_write_auth(metrics, requests_mock):
+    requests_mock.post(f"{URL}/write", status_code=204)
+
+    metrics.write("cpu", {"host": "server1"}, {"usage": 0.5}, timestamp=1)
+
+    assert requests_mock.last_request.headers["Authorization"].startswith("Basic ")
+    assert requests_mock.last_request.text == "cpu,host=server1 usage=0.5 1000000000"
+
+
+def test_buffered_writer(metrics, requests_mock):
+    requests_mock.post(f"{URL}/write", status_code=204)
+
+    writer = metrics.buffered_writer(batch_size=2, flush_interval=60)
+
+    for i in range(5):
+        writer.write("cpu", {"host": "server1"}, {"usage": i}, timestamp=i + 1)
+
+    writer.close()
+
+    assert writer.written == 5
+    assert writer.dropped == 0
+
+    lines = []
+    for request in requests_mock.request_history:
+        assert request.headers["Content-Encoding"] == "gzip"
+        assert request.headers["Authorization"].startswith("Basic ")
+        lines.extend(gzip.decompress(request.body).decode().split("\n"))
+
+    assert lines == [f"cpu,host=server1 usage={i} {(i + 1) * 10**9}" for i in range(5)]
+
+
+def test_buffered_writer_retry(metrics, requests_mock):
+    requests_mock.post(f"{URL}/write", [{"status_code": 503}, {"status_code": 204}])
+
+    writer = metrics.buffered_writer(retry_backoff=0, compress=False)
+    writer.write("cpu", {"host": "server1"}, {"usage": 1}, timestamp=1)
+    writer.flush()
+
+    assert requests_mock.call_count == 2
+    assert writer.written == 1
+
+    requests_mock.post(f"{URL}/write", status_code=503)
+    writer.write("cpu", {"host": "server1"}, {"usage": 1}, timestamp=2)
+    writer.close()
+
+    assert writer.dropped == 1
+
+
+def test_buffered_writer_drop_policy(metrics):
+    writer = metrics.buffered_writer(max_queue_size=2, batch_size=10)
+    writer._start = lambda: None
+
+    for i in range(3):
+        writer.write("cpu", {}, {"usage": i}, timestamp=i + 1)
+
+    assert writer.dropped == 1
+    assert [line.split()[1] for line in writer._drain()] == ["usage=1", "usage=2"]
+
+    writer = metrics.buffered_writer(max_queue_size=2, drop_policy="newest")
+    writer._start = lambda: None
+
+    for i in range(3):
+        writer.write("cpu", {}, {"usage": i}, timestamp=i + 1)
+
+    assert writer.dropped == 1
+    assert [line.split()[1] for line in writer._drain()] == ["usage=0", "usage=1"]
+
+    with pytest.raises(ValueError):
+        metrics.buffered_writer(drop_policy="invalid")
+
+
+def test_buffered_writer_closed(metrics, requests_mock):
+    requests_mock.post(f"{URL}/write", status_code=204)
+
+    writer = metrics.buffered_writer()
+    writer.write("cpu", {}, {"usage": 1}, timestamp=1)
+    writer.close()
+
+    # points written after close are never flushed, count them as dropped
+    writer.write("cpu", {}, {"usage": 2}, timestamp=2)
+
+    assert writer.written == 1
+    assert writer.dropped == 1
+    assert writer.queue.empty()
+
+
+def test_buffered_writer_garbage_collected(metrics):
+    writer = metrics.buffered_writer()
+    ref = weakref.ref(writer)
+
+    del writer
+    gc.collect()
+
+    assert ref() is None
+
+
+def test_buffered_writer_counters_threadsafe(metrics):
+    writer = metrics.buffered_writer(max_queue_size=1, drop_policy="newest")
+    writer._start = lambda: None
+    writer.write("cpu", {}, {"usage": 0}, timestamp=1)
+
+    def write():
+        for i in range(1000):
+            writer.write("cpu", {}, {"usage": i}, timestamp=i + 1)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert writer.dropped == 4000
+
+
+def test_encode_line():
+    assert (
+        encode_line(
+            "cpu usage,total",
+            {"host name": "a,b=c", "skip": None},
+            {"value": 1, "ratio": 0.5, "ok": True, "note": 'say "hi"'},
+            1609459200,
+        )
+        == 'cpu\\ usage\\,total,host\\ name=a\\,b\\=c value=1,ratio=0.5,ok=true,note="say \\"hi\\"" 1609459200000000000'
+    )
+
+    assert encode_line("cpu", {}, {"usage": 1}) == "cpu usage=1"
+
+
+@pytest.mark.parametrize(
+    "timestamp,expected",
+    [
+        (1609459200, 1609459200000000000),
+        (1609459200123, 1609459200123000000),
+        (1609459200123456, 1609459200123456000),
+        (1609459200123456789, 1609459200123456789),
+        (1609459200.5, 1609459200500000000),
+    ],
+)
+def test_to_nanoseconds(timestamp, expected):
+    assert to_nanoseconds(timestamp) == expected
+
+
+def test_iter_encoded_chunks():
+    points = [
+        {"measurement": "cpu", "tags": {"host": f"server{i}"}, "fields": {"usage": i}}
+        for i in range(100)
+    ]
+    points.append(Point(measurement="cpu", tags={}, fields={"usage": 1}, timestamp=1))
+
+    chunks = list(iter_encoded_chunks(points, chunk_size=100))
+
+    assert len(chunks) > 1
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+    assert b"".join(chunks) == encode_points(points)
+    assert encode_points(points).split(b"\n")[-2] == b"cpu usage=1 1000000000"
+
+
+def test_write_many(metrics, requests_mock):
+    requests_mock.post(f"{URL}/write", status_code=204)
+
+    points = [
+        {"measurement": "cpu", "tags": {"host": "server1"}, "fields": {"usage": i}}
+        for i in range(3)
+    ]
+
+    metrics.write_many(points)
+
+    assert requests_mock.last_request.body == (
+        b"cpu,host=server1 usage=0\ncpu,host=server1 usage=1\ncpu,host=server1 usage=2\n"
+    )
+
+    # large payloads are streamed in chunks
+    metrics.write_many(points, chunk_size=10)
+
+    assert b"".join(requests_mock.last_request.body) == encode_points(points)
+
+
+QUERY_RANGE_RESPONSE = {
+    "status": "success",
+    "data": {
+        "resultType": "matrix",
+        "result": [
+            {
+                "metric": {"__name__": "cpu", "host": "server1"},
+                "values": [[1722964200, "1"], [1722964260, "1.5"]],
+            },
+            {
+                "metric": {"__name__": "cpu", "host": "server2"},
+                "values": [[1722964200, "NaN"]],
+            },
+        ],
+    },
+    "stats": {"seriesFetched": "2", "executionTimeMsec": 1},
+}
+
+
+def test_query_range(metrics, requests_mock):
+    pytest.importorskip("numpy")
+
+    requests_mock.get(f"{URL}/api/v1/query_range", json=QUERY_RANGE_RESPONSE)
+
+    result = metrics.query_range("cpu", "-1h", "1m")
+
+    assert isinstance(result, QueryResult)
+    assert result.stats.seriesFetched == "2"
+    assert result.data.resultType == "matrix"
+    assert result.data.result[0].metric == {"__name__": "cpu", "host": "server1"}
+    assert result.data.result[0].values == [[1722964200, 1], [1722964260, 1.5]]
+
+    result = metrics.query_range("cpu", "-1h", "1m", columnar=True)
+
+    assert result.status == "success"
+    assert result.series[0].timestamps.tolist() == [1722964200, 1722964260]
+    assert result.series[0].values.tolist() == [1.0, 1.5]
+    assert len(result.series[1]) == 1
+    assert result.data.result[1].metric["host"] == "server2"
+
+    result += metrics.query_range("cpu", "-1h", "1m", columnar=True)
+    assert len(result.series) == 4
+    assert len(result.data.result) == 4
+
+
+def test_query_range_integer_values(metrics, requests_mock):
+    pytest.importorskip("numpy")
+
+    requests_mock.get(
+        f"{URL}/api/v1/query_range",
+        json={
+            "status": "success",
+            "data": {
+                "resultType": "matrix",
+                "result": [
+                    {
+                        "metric": {"host": "server1"},
+                        "values": [
+                            [1722964200, "1"],
+                            [1722964260, "12345678901234567891"],
+                        ],
+                    }
+                ],
+            },
+        },
+    )
+
+    # values keep their type and precision unless columnar results are requested
+    values = metrics.query_range("cpu", "-1h", "1m").data.result[0].values
+    assert values == [[1722964200, 1], [1722964260, 12345678901234567891]]
+    assert isinstance(values[0][1], int)
+
+    result = metrics.query_range("cpu", "-1h", "1m", columnar=True)
+    assert result.series[0].values.tolist() == [1.0, 1.2345678901234567e19]
+
+
+def test_query_range_error(metrics, requests_mock):
+    pytest.importorskip("numpy")
+
+    requests_mock.get(
+        f"{URL}/api/v1/query_range",
+        status_code=422,
+        json={"status": "error", "errorType": "422", "error": "bad query"},
+    )
+
+    result = metrics.query_range("cpu{", "-1h", "1m")
+
+    assert result.status == "error"
+    assert result.error == "bad query"
+    assert result.data is None
+
+
+def test_query_range_stream(metrics, requests_mock):
+    pytest.importorskip("numpy")
+    pytest.importorskip("ijson")
+
+    requests_mock.get(f"{URL}/api/v1/query_range", json=QUERY_RANGE_RESPONSE)
+
+    result = metrics.query_range("cpu", "-1h", "1m", columnar=True, stream=True)
+
+    assert result.result_type == "matrix"
+    assert [len(series) for series in result.series] == [2, 1]
+    assert result.series[0].values.tolist() == [1.0, 1.5]
+
+
+def vm_query_range(request, context):
+    start = int(request.qs["start"][0])
+    end = int(request.qs["end"][0])
+    step = int(request.qs["step"][0])
+    return {
+        "status": "success",
+        "data": {
+            "resultType": "matrix",
+            "result": [
+                {
+                    "metric": {"host": "server1"},
+                    "values": [[ts, str(ts)] for ts in range(start, end + 1, step)],
+                }
+            ],
+        },
+    }
+
+
+def test_parse_duration():
+    assert parse_duration("5m") == 300
+    assert parse_duration("1h30m") == 5400
+    assert parse_duration("60") == 60
+    assert parse_duration(60) == 60
+    assert parse_duration("1x") is None
+    assert parse_duration("1h 30m") is None
+
+
+def test_query_range_cache(requests_mock):
+    pytest.importorskip("numpy")
+
+    requests_mock.get(f"{URL}/api/v1/query_range", json=vm_query_range)
+
+    metrics = Metrics(URL, cache=QueryCache(ttl=60))
+
+    result = metrics.query_range("cpu", 1000, 100, end=2000, columnar=True)
+    assert result.series[0].timestamps.tolist() == list(range(1000, 2001, 100))
+    assert requests_mock.call_count == 1
+
+    # fully cached, start / end are aligned to the step
+    result = metrics.query_range("cpu", 1250, 100, end=1850, columnar=True)
+    assert result.series[0].timestamps.tolist() == list(range(1200, 1801, 100))
+    assert requests_mock.call_count == 1
+
+    # only the tail (and the last cached step) is fetched
+    result = metrics.query_range("cpu", 1500, 100, end=2500, columnar=True)
+    assert result.series[0].timestamps.tolist() == list(range(1500, 2501, 100))
+    assert requests_mock.call_count == 2
+    assert requests_mock.last_request.qs["start"] == ["2000"]
+    assert requests_mock.last_request.qs["end"] == ["2500"]
+
+    # only the head is fetched
+    result = metrics.query_range("cpu", 500, 100, end=2500, columnar=True)
+    assert result.series[0].timestamps.tolist() == list(range(500, 2501, 100))
+    assert requests_mock.call_count == 3
+    assert requests_mock.last_request.qs["end"] == ["900"]
+
+    # different step is a different query
+    metrics.query_range("cpu", 1000, 200, end=2000, columnar=True)
+    assert requests_mock.call_count == 4
+
+    # exact results are cached as a whole
+    metrics.query_range("cpu", 1000, 100, end=2000)
+    metrics.query_range("cpu", 1000, 100, end=2000)
+    assert requests_mock.call_count == 5
+
+
+def test_query_cache_expiry(requests_mock):
+    pytest.importorskip("numpy")
+
+    requests_mock.get(f"{URL}/api/v1/query_range", json=vm_query_range)
+
+    metrics = Metrics(URL, cache=QueryCache(ttl=0))
+
+    metrics.query_range("cpu", 1000, 100, end=2000)
+    metrics.query_range("cpu", 1000, 100, end=2000)
+
+    assert requests_mock.call_count == 2
+
+
+def test_query_cache_coalesce():
+    cache = QueryCache()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(cache.coalesce("a", fetch)))
+    first.start()
+    started.wait(5)
+
+    second = threading.Thread(target=lambda: results.append(cache.coalesce("a", fetch)))
+    second.start()
+    # give the second thread time to wait on the in flight call
+    time.sleep(0.2)
+    release.set()
+    first.join()
+    second.join()
+
+    assert results == ["result", "result"]
+    assert len(calls) == 1
+    assert cache.inflight == {}
+
+
+def test_query_cache_instant(requests_mock):
+    requests_mock.get(f"{URL}/api/v1/query", json={"status": "success"})
+
+    metrics = Metrics(URL, cache=QueryCache(ttl=60))
+
+    metrics.query("cpu")
+    result = metrics.query("cpu")
+
+    assert result.status == "success"
+    assert requests_mock.call_count == 1
+
+
+def test_cluster_urls(requests_mock):
+    metrics = Metrics(
+        "http://vmselect:8481", tenant=0, insert_url="http://vminsert:8480"
+    )
+
+    assert metrics.write_url == "http://vminsert:8480/insert/0/influx/write"
+    assert (
+        metrics.select_url("/api/v1/query")
+        == "http://vmselect:8481/select/0/prometheus/api/v1/query"
+    )
+
+    requests_mock.post(metrics.write_url, status_code=204)
+    metrics.write("cpu", {"host": "server1"}, {"usage": 0.5})
+    assert requests_mock.called
+
+    requests_mock.get(metrics.select_url("/api/v1/query_range"), json=vm_query_range)
+    result = metrics.query_range("cpu", 1000, 100, end=1200, columnar=True)
+    assert result.series[0].timestamps.tolist() == [1000, 1100, 1200]
+
+
+def test_split_time_range():
+    assert split_time_range(1050, 1500, 100, 200) == [
+        (1000, 1100),
+        (1200, 1300),
+        (1400, 1500),
+    ]
+    assert split_time_range(1000, 1000, 100, 50) == [(1000, 1000)]
+
+
+def test_query_range_time_shards(metrics, requests_mock):
+    pytest.importorskip("numpy")
+
+    requests_mock.get(f"{URL}/api/v1/query_range", json=vm_query_range)
+
+    result = metrics.query_range(
+        "cpu", 1000, 100, end=2000, columnar=True, shard_duration=300, shard_timeout=5
+    )
+
+    assert requests_mock.call_count == 4
+    assert all(
+        request.qs["timeout"] == ["5s"] for request in requests_mock.request_history
+    )
+    assert len(result.series) == 1
+    assert result.series[0].timestamps.tolist() == list(range(1000, 2001, 100))
+
+
+def vm_query_range_metrics(request, context):
+    # one series per metric name in the selector, value is the number of names
+    names = request.qs["query"][0].split('"')[1].split("|")
+    return {
+        "status": "success",
+        "data": {
+            "resultType": "matrix",
+            "result": [
+                {"metric": {"host": "server1"}, "values": [[1000, str(len(names))]]}
+            ],
+        },
+    }
+
+
+def test_query_range_metrics(metrics, requests_mock):
+    pytest.importorskip("numpy")
+
+    requests_mock.get(f"{URL}/api/v1/query_range", json=vm_query_range_metrics)
+
+    names = [f"port_{i}" for i in range(25)]
+
+    result = metrics.query_range_metrics(
+        "sum", names, {"host": "server1"}, 1000, 100, end=1000, metrics_per_shard=10
+    )
+
+    assert requests_mock.call_count == 3
+    assert result.data.result[0].values == [[1000, 25.0]]
+
+    with pytest.raises(ValueError):
+        metrics.query_range_metrics(
+            "avg", names, {}, 1000, 100, end=1000, metrics_per_shard=10
+        )
+
+
+def test_async_metrics():
+    httpx = pytest.importorskip("httpx")
+
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.path == "/write":
+            return httpx.Response(204)
+        if request.url.path == "/api/v1/query_range":
+            start = int(request.url.params["start"])
+            end = int(request.url.params["end"])
+            values = [[ts, str(ts)] for ts in range(start, end + 1, 100)]
+            return httpx.Response(
+                200,
+                json={
+                    "status": "success",
+                    "data": {
+                        "resultType": "matrix",
+                        "result": [{"metric": {"host": "server1"}, "values": values}],
+                    },
+                },
+            )
+        return httpx.Response(204)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def run():
+        async with AsyncMetrics(URL, auth=("user", "pass"), client=client) as metrics:
+            await metrics.write("cpu", {"host": "server1"}, {"usage": 0.5}, timestamp=1)
+            await metrics.write_many(
+                [{"measurement": "cpu", "fields": {"usage": 1}, "timestamp": 2}]
+            )
+            result = await metrics.query_range(
+                "cpu", 1000, 100, end=2000, shard_duration=300
+            )
+            await metrics.delete('{__name__="cpu"}')
+            return result
+
+    result = asyncio.run(run())
+
+    assert requests[0].content == b"cpu,host=server1 usage=0.5 1000000000"
+    assert requests[0].headers["Authorization"].startswith("Basic ")
+    assert requests[1].content == b"cpu usage=1 2000000000\n"
+    # 4 shards + delete
+    assert len(requests) == 2 + 4 + 1
+    assert [value[0] for value in result.data.result[0].values] == list(
+        range(1000, 2001, 100)
+    )
@@ -1,6 +1,10 @@
 import pytest
+import requests
 
-from fullctl.service_bridge.client import url_join
+import fullctl.service_bridge.devicectl as devicectl
+import fullctl.service_bridge.ixctl as ixctl
+from fullctl.service_bridge.auditctl import EventSpool
+from fullctl.service_bridge.client import Bridge, ServiceBridgeError, url_join
 
 
 @pytest.mark.parametrize(
@@ -32,3 +36,166 @@ def test_urljoin(a, b, c, expected):
     Tests that calling urljoin with  a,b and c will match the expected result
     """
     assert url_join(a, b, c) == expected
+
+
+def test_bridge_objects_pagination(requests_mock):
+    rows = [{"id": i} for i in range(1, 6)]
+
+    def listing(request, context):
+        assert request.qs["page_size"] == ["2"]
+        start = int(request.qs.get("cursor", ["0"])[0])
+        page = rows[start : start + 2]
+        next_cursor = str(start + 2) if start + 2 < len(rows) else None
+        return {"data": page, "errors": {}, "next": next_cursor}
+
+    requests_mock.get("http://test/api/data/base/", json=listing)
+
+    bridge = Bridge("http://test", "key", "org", page_size=2)
+
+    assert [obj.id for obj in bridge.objects(status="ok")] == [1, 2, 3, 4, 5]
+    assert requests_mock.call_count == 3
+    assert requests_mock.last_request.qs["status"] == ["ok"]
+
+
+def test_bridge_get_revalidation(requests_mock):
+    def listing(request, context):
+        if request.headers.get("If-None-Match") == 'W/"1"':
+            context.status_code = 304
+            return None
+        context.headers["ETag"] = 'W/"1"'
+        return {"data": [{"id": 1}], "errors": {}}
+
+    requests_mock.get("http://test/api/data/base/", json=listing)
+
+    bridge = Bridge("http://test", "key", "org", cache={}, cache_duration=0)
+
+    assert bridge.get("data/base") == [{"id": 1}]
+    assert "If-None-Match" not in requests_mock.last_request.headers
+
+    # expired entry is revalidated and reused on 304
+    assert bridge.get("data/base") == [{"id": 1}]
+    assert requests_mock.last_request.headers["If-None-Match"] == 'W/"1"'
+    assert requests_mock.call_count == 2
+
+
+def test_bridge_heartbeat_timeout(requests_mock):
+    requests_mock.get(
+        "http://test/api/system/heartbeat/",
+        json={"data": [{"status": "ok"}], "errors": {}},
+    )
+
+    bridge = Bridge("http://test", "key", "org")
+
+    assert bridge.heartbeat(timeout=2) == "ok"
+    assert requests_mock.last_request.timeout == 2
+
+
+@pytest.mark.parametrize(
+    "module,bridge_cls",
+    [(ixctl, "InternetExchangeMember"), (devicectl, "VirtualPort")],
+)
+def test_traffic_max_points_requires_numpy(module, bridge_cls, monkeypatch, settings):
+    settings.IXCTL_URL = "test://ixctl"
+    settings.DEVICECTL_URL = "test://devicectl"
+    monkeypatch.setattr(module, "downsample_rows", None)
+
+    with pytest.raises(ImportError, match="numpy is required for max_points"):
+        getattr(module, bridge_cls)().traffic(1, max_points=100)
+
+
+class FakeEventBridge:
+    calls = []
+    fail = False
+    batch_status = None
+
+    def create_many(self, events):
+        if self.batch_status:
+            raise ServiceBridgeError(self, self.batch_status)
+        if self.fail:
+            raise requests.exceptions.ConnectionError("down")
+        self.calls.append([event["object_id"] for event in events])
+
+    def create(self, event):
+        if self.fail:
+            raise requests.exceptions.ConnectionError("down")
+        self.calls.append([event["object_id"]])
+
+
+@pytest.fixture
+def event_bridge():
+    FakeEventBridge.calls = []
+    FakeEventBridge.fail = False
+    FakeEventBridge.batch_status = None
+    return FakeEventBridge
+
+
+def test_event_spool_batches(event_bridge):
+    spool = EventSpool(
+        batch_size=2, retry_backoff=0, batch=True, bridge_cls=event_bridge
+    )
+    spool._stopped.set()
+
+    for i in range(3):
+        spool.put({"org": "a", "object_id": f"a{i}"})
+    spool.put({"org": "b", "object_id": "b0"})
+    spool.flush()
+
+    assert event_bridge.calls == [["a0", "a1"], ["a2"], ["b0"]]
+    assert spool.stats()["sent"] == 4
+
+    # batch requests not supported
+    event_bridge.calls = []
+    event_bridge.batch_status = 404
+    spool.put({"org": "a", "object_id": "a3"})
+    spool.put({"org": "a", "object_id": "a4"})
+    spool.flush()
+
+    assert not spool.batch_supported
+    assert event_bridge.calls == [["a3"], ["a4"]]
+
+
+def test_event_spool_batch_opt_in(event_bridge):
+    spool = EventSpool(batch_size=2, retry_backoff=0, bridge_cls=event_bridge)
+    spool._stopped.set()
+
+    # event create endpoints that do not accept lists answer 400,
+    # batch requests are only made when enabled
+    event_bridge.batch_status = 400
+    spool.put({"org": "a", "object_id": "a0"})
+    spool.put({"org": "a", "object_id": "a1"})
+    spool.flush()
+
+    assert event_bridge.calls == [["a0"], ["a1"]]
+    assert spool.stats()["sent"] == 2
+
+
+def test_event_spool_file(event_bridge, tmp_path):
+    path = str(tmp_path / "spool.jsonl")
+    spool = EventSpool(
+        path=path,
+        max_queue_size=2,
+        retries=1,
+        retry_backoff=0,
+        batch=True,
+        bridge_cls=event_bridge,
+    )
+    spool._stopped.set()
+
+    event_bridge.fail = True
+    spool.put({"org": "a", "object_id": "a0"})
+    spool.put({"org": "a", "object_id": "a1"})
+    # queue full, goes to the spool file
+    spool.put({"org": "a", "object_id": "a2"})
+    spool.flush()
+
+    assert spool.stats()["failed"] == 2
+    with open(path) as fh:
+        assert len(fh.readlines()) == 3
+
+    event_bridge.fail = False
+    spool.put({"org": "a", "object_id": "a3"})
+    spool.flush()
+
+    assert event_bridge.calls == [["a0", "a1", "a2", "a3"]]
+    with open(path) as fh:
+        assert fh.read() == ""